@@ -1,16 +1,17 @@
-"""
-ASGI config for cateringproject project.
-
-It exposes the ASGI callable as a module-level variable named ``application``.
-
-For more information on this file, see
-https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
-"""
-
-import os
-
-from django.core.asgi import get_asgi_application
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cateringproject.settings')
-
-application = get_asgi_application()
+"""
+ASGI config for cateringproject project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Live order tracking streams (``food.tracking``) need it: ``make run_asgi``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cateringproject.settings')
+
+application = get_asgi_application()
@@ -1,10 +1,39 @@
-import os
-
-from celery import Celery
-
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cateringproject.settings")
-
-app = Celery('cateringproject')
-app.config_from_object("django.conf:settings", namespace="CELERY")
-app.conf.update(task_serializer="pickle")
-app.autodiscover_tasks()
\ No newline at end of file
+import os
+import time
+
+from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_ready
+from prometheus_client import Histogram
+
+from shared.metrics import LATENCY_BUCKETS, serve
+from shared.payloads import SERIALIZER, register_serializer
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cateringproject.settings")
+
+app = Celery('cateringproject')
+app.config_from_object("django.conf:settings", namespace="CELERY")
+register_serializer()
+app.conf.update(task_serializer=SERIALIZER)
+app.autodiscover_tasks()
+
+TASK_SECONDS = Histogram("celery_task_seconds", "Celery task runs.", ("task", "state"), buckets=LATENCY_BUCKETS)
+# Port of the metrics endpoint of a worker, none by default.
+# Pool processes are added up when PROMETHEUS_MULTIPROC_DIR is set.
+METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT", default="0"))
+
+_started: dict[str, float] = {}
+
+@task_prerun.connect
+def _task_started(task_id, **kwargs):
+    _started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def _task_finished(task_id, task, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        TASK_SECONDS.labels(task=task.name, state=state or "UNKNOWN").observe(time.perf_counter() - started)
+
+@worker_ready.connect
+def _serve_metrics(**kwargs):
+    if METRICS_PORT:
+        serve(METRICS_PORT)
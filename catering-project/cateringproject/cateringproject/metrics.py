@@ -0,0 +1,94 @@
+"""Request metrics and the `/metrics` endpoint (multiprocess setup: `shared.metrics`)."""
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram
+
+from shared.metrics import LATENCY_BUCKETS, render
+
+REQUEST_SECONDS = Histogram(
+    "http_request_seconds",
+    "API requests, until the response starts.",
+    ("view", "method", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_queries",
+    "Database queries per API request.",
+    ("view",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+def _view(request: HttpRequest) -> str:
+    # the route, not the path: ids in paths would make a series per object
+    match = request.resolver_match
+    return match.view_name if match else "unmatched"
+
+class MetricsMiddleware:
+    """Times every request and counts its database queries.
+
+    Works in both modes, so the async tracking streams stay async under ASGI.
+    Queries of async views run in other threads and are not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        started = time.perf_counter()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+
+        self._observe(request, response, started)
+        REQUEST_QUERIES.labels(view=_view(request)).observe(queries.count)
+
+        return response
+
+    async def __acall__(self, request: HttpRequest):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, started)
+
+        return response
+
+    @staticmethod
+    def _observe(request: HttpRequest, response: HttpResponse, started: float) -> None:
+        REQUEST_SECONDS.labels(view=_view(request), method=request.method, status=response.status_code).observe(
+            time.perf_counter() - started
+        )
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """All the metrics of the API processes, behind the `METRICS_TOKEN` bearer token.
+
+    Without a token the endpoint is open in DEBUG only.
+    """
+
+    if settings.METRICS_TOKEN:
+        if request.headers.get("Authorization") != f"Bearer {settings.METRICS_TOKEN}":
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        return HttpResponse(status=403)
+
+    return HttpResponse(render(), content_type=CONTENT_TYPE_LATEST)
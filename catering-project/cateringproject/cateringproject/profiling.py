@@ -0,0 +1,173 @@
+"""SQL profile of a request: query count, DB time, repeated statements (N+1) and the slowest ones.
+
+Opt-in with `QUERY_PROFILER=1`. With `DEBUG` the profile goes to the response headers:
+
+    X-DB-Queries     queries of the request
+    X-DB-Time        their total time, ms
+    X-DB-Duplicates  queries that repeat a statement already run in the request
+    X-DB-Slowest     the slowest query, ms
+
+Otherwise `QUERY_PROFILER_SAMPLE_RATE` of the requests log a `db.profile` line,
+and a request that runs one statement `N_PLUS_ONE_THRESHOLD` times or more logs
+a `db.n_plus_one` warning, sampled or not.
+
+Tests hold code to a query budget with `query_budget`.
+"""
+
+import heapq
+import logging
+import os
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+
+# Runs of one statement in a request that look like a loop of queries
+N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_PROFILER_N_PLUS_ONE", default="5"))
+SLOWEST = 3
+# Statements are cut to this many characters in headers and logs
+STATEMENT_LENGTH = 300
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"\bIN \((?:\s*%s\s*,)*\s*%s\s*\)", re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+def fingerprint(sql: str) -> str:
+    """The statement without its values, so the runs of one statement in a loop match."""
+
+    sql = _LITERALS.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+
+    return _SPACES.sub(" ", sql).strip()
+
+@dataclass
+class QueryProfile:
+    count: int = 0
+    seconds: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+    # min-heap of (seconds, statement), the slowest stay
+    slowest: list[tuple[float, str]] = field(default_factory=list)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+
+            self.count += 1
+            self.seconds += elapsed
+            self.fingerprints[fingerprint(sql)] += 1
+
+            if len(self.slowest) < SLOWEST:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+    @property
+    def duplicates(self) -> int:
+        return sum(runs - 1 for runs in self.fingerprints.values())
+
+    def repeated(self, threshold: int = 2) -> list[tuple[int, str]]:
+        """Statements run `threshold` times or more, the most repeated first."""
+
+        return [(runs, statement) for statement, runs in self.fingerprints.most_common() if runs >= threshold]
+
+    def summary(self) -> dict:
+        return {
+            "queries": self.count,
+            "db_ms": round(self.seconds * 1000, 2),
+            "duplicates": self.duplicates,
+            "repeated": [
+                {"runs": runs, "sql": statement[:STATEMENT_LENGTH]} for runs, statement in self.repeated()[:SLOWEST]
+            ],
+            "slowest": [
+                {"ms": round(seconds * 1000, 2), "sql": statement[:STATEMENT_LENGTH]}
+                for seconds, statement in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+@contextmanager
+def profile_queries() -> Iterator[QueryProfile]:
+    profile = QueryProfile()
+    with connection.execute_wrapper(profile):
+        yield profile
+
+@contextmanager
+def query_budget(budget: int) -> Iterator[QueryProfile]:
+    """Fail with the profile when the block runs more than `budget` queries.
+
+        with query_budget(3):
+            response = client.get("/food/dishes/")
+    """
+
+    with profile_queries() as profile:
+        yield profile
+
+    if profile.count > budget:
+        lines = [f"{profile.count} queries, the budget is {budget}."]
+        lines += [f"  {runs}x {statement}" for runs, statement in profile.repeated()]
+        if len(lines) == 1:
+            lines += [f"  {statement}" for statement in profile.fingerprints]
+
+        raise AssertionError("\n".join(lines))
+
+class QueryProfilerMiddleware:
+    """Profiles the queries of sync requests, async ones pass through."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_PROFILER:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if self.async_mode:
+            return self.get_response(request)
+
+        with profile_queries() as profile:
+            response = self.get_response(request)
+
+        if settings.DEBUG:
+            self._headers(response, profile)
+        else:
+            self._log(request, profile)
+
+        return response
+
+    @staticmethod
+    def _headers(response: HttpResponse, profile: QueryProfile) -> None:
+        response["X-DB-Queries"] = str(profile.count)
+        response["X-DB-Time"] = f"{profile.seconds * 1000:.2f}"
+        response["X-DB-Duplicates"] = str(profile.duplicates)
+        if profile.slowest:
+            response["X-DB-Slowest"] = f"{max(profile.slowest)[0] * 1000:.2f}"
+
+    @staticmethod
+    def _log(request: HttpRequest, profile: QueryProfile) -> None:
+        suspects = profile.repeated(N_PLUS_ONE_THRESHOLD)
+        if not suspects and random.random() >= settings.QUERY_PROFILER_SAMPLE_RATE:
+            return
+
+        extra = {"path": request.path, "method": request.method, **profile.summary()}
+        if suspects:
+            logger.warning("db.n_plus_one", extra=extra)
+        else:
+            logger.info("db.profile", extra=extra)
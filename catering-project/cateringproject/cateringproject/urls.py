@@ -1,20 +1,24 @@
-from django.contrib import admin
-from django.urls import path, include
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-)
-from users.views import router as users_router
-from food.views import router as food_router
-from food.views import import_dishes, kfc_webhook
-
-urlpatterns = [
-    path("admin/food/dish/import-dishes/", import_dishes, name="import_dishes"),
-    path('admin/', admin.site.urls),
-    path('auth/token/', TokenObtainPairView.as_view(), name='obtain_token'),
-    path("users/", include(users_router.urls)),
-    path("food/", include(food_router.urls)),
-    path(
-        "webhooks/kfc/5834eb6c-63b9-4018-b6d3-04e170278ec2/",
-        kfc_webhook,
-    ),
-]
+from django.contrib import admin
+from django.urls import path, include
+from rest_framework_simplejwt.views import (
+    TokenObtainPairView,
+)
+from users.views import router as users_router
+from food.views import router as food_router
+from food.views import import_dishes, import_dishes_status, kfc_webhook, order_tracking_stream
+from .metrics import metrics_view
+
+urlpatterns = [
+    path("admin/food/dish/import-dishes/", import_dishes, name="import_dishes"),
+    path("admin/food/dish/import-dishes/<uuid:import_id>/", import_dishes_status, name="import_dishes_status"),
+    path('admin/', admin.site.urls),
+    path('auth/token/', TokenObtainPairView.as_view(), name='obtain_token'),
+    path("metrics", metrics_view, name="metrics"),
+    path("users/", include(users_router.urls)),
+    path("food/orders/<int:order_id>/tracking/", order_tracking_stream, name="order_tracking_stream"),
+    path("food/", include(food_router.urls)),
+    path(
+        "webhooks/kfc/5834eb6c-63b9-4018-b6d3-04e170278ec2/",
+        kfc_webhook,
+    ),
+]
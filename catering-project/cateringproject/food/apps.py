@@ -1,6 +1,12 @@
-from django.apps import AppConfig
-
-
-class FoodConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'food'
+from django.apps import AppConfig
+
+
+class FoodConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'food'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # Celery autodiscovery only looks into `tasks` modules
+        from . import dish_import, services  # noqa: F401
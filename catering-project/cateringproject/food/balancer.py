@@ -0,0 +1,179 @@
+"""Choice of the delivery provider for every delivery.
+
+Each provider has rolling stats in the `provider_stats:<name>` Redis hash: the
+latency and the error rate of its calls, smoothed over the last calls. The calls
+in flight are the live leases of `food.routing`. A delivery goes to the healthy
+providers in the order of the strategy and falls through to the next one when a
+provider is throttled or fails, so deliveries do not queue behind a slow provider.
+
+Strategies (`DELIVERY_SELECTION`):
+    least_loaded - the provider with the smallest share of its in-flight limit used
+    latency      - random, weighted by the inverse of the expected wait (latency x calls in flight)
+"""
+
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+import httpx
+
+from shared.cache import CacheService
+
+from .enums import DeliveryProvider
+from .providers import uber, uklon
+from .providers.resilience import CircuitOpen
+from .routing import PROVIDER_LIMITS, Throttled, provider_slot
+
+DELIVERY_CLIENTS = {
+    DeliveryProvider.UKLON: uklon,
+    DeliveryProvider.UBER: uber,
+}
+
+STRATEGY = os.getenv("DELIVERY_SELECTION", default="least_loaded")
+# Weight of the newest call in the rolling latency and error rate
+SMOOTHING = float(os.getenv("DELIVERY_STATS_SMOOTHING", default="0.2"))
+# Providers that fail more calls than this are tried last
+MAX_ERROR_RATE = float(os.getenv("DELIVERY_MAX_ERROR_RATE", default="0.5"))
+# Stats of a provider without calls for this many seconds are forgotten
+STATS_TTL = 600
+# Seconds assumed for a provider without stats yet
+DEFAULT_LATENCY = 0.5
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] - stats hash, ARGV[1] - call seconds, ARGV[2] - 1 if the call failed,
+# ARGV[3] - smoothing, ARGV[4] - TTL (s). Updates the exponential moving averages.
+RECORD_SCRIPT = """
+local alpha = tonumber(ARGV[3])
+local latency = tonumber(redis.call('HGET', KEYS[1], 'latency') or ARGV[1])
+local errors = tonumber(redis.call('HGET', KEYS[1], 'error_rate') or ARGV[2])
+
+latency = latency + alpha * (tonumber(ARGV[1]) - latency)
+errors = errors + alpha * (tonumber(ARGV[2]) - errors)
+
+redis.call('HSET', KEYS[1], 'latency', tostring(latency), 'error_rate', tostring(errors))
+redis.call('HINCRBY', KEYS[1], 'calls', 1)
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return 1
+"""
+
+@dataclass
+class ProviderStats:
+    name: str
+    capacity: int
+    in_flight: int = 0
+    latency: float = 0.0
+    error_rate: float = 0.0
+    calls: int = 0
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / self.capacity
+
+    @property
+    def healthy(self) -> bool:
+        return self.in_flight < self.capacity and self.error_rate <= MAX_ERROR_RATE
+
+    @property
+    def expected_wait(self) -> float:
+        return (self.latency if self.calls else DEFAULT_LATENCY) * (1 + self.in_flight)
+
+def provider_stats(providers: list[str], cache: CacheService | None = None) -> list[ProviderStats]:
+    """Current stats of the providers, two round trips for all of them."""
+
+    cache = cache or CacheService()
+    leases = cache.hgetall_many("providers", providers)
+    samples = cache.hgetall_many("provider_stats", providers)
+    now = time.time() * 1000
+
+    results = []
+    for name in providers:
+        # besides the leases the hash has the token bucket fields
+        in_flight = sum(
+            1 for field, expires in leases[name].items() if field not in ("tokens", "updated") and expires >= now
+        )
+        results.append(ProviderStats(name, PROVIDER_LIMITS[name].max_in_flight, in_flight, **samples[name]))
+
+    return results
+
+def rank_providers(stats: list[ProviderStats], strategy: str = STRATEGY, rng: random.Random = random) -> list[str]:
+    """Providers in the order to try them: the healthy ones by the strategy, then the rest by load."""
+
+    healthy = [item for item in stats if item.healthy]
+    rest = sorted(
+        (item for item in stats if not item.healthy),
+        key=lambda item: (item.error_rate > MAX_ERROR_RATE, item.load),
+    )
+
+    if strategy == "latency":
+        # weighted shuffle: the bigger the weight, the likelier a provider goes first
+        def key(item: ProviderStats) -> float:
+            weight = max(1 - item.error_rate, 0.01) / max(item.expected_wait, 0.001)
+            return rng.random() ** (1 / weight)
+
+        healthy.sort(key=key, reverse=True)
+    elif strategy == "least_loaded":
+        healthy.sort(key=lambda item: (item.load, item.expected_wait))
+    else:
+        raise ValueError(f"Unknown delivery selection strategy: {strategy}")
+
+    return [item.name for item in healthy + rest]
+
+def _record(provider: str, started: float, failed: int, cache: CacheService | None) -> None:
+    (cache or CacheService()).run_script(
+        RECORD_SCRIPT, "provider_stats", provider, time.perf_counter() - started, failed, SMOOTHING, STATS_TTL
+    )
+
+@contextmanager
+def record_call(provider: str, cache: CacheService | None = None) -> Iterator[None]:
+    """Add the duration and the outcome of one call to the provider stats."""
+
+    started = time.perf_counter()
+
+    try:
+        yield
+    except CircuitOpen:
+        # nothing was sent, the breaker has the stats of the failures
+        raise
+    except Exception:
+        _record(provider, started, 1, cache)
+        raise
+
+    _record(provider, started, 0, cache)
+
+def place_delivery(addresses: list[str], comments: list[str]):
+    """Create the delivery with the best available provider.
+
+    Returns the provider and its response. Raises `Throttled` or `CircuitOpen` with
+    the shortest wait if any provider is only unavailable for now, otherwise the last
+    error of the failed ones.
+    """
+
+    cache = CacheService()
+    throttled: list[Throttled | CircuitOpen] = []
+    error: httpx.HTTPError | None = None
+
+    for provider in rank_providers(provider_stats(list(DELIVERY_CLIENTS), cache)):
+        client = DELIVERY_CLIENTS[provider]
+
+        try:
+            with provider_slot(provider, cache), record_call(provider, cache):
+                response = client.Client.create_order(client.OrderRequestBody(addresses=addresses, comments=comments))
+        except (Throttled, CircuitOpen) as exc:
+            throttled.append(exc)
+            continue
+        except httpx.HTTPError as exc:
+            logger.warning("delivery.provider_failed", extra={"provider": provider, "error": repr(exc)})
+            error = exc
+            continue
+
+        return provider, response
+
+    if throttled:
+        raise min(throttled, key=lambda exc: exc.retry_after)
+
+    raise error
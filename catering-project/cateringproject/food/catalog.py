@@ -0,0 +1,50 @@
+from urllib.parse import urlencode
+
+from django.db.models import Prefetch
+from rest_framework.request import Request
+
+from shared.cache import CacheService
+
+from .filters import RestaurantFilters
+from .models import Dish, Restaurant
+from .search import matching_dishes
+from .serializers import RestaurantSerializer
+
+# Cached catalog pages live this long even without invalidation
+CATALOG_TTL = 60
+
+def _params_key(request: Request) -> str:
+    return urlencode(sorted((key, value) for key, values in request.query_params.lists() for value in values))
+
+def build_catalog(request: Request) -> list[dict]:
+    """Restaurants with their dishes, two queries for any number of restaurants."""
+
+    dishes = Dish.objects.order_by("pk")
+
+    search_query = request.query_params.get('search')
+    if search_query:
+        dishes = dishes.filter(pk__in=matching_dishes(search_query).values("pk"))
+
+    restaurants = Restaurant.objects.prefetch_related(Prefetch("dishes", queryset=dishes))
+    filtered_queryset = RestaurantFilters(request.GET, queryset=restaurants).qs
+
+    return RestaurantSerializer(filtered_queryset, many=True, context={"request": request}).data
+
+def get_catalog(request: Request) -> list[dict]:
+    """Catalog page for the query params of the request, cached until any dish or restaurant changes."""
+
+    cache = CacheService()
+    version: int = cache.get_counter("catalog", "version")
+
+    return cache.get_or_set(
+        "catalog",
+        f"{version}:{_params_key(request)}",
+        lambda: build_catalog(request),
+        ttl=CATALOG_TTL,
+    )
+
+def invalidate_catalog() -> int:
+    """Bump the catalog version and return the new one."""
+
+    # old pages are not deleted, they are never read again and expire by TTL
+    return CacheService().incr("catalog", "version")
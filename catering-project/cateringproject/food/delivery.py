@@ -0,0 +1,105 @@
+"""Delivery batching: cooked orders that are close and due the same day share one courier.
+
+Deliveries are grouped by ETA and by the grid cell of their pickups, ordered along
+a Z-order curve inside a group, and cut into batches of limited stops and orders.
+The stops of a batch are ordered with nearest neighbour plus 2-opt.
+Planning is O(n log n) in deliveries, routes are small.
+"""
+
+import os
+from dataclasses import dataclass, field
+from datetime import date
+from itertools import groupby
+
+from shared import geo
+
+# Seconds cooked orders wait for others to share a courier with
+DELIVERY_WINDOW = float(os.getenv("DELIVERY_BATCH_WINDOW", default="5"))
+# Limits of one courier route
+MAX_STOPS = int(os.getenv("DELIVERY_MAX_STOPS", default="6"))
+MAX_ORDERS = int(os.getenv("DELIVERY_MAX_ORDERS", default="4"))
+# Side of the grid cells that group nearby pickups
+CELL_KM = float(os.getenv("DELIVERY_CELL_KM", default="3"))
+
+@dataclass(frozen=True)
+class Stop:
+    name: str
+    address: str
+    point: geo.Point | None = None
+
+@dataclass
+class Delivery:
+    order_id: int
+    eta: date
+    stops: tuple[Stop, ...]
+    priority: int = 0
+
+    @property
+    def located(self) -> bool:
+        return bool(self.stops) and all(stop.point is not None for stop in self.stops)
+
+    @property
+    def center(self) -> geo.Point:
+        return geo.centroid([stop.point for stop in self.stops])
+
+@dataclass
+class Batch:
+    deliveries: list[Delivery] = field(default_factory=list)
+    stops: list[Stop] = field(default_factory=list)
+
+    @property
+    def order_ids(self) -> list[int]:
+        return [delivery.order_id for delivery in self.deliveries]
+
+    @property
+    def priority(self) -> int:
+        return max(delivery.priority for delivery in self.deliveries)
+
+    def fits(self, delivery: Delivery) -> bool:
+        new_stops = set(delivery.stops) - set(self.stops)
+        return len(self.deliveries) < MAX_ORDERS and len(self.stops) + len(new_stops) <= MAX_STOPS
+
+    def add(self, delivery: Delivery) -> None:
+        self.deliveries.append(delivery)
+        self.stops.extend(stop for stop in delivery.stops if stop not in self.stops)
+
+    def route(self) -> None:
+        """Put the stops into a short visiting order."""
+
+        if all(stop.point is not None for stop in self.stops):
+            self.stops = [self.stops[index] for index in geo.plan_route([stop.point for stop in self.stops])]
+
+def _group_key(delivery: Delivery) -> tuple:
+    if not delivery.located:
+        # without coordinates only orders with the very same pickups are batched
+        return delivery.eta, None, tuple(sorted(stop.address for stop in delivery.stops))
+
+    latitude, longitude = delivery.center
+    step = CELL_KM / geo.KM_PER_DEGREE
+
+    return delivery.eta, int(latitude // step), int(longitude // step)
+
+def _sort_key(delivery: Delivery) -> tuple:
+    group = _group_key(delivery)
+    position = geo.z_order(delivery.center) if delivery.located else 0
+
+    return str(group), position
+
+def plan_batches(deliveries: list[Delivery]) -> list[Batch]:
+    batches: list[Batch] = []
+
+    for _, group in groupby(sorted(deliveries, key=_sort_key), key=lambda delivery: _sort_key(delivery)[0]):
+        batch = Batch()
+
+        for delivery in group:
+            if batch.deliveries and not batch.fits(delivery):
+                batches.append(batch)
+                batch = Batch()
+            batch.add(delivery)
+
+        batches.append(batch)
+
+    for batch in batches:
+        batch.route()
+
+    return batches
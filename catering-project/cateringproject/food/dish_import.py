@@ -0,0 +1,149 @@
+import csv
+import io
+import logging
+import os
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import BinaryIO, Callable
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+
+from cateringproject.celery import app as celery_app
+from shared.cache import CacheService
+
+from .catalog import invalidate_catalog
+from .models import Dish, Restaurant
+
+# Rows inserted by one bulk_create
+IMPORT_CHUNK_SIZE = int(os.getenv("DISH_IMPORT_CHUNK_SIZE", default="1000"))
+# Uploads larger than this (bytes) are imported by a Celery task instead of the admin request
+IMPORT_ASYNC_THRESHOLD = int(os.getenv("DISH_IMPORT_ASYNC_THRESHOLD", default=str(2 * 1024 * 1024)))
+# Row errors kept in the report, the rest are only counted
+IMPORT_MAX_ERRORS = 100
+IMPORT_TTL = 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ImportReport:
+    status: str = "running"
+    imported: int = 0
+    failed: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    def add_error(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+class RestaurantLookup:
+    """Restaurant ids by the names used in supplier files, loaded with one query.
+
+    A name matches a restaurant exactly or as a part of its name, case-insensitive.
+    """
+
+    def __init__(self):
+        self.restaurants: dict[str, int] = {
+            name.lower(): pk for pk, name in Restaurant.objects.values_list("pk", "name")
+        }
+        self._resolved: dict[str, int | None] = {}
+
+    def __getitem__(self, name: str) -> int:
+        name = name.strip().lower()
+
+        if name not in self._resolved:
+            pk = self.restaurants.get(name)
+            if pk is None:
+                pk = next((pk for full_name, pk in self.restaurants.items() if name and name in full_name), None)
+            self._resolved[name] = pk
+
+        if self._resolved[name] is None:
+            raise KeyError(f"Restaurant {name!r} not found")
+
+        return self._resolved[name]
+
+def import_dishes_csv(
+    stream: BinaryIO,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    on_progress: Callable[[ImportReport], None] | None = None,
+) -> ImportReport:
+    """Import dishes from a CSV with `name`, `price` and `restaurant` columns.
+
+    The file is decoded while it is read, rows are inserted in chunks in one transaction.
+    Invalid rows are reported and skipped.
+    """
+
+    report = ImportReport()
+    restaurants = RestaurantLookup()
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    batch: list[Dish] = []
+
+    with transaction.atomic():
+        # line 1 is the header
+        for line, row in enumerate(reader, start=2):
+            try:
+                name = (row.get("name") or "").strip()
+                if not name:
+                    raise ValueError("Dish name is empty")
+
+                price = int(row.get("price") or "")
+                if price < 0:
+                    raise ValueError("Price must not be negative")
+
+                restaurant_id = restaurants[row.get("restaurant") or ""]
+            except (KeyError, ValueError) as error:
+                report.add_error(line, str(error.args[0]) if error.args else repr(error))
+                continue
+
+            batch.append(Dish(name=name, price=price, restaurant_id=restaurant_id))
+
+            if len(batch) >= chunk_size:
+                Dish.objects.bulk_create(batch)
+                report.imported += len(batch)
+                batch.clear()
+
+                if on_progress is not None:
+                    on_progress(report)
+
+        Dish.objects.bulk_create(batch)
+        report.imported += len(batch)
+
+    # bulk_create sends no signals
+    invalidate_catalog()
+
+    report.status = "done"
+    logger.info("dishes.imported", extra={"imported": report.imported, "failed": report.failed})
+
+    return report
+
+def start_import(csv_file: UploadedFile) -> str:
+    """Save the upload and import it in the background. Returns the import id for `get_import`."""
+
+    import_id = str(uuid.uuid4())
+    path = default_storage.save(f"imports/{import_id}.csv", csv_file)
+
+    CacheService().set("imports", import_id, asdict(ImportReport()), ttl=IMPORT_TTL)
+    import_dishes_task.delay(import_id, path)
+
+    return import_id
+
+def get_import(import_id: str) -> dict | None:
+    return CacheService().get("imports", import_id)
+
+@celery_app.task(queue="low_priority")
+def import_dishes_task(import_id: str, path: str):
+    cache = CacheService()
+
+    def save(report: ImportReport) -> None:
+        cache.set("imports", import_id, asdict(report), ttl=IMPORT_TTL)
+
+    try:
+        with default_storage.open(path, "rb") as stream:
+            save(import_dishes_csv(stream, on_progress=save))
+    except Exception:
+        save(ImportReport(status="failed"))
+        raise
+    finally:
+        default_storage.delete(path)
@@ -0,0 +1,76 @@
+import csv
+import json
+from typing import Iterable, Iterator
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+from .models import Dish, Order
+
+# Rows fetched from the database cursor at once, also rows per written chunk
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORTS: dict[str, tuple[type, tuple[str, ...]]] = {
+    "dishes": (Dish, ("id", "name", "price", "restaurant_id")),
+    "orders": (Order, ("id", "user_id", "status", "delivery_provider", "eta", "total")),
+}
+
+class _Echo:
+    """File-like object for `csv.writer` that returns the line instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+def _rows(queryset: QuerySet, fields: tuple[str, ...], since_id: int) -> Iterator[tuple]:
+    # values_list skips model instances, iterator() streams with a server-side cursor on PostgreSQL
+    return (
+        queryset.filter(pk__gt=since_id)
+        .order_by("pk")
+        .values_list(*fields)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+def _chunks(lines: Iterable[str]) -> Iterator[str]:
+    chunk: list[str] = []
+
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk.clear()
+
+    if chunk:
+        yield "".join(chunk)
+
+def _csv_lines(fields: tuple[str, ...], rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+def _ndjson_lines(fields: tuple[str, ...], rows: Iterable[tuple]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), default=str) + "\n"
+
+FORMATS = {
+    "csv": ("text/csv", _csv_lines),
+    "ndjson": ("application/x-ndjson", _ndjson_lines),
+}
+
+def export_response(table: str, output: str, since_id: int = 0) -> StreamingHttpResponse:
+    """Stream the whole table (rows with `id > since_id`) ordered by id.
+
+    Memory stays flat: rows go from the cursor to the client chunk by chunk.
+    """
+
+    model, fields = EXPORTS[table]
+    content_type, lines = FORMATS[output]
+
+    response = StreamingHttpResponse(
+        _chunks(lines(fields, _rows(model.objects.all(), fields, since_id))),
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f'attachment; filename="{table}.{output}"'
+
+    return response
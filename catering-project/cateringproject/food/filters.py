@@ -0,0 +1,8 @@
+from django_filters import rest_framework
+
+from .models import Restaurant
+
+class RestaurantFilters(rest_framework.FilterSet):
+    class Meta:
+        model = Restaurant
+        fields = ['name']
@@ -0,0 +1,20 @@
+import os
+import socket
+
+from django.core.management.base import BaseCommand
+
+from food.webhooks import consume_kfc_events
+
+class Command(BaseCommand):
+    help = "Apply provider webhook events from the Redis stream"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--consumer",
+            default=f"{socket.gethostname()}-{os.getpid()}",
+            help="Consumer name in the group, unique per running process",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Consuming KFC webhooks as {options['consumer']}")
+        consume_kfc_events(options["consumer"])
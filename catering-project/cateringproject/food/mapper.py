@@ -1,16 +1,30 @@
-from .enums import OrderStatus
-from .providers import kfc, silpo
-
-RESTAURANT_EXTERNAL_TO_INTERNAL: dict[str, dict[str, OrderStatus]] = {
-    "silpo": {
-        silpo.OrderStatus.NOT_STARTED: OrderStatus.NOT_STARTED,
-        silpo.OrderStatus.COOKING: OrderStatus.COOKING,
-        silpo.OrderStatus.COOKED: OrderStatus.COOKED,
-        silpo.OrderStatus.FINISHED: OrderStatus.FINISHED,
-    },
-    "kfc": {
-        kfc.OrderStatus.NOT_STARTED: OrderStatus.NOT_STARTED,
-        kfc.OrderStatus.COOKING: OrderStatus.COOKING,
-        kfc.OrderStatus.COOKED: OrderStatus.COOKED,
-    },
-}
\ No newline at end of file
+from .enums import OrderStatus
+from .providers import kfc, silpo, uber, uklon
+
+RESTAURANT_EXTERNAL_TO_INTERNAL: dict[str, dict[str, OrderStatus]] = {
+    "silpo": {
+        silpo.OrderStatus.NOT_STARTED: OrderStatus.NOT_STARTED,
+        silpo.OrderStatus.COOKING: OrderStatus.COOKING,
+        silpo.OrderStatus.COOKED: OrderStatus.COOKED,
+        silpo.OrderStatus.FINISHED: OrderStatus.FINISHED,
+    },
+    "kfc": {
+        kfc.OrderStatus.NOT_STARTED: OrderStatus.NOT_STARTED,
+        kfc.OrderStatus.COOKING: OrderStatus.COOKING,
+        kfc.OrderStatus.COOKED: OrderStatus.COOKED,
+    },
+}
+
+DELIVERY_EXTERNAL_TO_INTERNAL: dict[str, dict[str, OrderStatus]] = {
+    "uklon": {
+        uklon.OrderStatus.NOT_STARTED: OrderStatus.DELIVERY,
+        uklon.OrderStatus.DELIVERY: OrderStatus.DELIVERY,
+        uklon.OrderStatus.DELIVERED: OrderStatus.DELIVERED,
+    },
+    "uber": {
+        uber.OrderStatus.PENDING: OrderStatus.DELIVERY,
+        uber.OrderStatus.PICKUP: OrderStatus.DELIVERY,
+        uber.OrderStatus.DROPOFF: OrderStatus.DELIVERY,
+        uber.OrderStatus.DELIVERED: OrderStatus.DELIVERED,
+    },
+}
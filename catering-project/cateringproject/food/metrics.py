@@ -0,0 +1,42 @@
+"""Metrics of the order pipeline, rendered at `/metrics` (see `shared.metrics`)."""
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+from shared.cache import CacheService
+from shared.metrics import LATENCY_BUCKETS, ScrapeCollector, register_collector
+
+CREATE_ORDER_SECONDS = Histogram(
+    "food_create_order_seconds",
+    "Order creation in the API, from validation to scheduling.",
+    ("endpoint",),
+    buckets=LATENCY_BUCKETS,
+)
+SCHEDULE_ORDER_SECONDS = Histogram(
+    "food_schedule_order_seconds", "Scheduling of the restaurant calls of an order.", buckets=LATENCY_BUCKETS
+)
+WEBHOOK_SECONDS = Histogram(
+    "food_webhook_seconds",
+    "Provider webhooks: accepted by the API, then applied by the consumer.",
+    ("provider", "stage"),
+    buckets=LATENCY_BUCKETS,
+)
+ORDER_STATUSES = Counter("food_orders_status_total", "Orders moved into the status.", ("status",))
+
+class TrackedLegsCollector(ScrapeCollector):
+    """External orders followed by the tracking poller, read from its Redis hashes."""
+
+    def read(self):
+        # the providers are known once the tasks module is loaded, it imports this one
+        from .services import LEG_POLLERS
+
+        cache = CacheService()
+        legs = GaugeMetricFamily(
+            "food_tracked_legs", "External orders followed by the tracking poller.", labels=("provider",)
+        )
+        for provider in LEG_POLLERS:
+            legs.add_metric((provider,), cache.hlen("tracking", provider))
+
+        yield legs
+
+TRACKED_LEGS = register_collector(TrackedLegsCollector())
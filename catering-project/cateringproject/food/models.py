@@ -1,85 +1,106 @@
-from django.db import models
-from django.conf import settings
-from .enums import OrderStatus
-
-# Create your models here.
-class Restaurant(models.Model):
-    class Meta:
-        db_table = "restaurants"
-
-    name = models.CharField(max_length=255, null=False)
-    address = models.TextField(null=False)
-
-    def __str__(self) -> str:
-        return self.name
-
-class Dish(models.Model):
-    class Meta:
-        db_table = "dishes"
-
-    name = models.CharField(max_length=255, null=False)
-    price = models.PositiveIntegerField(null=False)
-    restaurant = models.ForeignKey("Restaurant", on_delete=models.CASCADE, related_name="dishes")
-
-    def __str__(self) -> str:
-        return self.name
-
-class Order(models.Model):
-    class Meta:
-        db_table = "orders"
-
-    user = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
-    )
-    status = models.CharField(
-        max_length=25,
-        choices=OrderStatus.choices,
-        default=OrderStatus.NOT_STARTED,
-    )
-    delivery_provider = models.CharField(max_length=255, null=True, blank=True)
-    eta = models.DateField()
-    total = models.PositiveIntegerField(null=True, blank=True)
-
-    def __str__(self) -> str:
-        return f"[{self.pk}] {self.status} for {self.user.email}"
-
-    def items_by_restaurant(self) -> dict["Restaurant", models.QuerySet["OrderItem"]]:
-        results = {}
-
-        qs = self.items.select_related('dish__restaurant')
-
-        restaurants = {item.dish.restaurant for item in qs}
-
-        for restaurant in restaurants:
-            results[restaurant] = qs.filter(dish__restaurant=restaurant)
-
-        return results
-
-    def delivery_meta(self) -> tuple[str, str]:
-        return (
-            self.items.select_related("dish__restaurant").values_list(
-                "dish__restaurant",
-                "dish__restaurant__address",
-            ).distinct()
-        )
-
-
-
-class OrderItem(models.Model):
-    class Meta:
-        db_table = "order_items"
-
-    order = models.ForeignKey(
-        "Order",
-        on_delete=models.CASCADE,
-        related_name="items",
-    )
-    dish = models.ForeignKey(
-        "Dish",
-        on_delete=models.CASCADE,
-    )
-    quantity = models.SmallIntegerField()
-
-    def __str__(self) -> str:
-        return f"[{self.order.pk}] {self.dish.name}: {self.quantity}"
+from functools import cached_property
+
+from django.db import models
+from django.conf import settings
+from .enums import OrderStatus
+
+# Create your models here.
+class Restaurant(models.Model):
+    class Meta:
+        db_table = "restaurants"
+
+    name = models.CharField(max_length=255, null=False)
+    address = models.TextField(null=False)
+    # pickup point for delivery batching (`food.delivery`)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return self.name
+
+def _dish_indexes() -> list[models.Index]:
+    # full-text index for `food.search`, other databases search with an in-memory index
+    if settings.DATABASES["default"]["ENGINE"] != "django.db.backends.postgresql":
+        return []
+
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return [GinIndex(SearchVector("name", config="simple"), name="dishes_name_search_idx")]
+
+class Dish(models.Model):
+    class Meta:
+        db_table = "dishes"
+        indexes = _dish_indexes()
+
+    name = models.CharField(max_length=255, null=False)
+    price = models.PositiveIntegerField(null=False)
+    restaurant = models.ForeignKey("Restaurant", on_delete=models.CASCADE, related_name="dishes")
+
+    def __str__(self) -> str:
+        return self.name
+
+class Order(models.Model):
+    class Meta:
+        db_table = "orders"
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    status = models.CharField(
+        max_length=25,
+        choices=OrderStatus.choices,
+        default=OrderStatus.NOT_STARTED,
+    )
+    delivery_provider = models.CharField(max_length=255, null=True, blank=True)
+    eta = models.DateField()
+    total = models.PositiveIntegerField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"[{self.pk}] {self.status} for {self.user.email}"
+
+    @cached_property
+    def loaded_items(self) -> list["OrderItem"]:
+        """Items of the order with their dishes and restaurants, loaded with one query."""
+
+        return list(self.items.select_related("dish__restaurant"))
+
+    def items_by_restaurant(self) -> dict["Restaurant", tuple[dict, ...]]:
+        """Items grouped by restaurant, ready to be sent as task payloads."""
+
+        results: dict[Restaurant, list[dict]] = {}
+
+        for item in self.loaded_items:
+            results.setdefault(item.dish.restaurant, []).append(
+                {"id": item.pk, "dish__name": item.dish.name, "quantity": item.quantity}
+            )
+
+        return {restaurant: tuple(items) for restaurant, items in results.items()}
+
+    def delivery_meta(self) -> list[tuple[str, str]]:
+        """Name and address of every restaurant the order is picked up from."""
+
+        restaurants = dict.fromkeys(item.dish.restaurant for item in self.loaded_items)
+
+        return [(restaurant.name, restaurant.address) for restaurant in restaurants]
+
+
+
+class OrderItem(models.Model):
+    class Meta:
+        db_table = "order_items"
+
+    order = models.ForeignKey(
+        "Order",
+        on_delete=models.CASCADE,
+        related_name="items",
+    )
+    dish = models.ForeignKey(
+        "Dish",
+        on_delete=models.CASCADE,
+    )
+    quantity = models.SmallIntegerField()
+
+    def __str__(self) -> str:
+        return f"[{self.order.pk}] {self.dish.name}: {self.quantity}"
@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+
+from shared.payloads import Payload, register
+
+@register("food.delivery")
+@dataclass(frozen=True)
+class DeliveryPayload(Payload):
+    """One courier route for several orders, the stops are already in visiting order."""
+
+    order_ids: list[int]
+    addresses: list[str]
+    comments: list[str]
+
+@register("food.restaurant_order")
+@dataclass(frozen=True)
+class RestaurantOrderPayload(Payload):
+    """Order items of one restaurant, the worker reads the items by their ids."""
+
+    order_id: int
+    item_ids: list[int]
+
+@register("food.order_lines")
+@dataclass(frozen=True)
+class OrderLinesPayload(Payload):
+    """Dish names and quantities for providers that need nothing else from the database."""
+
+    order_id: int
+    lines: list[tuple[str, int]]
+
+@register("food.order_batch")
+@dataclass(frozen=True)
+class OrderBatchPayload(Payload):
+    """Orders created by one batch request, scheduled by the worker."""
+
+    order_ids: list[int]
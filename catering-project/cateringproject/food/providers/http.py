@@ -0,0 +1,80 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("PROVIDERS_HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("PROVIDERS_HTTP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=float(os.getenv("PROVIDERS_HTTP_KEEPALIVE_EXPIRY", "30")),
+)
+TIMEOUT = httpx.Timeout(
+    float(os.getenv("PROVIDERS_HTTP_TIMEOUT", "5")),
+    connect=float(os.getenv("PROVIDERS_HTTP_CONNECT_TIMEOUT", "2")),
+)
+
+class ConnectionPool:
+    """Process-wide keep-alive pool shared by all provider clients.
+
+    The pool is an `httpx.AsyncClient` that lives on its own event loop thread.
+    Async callers await requests from any loop, sync callers block on the same
+    pool, so both variants reuse the same warm connections.
+    """
+
+    def __init__(self, limits: httpx.Limits = LIMITS, timeout: httpx.Timeout = TIMEOUT):
+        self.limits = limits
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._client: httpx.AsyncClient | None = None
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        # Celery prefork workers inherit the parent's memory but not its threads,
+        # so every process starts its own loop and connections.
+        if self._pid == os.getpid() and self._loop is not None:
+            return self._loop
+
+        with self._lock:
+            if self._pid != os.getpid() or self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="providers-http", daemon=True).start()
+
+                self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+                self._loop = loop
+                self._pid = os.getpid()
+
+        return self._loop
+
+    def _submit(self, coroutine: Coroutine[Any, Any, T]) -> Future[T]:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._start())
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        loop = self._start()
+
+        if asyncio.get_running_loop() is loop:
+            return await self._client.request(method, url, **kwargs)
+
+        return await asyncio.wrap_future(self._submit(self._client.request(method, url, **kwargs)))
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Run the coroutine on the pool loop and wait for the result."""
+
+        return self._submit(coroutine).result()
+
+    def close(self) -> None:
+        if self._loop is None or self._pid != os.getpid():
+            return
+
+        self.run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+        self._client = None
+
+pool = ConnectionPool()
@@ -1,40 +1,56 @@
-import enum
-import os
-from dataclasses import dataclass, asdict
-
-import httpx
-
-class OrderStatus(enum.StrEnum):
-    NOT_STARTED = "not started"
-    COOKING = "cooking"
-    COOKED = "cooked"
-    FINISHED = "finished"
-
-@dataclass
-class OrderItem:
-    dish: str
-    quantity: int
-
-@dataclass
-class OrderRequestBody:
-    order: list[OrderItem]
-
-@dataclass
-class OrderResponse:
-    id: str
-    status: OrderStatus
-
-class Client:
-    BASE_URL = os.getenv("KFC_BASE_URL", "http://kfc-mock:8001/api/orders")
-
-    @classmethod
-    def create_order(cls, order: OrderRequestBody):
-        response: httpx.Response = httpx.post(cls.BASE_URL, json=asdict(order))
-        response.raise_for_status()
-        return OrderResponse(**response.json())
-
-    @classmethod
-    def get_order(cls, order_id: str):
-        response: httpx.Response = httpx.get(f"{cls.BASE_URL}/{order_id}")
-        response.raise_for_status()
-        return OrderResponse(**response.json())
\ No newline at end of file
+import enum
+import os
+from dataclasses import dataclass, asdict
+
+import httpx
+
+from . import resilience
+from .http import pool
+
+class OrderStatus(enum.StrEnum):
+    NOT_STARTED = "not started"
+    COOKING = "cooking"
+    COOKED = "cooked"
+    FINISHED = "finished"
+
+@dataclass
+class OrderItem:
+    dish: str
+    quantity: int
+
+@dataclass
+class OrderRequestBody:
+    order: list[OrderItem]
+
+@dataclass
+class OrderResponse:
+    id: str
+    status: OrderStatus
+
+class AsyncClient:
+    BASE_URL = os.getenv("KFC_BASE_URL", "http://kfc-mock:8001/api/orders")
+
+    @classmethod
+    async def create_order(cls, order: OrderRequestBody):
+        response: httpx.Response = await resilience.request("kfc", "POST", cls.BASE_URL, json=asdict(order))
+        response.raise_for_status()
+        return OrderResponse(**response.json())
+
+    @classmethod
+    async def get_order(cls, order_id: str):
+        response: httpx.Response = await resilience.request("kfc", "GET", f"{cls.BASE_URL}/{order_id}", hedge=True)
+        response.raise_for_status()
+        return OrderResponse(**response.json())
+
+class Client:
+    """Sync facade over `AsyncClient`, it shares the same connection pool."""
+
+    BASE_URL = AsyncClient.BASE_URL
+
+    @classmethod
+    def create_order(cls, order: OrderRequestBody):
+        return pool.run(AsyncClient.create_order(order))
+
+    @classmethod
+    def get_order(cls, order_id: str):
+        return pool.run(AsyncClient.get_order(order_id))
\ No newline at end of file
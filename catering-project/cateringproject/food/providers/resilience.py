@@ -0,0 +1,283 @@
+"""Resilience of the provider calls: circuit breakers, retries and hedged reads.
+
+Every provider request goes through `request`:
+
+- a circuit breaker per provider, shared by all processes in the `breakers:<provider>`
+  Redis hash: after `BREAKER_FAILURES` failures within `BREAKER_WINDOW` seconds the
+  provider is cut off for `BREAKER_COOLDOWN` seconds, then a single probe decides
+  whether it is back. Calls to an open breaker fail at once with `CircuitOpen`;
+- bounded retries with exponential backoff and full jitter. Requests that are not
+  idempotent (creating an order) are retried only when they never reached the provider;
+- hedged reads: a status read that takes longer than `HEDGE_AFTER` seconds is sent
+  once more and the first response wins;
+- a latency histogram and event counters per provider.
+
+The breaker is read with one Redis call per attempt and written only on failures
+and probes. Redis being down never blocks the calls, the breaker is then closed.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+import weakref
+
+import httpx
+import redis.asyncio as aioredis
+from prometheus_client import Counter, Histogram
+
+from shared.metrics import LATENCY_BUCKETS
+
+from .http import TIMEOUT, pool
+
+BREAKER_FAILURES = int(os.getenv("PROVIDERS_BREAKER_FAILURES", default="5"))
+BREAKER_WINDOW = float(os.getenv("PROVIDERS_BREAKER_WINDOW", default="30"))
+BREAKER_COOLDOWN = float(os.getenv("PROVIDERS_BREAKER_COOLDOWN", default="15"))
+# Extra attempts after the first one
+RETRIES = int(os.getenv("PROVIDERS_RETRIES", default="2"))
+RETRY_BASE = float(os.getenv("PROVIDERS_RETRY_BASE", default="0.1"))
+RETRY_CAP = float(os.getenv("PROVIDERS_RETRY_CAP", default="2"))
+# Seconds before a slow read is sent again, 0 turns hedging off
+HEDGE_AFTER = float(os.getenv("PROVIDERS_HEDGE_AFTER", default="0.5"))
+# A probe that never reported back (killed worker) is replaced after this many seconds
+PROBE_TTL = TIMEOUT.connect + TIMEOUT.read
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Errors raised before the request was sent, safe to retry for any method
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] - breaker hash, ARGV[1] - probe TTL (ms).
+# Returns 0 when the call may go, -1 when it goes as the probe of a half-open
+# breaker, otherwise milliseconds until the breaker may let calls through.
+BREAKER_ALLOW_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local open_until = tonumber(redis.call('HGET', KEYS[1], 'open_until') or '0')
+if open_until == 0 then
+    return 0
+end
+if now < open_until then
+    return open_until - now
+end
+
+-- the cooldown is over: one probe at a time, a lost probe expires
+local probe = tonumber(redis.call('HGET', KEYS[1], 'probe') or '0')
+if probe > now then
+    return probe - now
+end
+
+redis.call('HSET', KEYS[1], 'probe', now + tonumber(ARGV[1]))
+return -1
+"""
+
+# KEYS[1] - breaker hash, ARGV[1] - 1 if the call failed, ARGV[2] - 1 if it was the probe,
+# ARGV[3] - failures that open the breaker, ARGV[4] - window (ms), ARGV[5] - cooldown (ms).
+# Returns 1 if the breaker has opened, -1 if it has closed, otherwise 0.
+BREAKER_RECORD_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local window, cooldown = tonumber(ARGV[4]), tonumber(ARGV[5])
+
+if ARGV[1] == '0' then
+    if ARGV[2] == '1' then
+        redis.call('DEL', KEYS[1])
+        return -1
+    end
+    return 0
+end
+
+local failures = 0
+local started = tonumber(redis.call('HGET', KEYS[1], 'window') or '0')
+if now - started < window then
+    failures = tonumber(redis.call('HGET', KEYS[1], 'failures') or '0')
+else
+    started = now
+end
+failures = failures + 1
+
+if ARGV[2] == '1' or failures >= tonumber(ARGV[3]) then
+    redis.call('HSET', KEYS[1], 'open_until', now + cooldown, 'failures', 0, 'window', now)
+    redis.call('HDEL', KEYS[1], 'probe')
+    redis.call('PEXPIRE', KEYS[1], cooldown * 2 + window)
+    return 1
+end
+
+redis.call('HSET', KEYS[1], 'failures', failures, 'window', started)
+if redis.call('PTTL', KEYS[1]) < window then
+    redis.call('PEXPIRE', KEYS[1], window)
+end
+return 0
+"""
+
+class CircuitOpen(httpx.HTTPError):
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"Provider {provider} circuit is open, retry in {retry_after:.2f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+PROVIDER_REQUEST_SECONDS = Histogram(
+    "provider_request_seconds",
+    "Provider requests, a hedged read counts once.",
+    ("provider", "outcome"),
+    buckets=LATENCY_BUCKETS,
+)
+PROVIDER_EVENTS = Counter(
+    "provider_events_total", "Retries, hedges and circuit breaker events of the provider requests.", ("provider", "event")
+)
+
+class BreakerStore:
+    def __init__(self, client: aioredis.Redis):
+        self.redis = client
+        self.allow_script = self.redis.register_script(BREAKER_ALLOW_SCRIPT)
+        self.record_script = self.redis.register_script(BREAKER_RECORD_SCRIPT)
+
+_stores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, BreakerStore] = weakref.WeakKeyDictionary()
+
+def get_store() -> BreakerStore:
+    """The store of the running event loop, async Redis connections cannot move between loops."""
+
+    loop = asyncio.get_running_loop()
+    if loop not in _stores:
+        _stores[loop] = BreakerStore(
+            aioredis.Redis.from_url(os.getenv("DJANGO_CACHE_URL", default="redis://localhost:6379/0"))
+        )
+
+    return _stores[loop]
+
+class CircuitBreaker:
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.key = f"breakers:{provider}"
+
+    async def allow(self) -> bool:
+        """Raise `CircuitOpen` if the provider is cut off. Returns True for the probe call."""
+
+        try:
+            wait = await get_store().allow_script(keys=[self.key], args=[int(PROBE_TTL * 1000)])
+        except aioredis.RedisError as error:
+            logger.warning("breaker.unavailable", extra={"provider": self.provider, "error": repr(error)})
+            return False
+
+        if wait > 0:
+            PROVIDER_EVENTS.labels(provider=self.provider, event="rejected").inc()
+            raise CircuitOpen(self.provider, wait / 1000)
+
+        return wait < 0
+
+    async def record(self, failed: bool, probe: bool) -> None:
+        if not failed and not probe:
+            return
+
+        try:
+            changed = await get_store().record_script(
+                keys=[self.key],
+                args=[
+                    int(failed),
+                    int(probe),
+                    BREAKER_FAILURES,
+                    int(BREAKER_WINDOW * 1000),
+                    int(BREAKER_COOLDOWN * 1000),
+                ],
+            )
+        except aioredis.RedisError as error:
+            logger.warning("breaker.unavailable", extra={"provider": self.provider, "error": repr(error)})
+            return
+
+        if changed > 0:
+            PROVIDER_EVENTS.labels(provider=self.provider, event="breaker_opened").inc()
+            logger.warning("breaker.opened", extra={"provider": self.provider, "cooldown": BREAKER_COOLDOWN})
+        elif changed < 0:
+            PROVIDER_EVENTS.labels(provider=self.provider, event="breaker_closed").inc()
+            logger.warning("breaker.closed", extra={"provider": self.provider})
+
+def _failed(response: httpx.Response | None, error: Exception | None) -> bool:
+    """Whether the outcome counts against the provider. Client errors (4xx) do not."""
+
+    return error is not None or response.status_code >= 500
+
+def _retryable(response: httpx.Response | None, error: Exception | None, idempotent: bool) -> bool:
+    if isinstance(error, NOT_SENT_ERRORS):
+        return True
+    if not idempotent:
+        return False
+
+    return isinstance(error, httpx.TransportError) or (response is not None and response.status_code in RETRY_STATUSES)
+
+def backoff(attempt: int) -> float:
+    """Full jitter: a random delay up to the exponential bound, so retries of many workers spread out."""
+
+    return random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2**attempt))
+
+async def _hedged(provider: str, method: str, url: str, **kwargs) -> httpx.Response:
+    first = asyncio.ensure_future(pool.request(method, url, **kwargs))
+    done, _ = await asyncio.wait({first}, timeout=HEDGE_AFTER)
+    if done:
+        return first.result()
+
+    PROVIDER_EVENTS.labels(provider=provider, event="hedge").inc()
+    second = asyncio.ensure_future(pool.request(method, url, **kwargs))
+    pending = {first, second}
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # a failed copy waits for the other one, the last error is raised
+                if task.exception() is None or not pending:
+                    if task is second and task.exception() is None:
+                        PROVIDER_EVENTS.labels(provider=provider, event="hedge_won").inc()
+                    return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def request(
+    provider: str,
+    method: str,
+    url: str,
+    *,
+    idempotent: bool | None = None,
+    hedge: bool = False,
+    **kwargs,
+) -> httpx.Response:
+    """Send a provider request through its breaker with retries.
+
+    `idempotent` defaults to True for GET, `hedge` is for reads only.
+    """
+
+    breaker = CircuitBreaker(provider)
+    idempotent = method == "GET" if idempotent is None else idempotent
+
+    attempt = 0
+    while True:
+        probe = await breaker.allow()
+
+        response: httpx.Response | None = None
+        error: Exception | None = None
+        started = time.perf_counter()
+        try:
+            if hedge and HEDGE_AFTER > 0 and not probe:
+                response = await _hedged(provider, method, url, **kwargs)
+            else:
+                response = await pool.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            error = exc
+
+        failed = _failed(response, error)
+        PROVIDER_REQUEST_SECONDS.labels(provider=provider, outcome="failed" if failed else "ok").observe(
+            time.perf_counter() - started
+        )
+        await breaker.record(failed, probe)
+
+        if attempt >= RETRIES or not _retryable(response, error, idempotent):
+            if error is not None:
+                raise error
+            return response
+
+        attempt += 1
+        PROVIDER_EVENTS.labels(provider=provider, event="retry").inc()
+        await asyncio.sleep(backoff(attempt))
@@ -0,0 +1,73 @@
+import enum
+import os
+from dataclasses import asdict, dataclass
+
+import httpx
+
+from . import resilience
+from .http import pool
+
+class OrderStatus(enum.StrEnum):
+    PENDING = "pending"
+    PICKUP = "pickup"
+    DROPOFF = "dropoff"
+    DELIVERED = "delivered"
+
+@dataclass
+class OrderRequestBody:
+    addresses: list[str]
+    comments: list[str]
+
+@dataclass
+class OrderResponse:
+    order_id: str
+    status: OrderStatus
+    location: tuple[float, float]
+    addresses: list[str]
+    comments: list[str]
+
+    @property
+    def id(self):
+        return self.order_id
+
+class AsyncClient:
+    BASE_URL = os.getenv("UBER_BASE_URL", "http://uber-mock:8004/v1/deliveries")
+
+    @classmethod
+    async def create_order(cls, order: OrderRequestBody):
+        response: httpx.Response = await resilience.request("uber", "POST", cls.BASE_URL, json=asdict(order))
+        response.raise_for_status()
+        return OrderResponse(**response.json())
+
+    @classmethod
+    async def get_order(cls, order_id: str):
+        response: httpx.Response = await resilience.request("uber", "GET", f"{cls.BASE_URL}/{order_id}", hedge=True)
+        response.raise_for_status()
+        return OrderResponse(**response.json())
+
+    @classmethod
+    async def get_orders(cls, order_ids: list[str]) -> list[OrderResponse]:
+        """Fetch many orders with one request. Unknown ids are missing in the result."""
+
+        response: httpx.Response = await resilience.request(
+            "uber", "POST", f"{cls.BASE_URL}/batch", json={"ids": order_ids}, idempotent=True, hedge=True
+        )
+        response.raise_for_status()
+        return [OrderResponse(**item) for item in response.json()]
+
+class Client:
+    """Sync facade over `AsyncClient`, it shares the same connection pool."""
+
+    BASE_URL = AsyncClient.BASE_URL
+
+    @classmethod
+    def create_order(cls, order: OrderRequestBody):
+        return pool.run(AsyncClient.create_order(order))
+
+    @classmethod
+    def get_order(cls, order_id: str):
+        return pool.run(AsyncClient.get_order(order_id))
+
+    @classmethod
+    def get_orders(cls, order_ids: list[str]) -> list[OrderResponse]:
+        return pool.run(AsyncClient.get_orders(order_ids))
@@ -1,42 +1,72 @@
-import enum
-import os
-from dataclasses import asdict, dataclass
-
-import httpx
-
-class OrderStatus(enum.StrEnum):
-    NOT_STARTED = "not started"
-    DELIVERY = "delivery"
-    DELIVERED = "delivered"
-
-@dataclass
-class OrderRequestBody:
-    addresses: list[str]
-    comments: list[str]
-
-@dataclass
-class OrderResponse:
-    order_id: str
-    status: OrderStatus
-    location: tuple[float, float]
-    addresses: list[str]
-    comments: list[str]
-
-    @property
-    def id(self):
-        return self.order_id
-
-class Client:
-    BASE_URL = os.getenv("UKLON_BASE_URL", "http://uklon-mock:8003/drivers/orders")
-
-    @classmethod
-    def create_order(cls, order: OrderRequestBody):
-        response: httpx.Response = httpx.post(cls.BASE_URL, json=asdict(order))
-        response.raise_for_status()
-        return OrderResponse(**response.json())
-
-    @classmethod
-    def get_order(cls, order_id: str):
-        response: httpx.Response = httpx.get(f"{cls.BASE_URL}/{order_id}")
-        response.raise_for_status()
-        return OrderResponse(**response.json())
\ No newline at end of file
+import enum
+import os
+from dataclasses import asdict, dataclass
+
+import httpx
+
+from . import resilience
+from .http import pool
+
+class OrderStatus(enum.StrEnum):
+    NOT_STARTED = "not started"
+    DELIVERY = "delivery"
+    DELIVERED = "delivered"
+
+@dataclass
+class OrderRequestBody:
+    addresses: list[str]
+    comments: list[str]
+
+@dataclass
+class OrderResponse:
+    order_id: str
+    status: OrderStatus
+    location: tuple[float, float]
+    addresses: list[str]
+    comments: list[str]
+
+    @property
+    def id(self):
+        return self.order_id
+
+class AsyncClient:
+    BASE_URL = os.getenv("UKLON_BASE_URL", "http://uklon-mock:8003/drivers/orders")
+
+    @classmethod
+    async def create_order(cls, order: OrderRequestBody):
+        response: httpx.Response = await resilience.request("uklon", "POST", cls.BASE_URL, json=asdict(order))
+        response.raise_for_status()
+        return OrderResponse(**response.json())
+
+    @classmethod
+    async def get_order(cls, order_id: str):
+        response: httpx.Response = await resilience.request("uklon", "GET", f"{cls.BASE_URL}/{order_id}", hedge=True)
+        response.raise_for_status()
+        return OrderResponse(**response.json())
+
+    @classmethod
+    async def get_orders(cls, order_ids: list[str]) -> list[OrderResponse]:
+        """Fetch many orders with one request. Unknown ids are missing in the result."""
+
+        response: httpx.Response = await resilience.request(
+            "uklon", "POST", f"{cls.BASE_URL}/batch", json={"ids": order_ids}, idempotent=True, hedge=True
+        )
+        response.raise_for_status()
+        return [OrderResponse(**item) for item in response.json()]
+
+class Client:
+    """Sync facade over `AsyncClient`, it shares the same connection pool."""
+
+    BASE_URL = AsyncClient.BASE_URL
+
+    @classmethod
+    def create_order(cls, order: OrderRequestBody):
+        return pool.run(AsyncClient.create_order(order))
+
+    @classmethod
+    def get_order(cls, order_id: str):
+        return pool.run(AsyncClient.get_order(order_id))
+
+    @classmethod
+    def get_orders(cls, order_ids: list[str]) -> list[OrderResponse]:
+        return pool.run(AsyncClient.get_orders(order_ids))
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""Routing of provider calls: priorities, shared rate limits and backpressure.
+
+Every provider has a token bucket and a list of in-flight call leases in one
+Redis hash (`providers:<name>`), so the limits hold across all workers.
+A throttled task is re-queued with a countdown instead of waiting in the worker,
+which keeps the worker free for other queues (activation emails, imports).
+"""
+
+import os
+import random
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterator, NoReturn
+
+from celery import Task
+
+from shared.cache import CacheService
+
+from .providers.resilience import CircuitOpen
+
+# Celery message priorities, 9 is the highest
+PRIORITY_MAX = 9
+# priority lost per day until the ETA
+PRIORITY_STEP = 3
+# orders with this priority or higher go to the high_priority queue
+URGENT_PRIORITY = 6
+
+# Seconds before a call refused by backpressure is tried again
+BACKPRESSURE_DELAY = 1.0
+# A lease of a call that never released it (killed worker) expires after this many seconds
+LEASE_TTL = 30
+
+# KEYS[1] - provider hash, ARGV[1] - rate (calls per second), ARGV[2] - burst,
+# ARGV[3] - max calls in flight, ARGV[4] - lease id, ARGV[5] - lease TTL (ms).
+# Returns 0 when the call may go, -1 when too many calls are in flight,
+# otherwise milliseconds until a token is available.
+ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+
+local tokens, updated, in_flight = burst, now, 0
+local fields = redis.call('HGETALL', KEYS[1])
+for i = 1, #fields, 2 do
+    local name, value = fields[i], tonumber(fields[i + 1])
+    if name == 'tokens' then
+        tokens = value
+    elseif name == 'updated' then
+        updated = value
+    elseif value < now then
+        redis.call('HDEL', KEYS[1], name)
+    else
+        in_flight = in_flight + 1
+    end
+end
+
+if in_flight >= tonumber(ARGV[3]) then
+    return -1
+end
+
+tokens = math.min(burst, tokens + (now - updated) * rate / 1000)
+if tokens < 1 then
+    return math.ceil((1 - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'updated', now, ARGV[4], now + tonumber(ARGV[5]))
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[5]) + math.ceil(burst * 1000 / rate))
+return 0
+"""
+
+@dataclass(frozen=True)
+class ProviderLimit:
+    rate: float
+    burst: int
+    max_in_flight: int
+
+    @classmethod
+    def from_env(cls, provider: str, rate: float, burst: int, max_in_flight: int) -> "ProviderLimit":
+        prefix = f"PROVIDER_{provider.upper()}"
+
+        return cls(
+            rate=float(os.getenv(f"{prefix}_RATE", default=str(rate))),
+            burst=int(os.getenv(f"{prefix}_BURST", default=str(burst))),
+            max_in_flight=int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", default=str(max_in_flight))),
+        )
+
+PROVIDER_LIMITS: dict[str, ProviderLimit] = {
+    "kfc": ProviderLimit.from_env("kfc", rate=20, burst=40, max_in_flight=20),
+    "silpo": ProviderLimit.from_env("silpo", rate=20, burst=40, max_in_flight=20),
+    "uklon": ProviderLimit.from_env("uklon", rate=10, burst=20, max_in_flight=10),
+    "uber": ProviderLimit.from_env("uber", rate=10, burst=20, max_in_flight=10),
+}
+
+class Throttled(Exception):
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"Provider {provider} is throttled, retry in {retry_after:.2f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+@contextmanager
+def provider_slot(provider: str, cache: CacheService | None = None) -> Iterator[None]:
+    """Take a token and an in-flight lease of the provider for the duration of one call.
+
+    Raises `Throttled` with the time to wait when the provider is over its limits.
+    """
+
+    cache = cache or CacheService()
+    limit = PROVIDER_LIMITS[provider]
+    lease = uuid.uuid4().hex
+
+    wait = cache.run_script(
+        ACQUIRE_SCRIPT,
+        "providers",
+        provider,
+        limit.rate,
+        limit.burst,
+        limit.max_in_flight,
+        lease,
+        LEASE_TTL * 1000,
+    )
+    if wait:
+        retry_after = BACKPRESSURE_DELAY if wait < 0 else wait / 1000
+        # jitter, so the throttled tasks do not come back all at once
+        raise Throttled(provider, retry_after * random.uniform(1, 1.5))
+
+    try:
+        yield
+    finally:
+        cache.hdel("providers", provider, lease)
+
+def retry_throttled(task: Task, error: Throttled | CircuitOpen) -> NoReturn:
+    """Re-queue the task once the provider has capacity or its circuit may close.
+
+    In-process calls get the error back. Tasks that use it are declared with
+    `max_retries=None`, throttling is not a failure.
+    """
+
+    if task.request.called_directly:
+        raise error
+
+    raise task.retry(countdown=error.retry_after)
+
+def order_priority(eta: date, today: date | None = None) -> int:
+    """Message priority of the order calls: the closer the ETA, the higher."""
+
+    days = (eta - (today or date.today())).days
+
+    return max(0, min(PRIORITY_MAX, PRIORITY_MAX - days * PRIORITY_STEP))
+
+def dispatch(task: Task, payload, priority: int = 0, **options):
+    """Queue a provider call. Urgent calls go to the high_priority queue, the rest to the queue of the task.
+
+    The queue is chosen here and not by a Celery router: routers never override the decorator queue.
+    """
+
+    queue = "high_priority" if priority >= URGENT_PRIORITY else task.queue
+
+    return task.apply_async((payload,), queue=queue, priority=priority, **options)
@@ -0,0 +1,113 @@
+"""Dish search by name.
+
+On PostgreSQL dishes are matched with a `tsvector` GIN index (see `Dish.Meta.indexes`),
+other databases (SQLite in development) use a per-process `InvertedIndex`.
+The in-memory index follows dish writes through `food.signals`, and is rebuilt
+when the catalog version shows that another process has changed the dishes.
+"""
+
+import threading
+
+from django.db import connection
+from django.db.models import F, QuerySet
+
+from shared.cache import CacheService
+from shared.search import InvertedIndex, tokenize
+
+from .models import Dish
+
+# Best in-memory matches a search filters dishes by. The ids go into one `IN`
+# list, which has to stay below the bound-parameter limit of SQLite.
+MATCH_LIMIT = 500
+
+class DishIndex:
+    def __init__(self):
+        self.index = InvertedIndex()
+        self.version: int | None = None
+        self._lock = threading.Lock()
+
+    def _rebuild(self, version: int) -> None:
+        self.index.clear()
+        self.index.bulk_add(Dish.objects.values_list("id", "name").iterator(chunk_size=5000))
+        self.version = version
+
+    def fresh(self) -> InvertedIndex:
+        version = CacheService().get_counter("catalog", "version")
+
+        if self.version != version:
+            with self._lock:
+                if self.version != version:
+                    self._rebuild(version)
+
+        return self.index
+
+    def update(self, version: int, dish_id: int | None = None, name: str | None = None) -> None:
+        """Apply a local catalog write. `version` is the catalog version this write has produced.
+
+        A dish without a name is removed. Writes that do not change dish names (restaurants) pass no dish.
+        """
+
+        with self._lock:
+            if self.version is None:
+                return
+
+            if dish_id is not None and name is None:
+                self.index.remove(dish_id)
+            elif dish_id is not None:
+                self.index.add(dish_id, name)
+
+            # writes from other processes in between are not here, the next search rebuilds
+            if self.version == version - 1:
+                self.version = version
+
+    def expire(self) -> None:
+        """Rebuild on the next search, for writes that could not bump the catalog version."""
+
+        with self._lock:
+            self.version = None
+
+dish_index = DishIndex()
+
+def _tsquery(query: str) -> str:
+    # every word is matched as a prefix, words are plain \w+ tokens so nothing needs escaping
+    return " & ".join(f"{word}:*" for word in tokenize(query))
+
+def _search_postgres(query: str) -> QuerySet[Dish]:
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    vector = SearchVector("name", config="simple")
+    search_query = SearchQuery(_tsquery(query), config="simple", search_type="raw")
+
+    return (
+        Dish.objects.annotate(search=vector, rank=SearchRank(vector, search_query))
+        .filter(search=search_query)
+        .order_by(F("rank").desc(), "pk")
+    )
+
+def matching_dishes(query: str) -> QuerySet[Dish]:
+    """Dishes that match every word of the query, unordered. Can be filtered further.
+
+    Without PostgreSQL only the `MATCH_LIMIT` best matches are kept.
+    """
+
+    if not tokenize(query):
+        return Dish.objects.none()
+
+    if connection.vendor == "postgresql":
+        return _search_postgres(query).order_by()
+
+    return Dish.objects.filter(pk__in=dish_index.fresh().search(query, limit=MATCH_LIMIT))
+
+def search_dishes(query: str, limit: int = 10) -> list[Dish]:
+    """Best matching dishes first, words are matched by prefix for autocomplete."""
+
+    if not tokenize(query):
+        return []
+
+    if connection.vendor == "postgresql":
+        return list(_search_postgres(query).select_related("restaurant")[:limit])
+
+    ids = dish_index.fresh().search(query, limit=limit)
+    dishes = Dish.objects.select_related("restaurant").in_bulk(ids)
+
+    return [dishes[dish_id] for dish_id in ids if dish_id in dishes]
@@ -1,206 +1,588 @@
-from time import sleep
-from dataclasses import dataclass, asdict, field
-
-from django.db.models import QuerySet
-
-from .mapper import RESTAURANT_EXTERNAL_TO_INTERNAL
-from shared.cache import CacheService
-from cateringproject.celery import app as celery_app
-from food.providers import uklon
-
-from .providers import kfc, silpo
-from .models import Order, OrderItem, Restaurant
-from .enums import OrderStatus
-
-@dataclass
-class TrackingOrder:
-    restaurants: dict = field(default_factory=dict)
-    delivery: dict = field(default_factory=dict)
-
-def all_orders_cooked(order_id: int):
-    cache = CacheService()
-    tracking_order = TrackingOrder(**cache.get(namespace="orders", key=str(order_id)))
-    print(f"Checking if all orders are cooked: {tracking_order.restaurants}")
-
-    if all((payload["status"] == OrderStatus.COOKED for _, payload in tracking_order.restaurants.items())):
-        Order.objects.filter(id=order_id).update(status=OrderStatus.COOKED)
-        print(f"Order {order_id} has been cooked.")
-
-        order_delivery.delay(order_id)
-
-        return True
-    else:
-        print(f"Not all orders are cooked: {tracking_order=}")
-
-        return False
-
-@celery_app.task(queue="default")
-def order_delivery(order_id: int):
-    print("DELIVERY PROCESSING")
-
-    provider = uklon.Client()
-    cache = CacheService()
-    order = Order.objects.get(id=order_id)
-
-    order.status = OrderStatus.DELIVERY_LOOKUP
-    order.save()
-
-    addresses: list[str] = []
-    comments: list[str] = []
-
-    for rest_name, address in order.delivery_meta():
-        addresses.append(address)
-        comments.append(f'Delivery to the {rest_name}')
-
-    order.status = OrderStatus.DELIVERED
-    order.save()
-
-    _response: uklon.OrderResponse = provider.create_order(
-        uklon.OrderRequestBody(addresses=addresses, comments=comments),
-    )
-
-    tracking_order = TrackingOrder(**cache.get("orders", str(order.pk)))
-    tracking_order.delivery["status"] = OrderStatus.DELIVERY
-    tracking_order.delivery["location"] = _response.location
-
-    current_status: uklon.OrderStatus = _response.status
-
-    while current_status != OrderStatus.DELIVERED:
-        response = provider.get_order(_response.id)
-
-        print(f"🚙 Uklon [{response.status}]: 📍 {response.location}")
-
-        if current_status == response.status:
-            sleep(1)
-            continue
-
-        current_status = response.status
-
-        tracking_order.delivery["location"] = response.location
-
-        cache.set("orders", str(order_id), asdict(tracking_order))
-
-    print(f"🏁 UKLON [{response.status}]: 📍 {response.location}")
-
-    Order.objects.filter(id=order_id).update(status=OrderStatus.DELIVERED)
-
-    tracking_order.delivery["status"] = OrderStatus.DELIVERED
-    # cache.delete("orders", str(order_id))
-
-    print("✅ DONE with Delivery")
-
-@celery_app.task(queue="high_priority")
-def order_in_silpo(order_id: int, items: list[dict]):
-    items = [OrderItem.objects.get(id=item["id"]) for item in items]
-
-    client = silpo.Client()
-    cache = CacheService()
-    restaurant = Restaurant.objects.get(name="Silpo")
-
-    def get_internal_status(status: silpo.OrderStatus) -> OrderStatus:
-        return RESTAURANT_EXTERNAL_TO_INTERNAL["silpo"][status]
-
-    cooked = False
-    while not cooked:
-        sleep(1)
-
-        tracking_order = TrackingOrder(**cache.get("orders", str(order_id)))
-        silpo_order = tracking_order.restaurants.get(str(restaurant.pk))
-        if not silpo_order:
-            raise ValueError("No Silpo in orders processing")
-
-        print(f"CURRENT SILPO ORDER STATUS: {silpo_order['status']}")
-
-        if not silpo_order["external_id"]:
-            response: silpo.OrderResponse = client.create_order(
-                silpo.OrderRequestBody(
-                    order=[silpo.OrderItem(dish=item.dish.name, quantity=item.quantity) for item in items]
-                )
-            )
-            internal_status: OrderStatus = get_internal_status(response.status)
-
-            tracking_order.restaurants[str(restaurant.pk)] |= {
-                "external_id": response.id,
-                "status": internal_status,
-            }
-
-            cache.set("orders", str(order_id), asdict(tracking_order), ttl=3600)
-        else:
-            response = client.get_order(silpo_order["external_id"])
-            internal_status: OrderStatus = get_internal_status(response.status)
-
-            print(f"Tracking for Silpo Order with HTTP GET /api/order. Status: {internal_status}")
-
-            if silpo_order["status"] != internal_status:
-                tracking_order.restaurants[str(restaurant.pk)]["status"] = internal_status
-                print(f"Silpo order status changed to {internal_status}")
-                cache.set("orders", str(order_id), asdict(tracking_order), ttl=3600)
-
-                if internal_status == OrderStatus.COOKING:
-                    Order.objects.filter(id=order_id).update(status=OrderStatus.COOKING)
-
-                if internal_status == OrderStatus.COOKED:
-                    cooked = True
-                    all_orders_cooked(order_id)
-
-@celery_app.task(queue="high_priority")
-def order_in_kfc(order_id: int, items: list[dict]):
-    client = kfc.Client()
-    cache = CacheService()
-    restaurant = Restaurant.objects.get(name="KFC")
-
-    def get_internal_status(status: silpo.OrderStatus) -> OrderStatus:
-        return RESTAURANT_EXTERNAL_TO_INTERNAL["kfc"][status]
-
-    tracking_order = TrackingOrder(**cache.get(namespace="orders", key=str(order_id)))
-
-    response: kfc.OrderResponse = client.create_order(
-        kfc.OrderRequestBody(
-            order=[kfc.OrderItem(dish=item["dish__name"], quantity=item["quantity"]) for item in items]
-        )
-    )
-    internal_status = get_internal_status(response.status)
-
-    tracking_order.restaurants[str(restaurant.pk)] |= {
-        "external_id": response.id,
-        "status": internal_status,
-    }
-
-    print(f"Created KFC Order. External ID: {response.id} Status: {internal_status}")
-    cache.set("orders", str(order_id), asdict(tracking_order), ttl=3600)
-
-    cache.set(
-        namespace="kfc_orders",
-        key=response.id,
-        value={
-            "internal_order_id": order_id,
-        },
-        ttl=3600,
-    )
-
-    if all_orders_cooked(order_id):
-        cache.set(namespace="orders", key=str(order_id), value=asdict(tracking_order), ttl=3600)
-        Order.objects.filter(id=order_id).update(status=OrderStatus.COOKED)
-
-def schedule_order(order: Order):
-    cache = CacheService()
-    tracking_order = TrackingOrder()
-
-    items_by_restaurants = order.items_by_restaurant()
-    for restaurant, items in items_by_restaurants.items():
-        tracking_order.restaurants[str(restaurant.pk)] = {
-            "external_id": None,
-            "status": OrderStatus.NOT_STARTED,
-        }
-
-    cache.set("orders", str(order.pk), asdict(tracking_order), ttl=3600)
-
-    for restaurant, items in items_by_restaurants.items():
-        match restaurant.name.lower():
-            case "kfc":
-                # order_in_kfc.delay(order.pk, list(items.values("id", "dish__name", "quantity")))
-                order_in_kfc(order.pk, list(items.values("id", "dish__name", "quantity")))
-            case "silpo":
-                order_in_silpo.delay(order.pk, list(items.values("id", "dish__name", "quantity")))
-            case _:
-                raise ValueError(f"Restaurant {restaurant.name} is not supported")
\ No newline at end of file
+import json
+import logging
+from dataclasses import dataclass, field
+from functools import partial
+
+import httpx
+from django.db.models import QuerySet
+from django.forms.models import model_to_dict
+
+from .mapper import DELIVERY_EXTERNAL_TO_INTERNAL, RESTAURANT_EXTERNAL_TO_INTERNAL
+from shared.cache import CacheService
+from cateringproject.celery import app as celery_app
+
+from .providers import kfc, silpo
+from .providers.resilience import CircuitOpen
+from .balancer import DELIVERY_CLIENTS, place_delivery
+from .models import Order, OrderItem, Restaurant
+from .enums import OrderStatus
+from .payloads import DeliveryPayload, OrderBatchPayload, OrderLinesPayload, RestaurantOrderPayload
+from .delivery import DELIVERY_WINDOW, Delivery, Stop, plan_batches
+from .tracking import CHANNEL_NAMESPACE
+from .routing import Throttled, dispatch, order_priority, provider_slot, retry_throttled
+from .metrics import ORDER_STATUSES, SCHEDULE_ORDER_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two ticks of the tracking poller.
+# A tick never blocks the worker, the poller re-schedules itself with this countdown instead.
+POLL_INTERVAL = 1
+# Max external ids sent to a provider in one batched status request
+POLL_BATCH_SIZE = 500
+
+TRACKING_TTL = 3600
+RESTAURANTS_TTL = 300
+
+# Order in which a leg moves. Statuses that would move a leg backwards
+# (late webhooks, retried polls) are ignored, so every step is safe to repeat.
+RESTAURANT_LEG_FLOW: tuple[OrderStatus, ...] = (
+    OrderStatus.NOT_STARTED,
+    OrderStatus.COOKING,
+    OrderStatus.COOKED,
+    OrderStatus.FINISHED,
+)
+DELIVERY_LEG_FLOW: tuple[OrderStatus, ...] = (
+    OrderStatus.DELIVERY,
+    OrderStatus.DELIVERED,
+)
+
+# KEYS[1] - tracking hash, ARGV[1] - status field, ARGV[2] - new status, ARGV[3:] - leg flow.
+# Returns -1 if there is no such leg, 0 if the status is stale and 1 if the leg has moved.
+ADVANCE_LEG_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current then
+    return -1
+end
+
+local function rank(status)
+    for i = 3, #ARGV do
+        if ARGV[i] == status then
+            return i
+        end
+    end
+    return 0
+end
+
+local new_rank = rank(ARGV[2])
+if current == ARGV[2] or (new_rank > 0 and rank(current) >= new_rank) then
+    return 0
+end
+
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+return 1
+"""
+
+# KEYS[1] - tracking hash, ARGV - statuses that count as cooked.
+# Returns 1 only for the first caller that sees every restaurant leg cooked.
+ALL_COOKED_SCRIPT = """
+local fields = redis.call('HGETALL', KEYS[1])
+local legs = 0
+
+for i = 1, #fields, 2 do
+    if string.match(fields[i], '^restaurants:.*:status$') then
+        local cooked = false
+        for j = 1, #ARGV do
+            if fields[i + 1] == ARGV[j] then
+                cooked = true
+            end
+        end
+        if not cooked then
+            return 0
+        end
+        legs = legs + 1
+    end
+end
+
+if legs == 0 then
+    return 0
+end
+
+return redis.call('HSETNX', KEYS[1], 'cooked', '1')
+"""
+
+@dataclass
+class TrackingOrder:
+    """Tracking state of the order, stored as the `orders:<id>` Redis hash.
+
+    Every leg attribute is a separate hash field (`restaurants:<pk>:status`,
+    `delivery:location`, ...), so each writer updates only the fields it owns.
+    Every write renews the `TRACKING_TTL` of the hash, a late webhook or poll
+    never leaves a hash without expiry behind.
+    Changed fields are published for live tracking (`food.tracking`).
+    """
+
+    restaurants: dict = field(default_factory=dict)
+    delivery: dict = field(default_factory=dict)
+    # message priority of the provider calls, see `food.routing.order_priority`
+    priority: int = 0
+
+    @classmethod
+    def load(cls, order_id: int) -> "TrackingOrder":
+        tracking_order = cls()
+
+        for name, value in CacheService().hgetall("orders", str(order_id)).items():
+            match name.split(":"):
+                case ["restaurants", restaurant_pk, attribute]:
+                    tracking_order.restaurants.setdefault(restaurant_pk, {})[attribute] = value
+                case ["delivery", attribute]:
+                    tracking_order.delivery[attribute] = value
+                case ["priority"]:
+                    tracking_order.priority = value
+
+        return tracking_order
+
+    def save(self, order_id: int, cache: CacheService | None = None) -> None:
+        fields = {f"delivery:{attribute}": value for attribute, value in self.delivery.items()}
+        fields["priority"] = self.priority
+        for restaurant_pk, leg in self.restaurants.items():
+            fields |= {f"restaurants:{restaurant_pk}:{attribute}": value for attribute, value in leg.items()}
+
+        TrackingOrder._write(order_id, fields, cache)
+
+    @staticmethod
+    def _write(order_id: int, fields: dict, cache: CacheService | None = None) -> None:
+        cache = cache or CacheService()
+        cache.hset_many("orders", str(order_id), fields, ttl=TRACKING_TTL)
+        cache.publish(CHANNEL_NAMESPACE, str(order_id), fields)
+
+    @staticmethod
+    def update_restaurant(order_id: int, restaurant_pk: int, cache: CacheService | None = None, **attributes) -> None:
+        fields = {f"restaurants:{restaurant_pk}:{attribute}": value for attribute, value in attributes.items()}
+        TrackingOrder._write(order_id, fields, cache)
+
+    @staticmethod
+    def update_delivery(order_id: int, cache: CacheService | None = None, **attributes) -> None:
+        fields = {f"delivery:{attribute}": value for attribute, value in attributes.items()}
+        TrackingOrder._write(order_id, fields, cache)
+
+def update_status(orders: QuerySet, status: OrderStatus, **fields) -> int:
+    """Move the orders into the status and count them for the metrics."""
+
+    updated = orders.update(status=status, **fields)
+    ORDER_STATUSES.labels(status=status).inc(updated)
+
+    return updated
+
+def get_restaurant(name: str) -> Restaurant:
+    """Restaurant lookup by name, served from the in-process cache tier.
+
+    Entries are invalidated by `food.signals` when a restaurant changes.
+    """
+
+    payload = CacheService(local=True).get_or_set(
+        "restaurants",
+        name.lower(),
+        lambda: model_to_dict(Restaurant.objects.get(name=name)),
+        ttl=RESTAURANTS_TTL,
+    )
+
+    return Restaurant(**payload)
+
+def _advance_leg(order_id: int, status_field: str, status: OrderStatus, flow: tuple[OrderStatus, ...]) -> int:
+    cache = CacheService()
+    changed = cache.run_script(
+        ADVANCE_LEG_SCRIPT,
+        "orders",
+        str(order_id),
+        status_field,
+        json.dumps(status),
+        *(json.dumps(item) for item in flow),
+    )
+    if changed > 0:
+        cache.publish(CHANNEL_NAMESPACE, str(order_id), {status_field: status})
+
+    return changed
+
+def all_orders_cooked(order_id: int):
+    """Move the order to delivery once every restaurant leg is cooked.
+
+    The check and the "cooked" mark are one atomic step, so the delivery is
+    scheduled once even if several restaurants report at the same moment.
+    """
+
+    cache = CacheService()
+    cooked = cache.run_script(
+        ALL_COOKED_SCRIPT,
+        "orders",
+        str(order_id),
+        json.dumps(OrderStatus.COOKED),
+        json.dumps(OrderStatus.FINISHED),
+    )
+
+    if cooked:
+        update_status(Order.objects.filter(id=order_id), OrderStatus.COOKED)
+        logger.info("order.cooked", extra={"order_id": order_id})
+
+        queue_delivery(order_id, TrackingOrder.load(order_id).priority)
+
+        return True
+    else:
+        logger.debug("order.cooking", extra={"order_id": order_id})
+
+        return False
+
+def advance_restaurant_leg(
+    order_id: int,
+    restaurant_pk: int,
+    status: OrderStatus,
+    external_id: str | None = None,
+) -> bool:
+    """Move the restaurant leg of the order into the given status.
+
+    Returns True if the leg has changed, False if the status is stale.
+    """
+
+    if external_id is not None:
+        TrackingOrder.update_restaurant(order_id, restaurant_pk, external_id=external_id)
+
+    changed = _advance_leg(order_id, f"restaurants:{restaurant_pk}:status", status, RESTAURANT_LEG_FLOW)
+    if changed < 0:
+        raise ValueError(f"Restaurant {restaurant_pk} is not in the order {order_id} processing")
+    if not changed:
+        return False
+
+    logger.info("order.restaurant_leg", extra={"order_id": order_id, "restaurant_pk": restaurant_pk, "status": status})
+
+    if status == OrderStatus.COOKING:
+        update_status(Order.objects.filter(id=order_id), OrderStatus.COOKING)
+
+    if status == OrderStatus.COOKED:
+        all_orders_cooked(order_id)
+
+    return True
+
+def advance_delivery_leg(order_id: int, status: OrderStatus, location: tuple[float, float]) -> None:
+    TrackingOrder.update_delivery(order_id, location=location)
+
+    if _advance_leg(order_id, "delivery:status", status, DELIVERY_LEG_FLOW) <= 0:
+        return
+
+    if status == OrderStatus.DELIVERED:
+        update_status(Order.objects.filter(id=order_id), OrderStatus.DELIVERED)
+        logger.info("order.delivered", extra={"order_id": order_id, "location": location})
+
+def track_leg(provider: str, external_id: str, **meta) -> None:
+    """Register the external order in the poller and make sure the poller is running.
+
+    `meta` is what the poller of the provider needs to apply the statuses (order ids and so on).
+    """
+
+    cache = CacheService()
+    cache.hset("tracking", provider, external_id, meta)
+
+    if cache.lock("tracking", "poller", ttl=POLL_INTERVAL * 10):
+        poll_providers.apply_async(countdown=POLL_INTERVAL)
+
+def _drop_leg(provider: str, external_id: str, error: Exception, finished: list[str]) -> None:
+    # a stale leg (the order is not tracked anymore) or an unknown status fails on every tick,
+    # so the leg stops being polled instead of blocking the other legs and providers
+    logger.warning(
+        "tracking.leg_dropped", extra={"provider": provider, "external_id": external_id, "error": repr(error)}
+    )
+    finished.append(external_id)
+
+def _poll_silpo(legs: dict[str, dict]) -> list[str]:
+    finished: list[str] = []
+    ids = list(legs)
+
+    for start in range(0, len(ids), POLL_BATCH_SIZE):
+        for response in silpo.Client.get_orders(ids[start:start + POLL_BATCH_SIZE]):
+            try:
+                leg = legs[response.id]
+                internal_status: OrderStatus = RESTAURANT_EXTERNAL_TO_INTERNAL["silpo"][response.status]
+
+                advance_restaurant_leg(leg["order_id"], leg["restaurant_pk"], internal_status)
+            except (KeyError, ValueError) as error:
+                _drop_leg("silpo", response.id, error, finished)
+                continue
+
+            if internal_status in (OrderStatus.COOKED, OrderStatus.FINISHED):
+                finished.append(response.id)
+
+    return finished
+
+def _poll_delivery(provider: str, legs: dict[str, dict]) -> list[str]:
+    finished: list[str] = []
+    ids = list(legs)
+    client = DELIVERY_CLIENTS[provider].Client
+
+    for start in range(0, len(ids), POLL_BATCH_SIZE):
+        for response in client.get_orders(ids[start:start + POLL_BATCH_SIZE]):
+            try:
+                leg = legs[response.id]
+                internal_status: OrderStatus = DELIVERY_EXTERNAL_TO_INTERNAL[provider][response.status]
+
+                # one courier carries every order of the batch
+                for order_id in leg.get("order_ids") or [leg["order_id"]]:
+                    advance_delivery_leg(order_id, internal_status, response.location)
+            except (KeyError, ValueError) as error:
+                _drop_leg(provider, response.id, error, finished)
+                continue
+
+            if internal_status == OrderStatus.DELIVERED:
+                finished.append(response.id)
+
+    return finished
+
+LEG_POLLERS = {
+    "silpo": _poll_silpo,
+    **{provider: partial(_poll_delivery, provider) for provider in DELIVERY_CLIENTS},
+}
+
+@celery_app.task(queue="high_priority")
+def poll_providers():
+    """One tick of the tracking poller.
+
+    Sends one batched status request per provider for all live external orders,
+    fans the results out to their `TrackingOrder`s and re-schedules itself while
+    there is something to track.
+    """
+
+    cache = CacheService()
+    cache.set_ttl("tracking", "poller", POLL_INTERVAL * 10)
+
+    live = False
+    for provider, poll in LEG_POLLERS.items():
+        legs = cache.hgetall("tracking", provider)
+        if not legs:
+            continue
+
+        try:
+            finished = poll(legs)
+        except httpx.HTTPError as error:
+            # one provider being down does not stop the tracking of the others
+            logger.warning("tracking.poll_failed", extra={"provider": provider, "error": repr(error)})
+            live = True
+            continue
+
+        if finished:
+            cache.hdel("tracking", provider, *finished)
+
+        live = live or len(finished) < len(legs)
+
+    if not live:
+        cache.delete("tracking", "poller")
+
+        # a leg could be registered between the last read and the release
+        if not any(cache.hgetall("tracking", provider) for provider in LEG_POLLERS):
+            return
+        if not cache.lock("tracking", "poller", ttl=POLL_INTERVAL * 10):
+            return
+
+    poll_providers.apply_async(countdown=POLL_INTERVAL)
+
+def queue_delivery(order_id: int, priority: int = 0) -> None:
+    """Hold the cooked order for `DELIVERY_WINDOW` seconds, so nearby orders can share its courier."""
+
+    cache = CacheService()
+    cache.hset("delivery", "pending", str(order_id), {"priority": priority})
+
+    if cache.lock("delivery", "planner", ttl=int(DELIVERY_WINDOW) + 60):
+        plan_deliveries.apply_async(countdown=DELIVERY_WINDOW)
+
+def _pending_deliveries(pending: dict[str, dict]) -> list[Delivery]:
+    stops: dict[int, dict] = {}
+
+    # one query for the pickups of all the orders
+    rows = (
+        OrderItem.objects.filter(order_id__in=[int(order_id) for order_id in pending])
+        .values_list(
+            "order_id",
+            "order__eta",
+            "dish__restaurant__name",
+            "dish__restaurant__address",
+            "dish__restaurant__latitude",
+            "dish__restaurant__longitude",
+        )
+        .distinct()
+    )
+    for order_id, eta, name, address, latitude, longitude in rows:
+        point = (latitude, longitude) if latitude is not None and longitude is not None else None
+        delivery = stops.setdefault(order_id, {"eta": eta, "stops": []})
+        delivery["stops"].append(Stop(name, address, point))
+
+    return [
+        Delivery(order_id, delivery["eta"], tuple(delivery["stops"]), pending[str(order_id)]["priority"])
+        for order_id, delivery in stops.items()
+    ]
+
+@celery_app.task(queue="default")
+def plan_deliveries():
+    """Batch the orders cooked during the window and send one delivery per batch."""
+
+    cache = CacheService()
+    pending = cache.hgetall("delivery", "pending")
+
+    if pending:
+        # orders leave the queue once their delivery is dispatched, a failure leaves the rest
+        # for the next window; orders queued from now on wait for it as well
+        try:
+            deliveries = _pending_deliveries(pending)
+            batches = plan_batches(deliveries)
+            logger.info("delivery.planned", extra={"orders": len(pending), "deliveries": len(batches)})
+
+            # orders without items have nothing to deliver
+            empty = set(pending) - {str(delivery.order_id) for delivery in deliveries}
+            if empty:
+                cache.hdel("delivery", "pending", *empty)
+
+            for batch in batches:
+                payload = DeliveryPayload(
+                    batch.order_ids,
+                    [stop.address for stop in batch.stops],
+                    [f"Delivery to the {stop.name}" for stop in batch.stops],
+                )
+                dispatch(order_delivery, payload, batch.priority)
+                cache.hdel("delivery", "pending", *[str(order_id) for order_id in batch.order_ids])
+        except Exception as error:
+            logger.error("delivery.planning_failed", extra={"orders": len(pending), "error": repr(error)})
+
+    cache.delete("delivery", "planner")
+
+    # an order could be queued between the read and the release
+    if cache.hgetall("delivery", "pending") and cache.lock("delivery", "planner", ttl=int(DELIVERY_WINDOW) + 60):
+        plan_deliveries.apply_async(countdown=DELIVERY_WINDOW)
+
+@celery_app.task(queue="default", bind=True, max_retries=None)
+def order_delivery(self, payload: DeliveryPayload):
+    orders = Order.objects.filter(id__in=payload.order_ids)
+
+    # throttled attempts come back with the orders in the lookup already, they are not counted again
+    update_status(orders.exclude(status=OrderStatus.DELIVERY_LOOKUP), OrderStatus.DELIVERY_LOOKUP)
+
+    try:
+        provider, _response = place_delivery(payload.addresses, payload.comments)
+    except (Throttled, CircuitOpen) as error:
+        retry_throttled(self, error)
+
+    update_status(orders, OrderStatus.DELIVERY, delivery_provider=provider)
+    logger.info(
+        "delivery.placed",
+        extra={"order_ids": payload.order_ids, "provider": provider, "external_id": _response.id},
+    )
+
+    cache = CacheService()
+    with cache.pipeline() as pipe:
+        for order_id in payload.order_ids:
+            TrackingOrder.update_delivery(
+                order_id,
+                cache=pipe,
+                provider=provider,
+                external_id=_response.id,
+                status=OrderStatus.DELIVERY,
+                location=_response.location,
+            )
+
+    track_leg(provider, _response.id, order_ids=payload.order_ids)
+
+@celery_app.task(queue="default", bind=True, max_retries=None)
+def order_in_silpo(self, payload: RestaurantOrderPayload):
+    order_id = payload.order_id
+    items = OrderItem.objects.filter(id__in=payload.item_ids).select_related("dish")
+
+    client = silpo.Client()
+    restaurant = get_restaurant("Silpo")
+
+    tracking_order = TrackingOrder.load(order_id)
+    silpo_order = tracking_order.restaurants.get(str(restaurant.pk))
+    if not silpo_order:
+        raise ValueError("No Silpo in orders processing")
+
+    if silpo_order["external_id"]:
+        return
+
+    try:
+        with provider_slot("silpo"):
+            response: silpo.OrderResponse = client.create_order(
+                silpo.OrderRequestBody(
+                    order=[silpo.OrderItem(dish=item.dish.name, quantity=item.quantity) for item in items]
+                )
+            )
+    except (Throttled, CircuitOpen) as error:
+        retry_throttled(self, error)
+    logger.info(
+        "restaurant.order_created",
+        extra={"order_id": order_id, "provider": "silpo", "external_id": response.id, "status": response.status},
+    )
+
+    advance_restaurant_leg(
+        order_id,
+        restaurant.pk,
+        RESTAURANT_EXTERNAL_TO_INTERNAL["silpo"][response.status],
+        external_id=response.id,
+    )
+
+    track_leg("silpo", response.id, order_id=order_id, restaurant_pk=restaurant.pk)
+
+@celery_app.task(queue="default", bind=True, max_retries=None)
+def order_in_kfc(self, payload: OrderLinesPayload):
+    order_id = payload.order_id
+    client = kfc.Client()
+    cache = CacheService()
+    restaurant = get_restaurant("KFC")
+
+    try:
+        with provider_slot("kfc"):
+            response: kfc.OrderResponse = client.create_order(
+                kfc.OrderRequestBody(
+                    order=[kfc.OrderItem(dish=dish, quantity=quantity) for dish, quantity in payload.lines]
+                )
+            )
+    except (Throttled, CircuitOpen) as error:
+        retry_throttled(self, error)
+
+    logger.info(
+        "restaurant.order_created",
+        extra={"order_id": order_id, "provider": "kfc", "external_id": response.id, "status": response.status},
+    )
+
+    # both keys go out in one round trip, a webhook never sees only one of them
+    with cache.pipeline() as pipe:
+        TrackingOrder.update_restaurant(order_id, restaurant.pk, cache=pipe, external_id=response.id)
+        pipe.set(
+            namespace="kfc_orders",
+            key=response.id,
+            value={
+                "internal_order_id": order_id,
+            },
+            ttl=TRACKING_TTL,
+        )
+
+    # KFC pushes further statuses to the webhook, no tracking step is needed
+    advance_restaurant_leg(order_id, restaurant.pk, RESTAURANT_EXTERNAL_TO_INTERNAL["kfc"][response.status])
+
+@SCHEDULE_ORDER_SECONDS.time()
+def schedule_order(order: Order):
+    tracking_order = TrackingOrder(priority=order_priority(order.eta))
+
+    items_by_restaurants = order.items_by_restaurant()
+    for restaurant, items in items_by_restaurants.items():
+        tracking_order.restaurants[str(restaurant.pk)] = {
+            "external_id": None,
+            "status": OrderStatus.NOT_STARTED,
+        }
+
+    tracking_order.save(order.pk)
+
+    for restaurant, items in items_by_restaurants.items():
+        match restaurant.name.lower():
+            case "kfc":
+                payload = OrderLinesPayload(order.pk, [(item["dish__name"], item["quantity"]) for item in items])
+                try:
+                    order_in_kfc(payload)
+                except (Throttled, CircuitOpen) as error:
+                    # KFC is busy or down, the call waits in the queue instead of the request
+                    dispatch(order_in_kfc, payload, tracking_order.priority, countdown=error.retry_after)
+            case "silpo":
+                # the worker reads the items itself
+                payload = RestaurantOrderPayload(order.pk, [item["id"] for item in items])
+                dispatch(order_in_silpo, payload, tracking_order.priority)
+            case _:
+                raise ValueError(f"Restaurant {restaurant.name} is not supported")
+
+@celery_app.task(queue="default")
+def schedule_orders(payload: OrderBatchPayload):
+    """Schedule the orders of a batch request. The provider calls of `schedule_order` run here, not in the request."""
+
+    for order in Order.objects.filter(id__in=payload.order_ids):
+        schedule_order(order)
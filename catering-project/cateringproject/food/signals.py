@@ -0,0 +1,62 @@
+import logging
+from typing import Callable
+
+import redis
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from shared.cache import CacheService
+
+from .catalog import invalidate_catalog
+from .models import Dish, Restaurant
+from .search import dish_index
+
+logger = logging.getLogger(__name__)
+
+def _on_commit(invalidate: Callable[[], None]) -> None:
+    """Invalidate once the write is committed: a rolled back write leaves the caches alone.
+
+    Redis being down never fails the write. Cached entries then live until their TTL,
+    and the dish index of this process is rebuilt on the next search.
+    """
+
+    def run() -> None:
+        try:
+            invalidate()
+        except redis.RedisError as error:
+            dish_index.expire()
+            logger.warning("cache.invalidation_failed", extra={"error": repr(error)})
+
+    transaction.on_commit(run)
+
+@receiver(pre_save, sender=Restaurant)
+def invalidate_renamed_restaurant(sender, instance: Restaurant, **kwargs):
+    if instance.pk is None:
+        return
+
+    previous_name = Restaurant.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+    if previous_name is not None and previous_name != instance.name:
+        _on_commit(lambda: CacheService(local=True).delete("restaurants", previous_name.lower()))
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_restaurant(sender, instance: Restaurant, **kwargs):
+    name = instance.name.lower()
+
+    def invalidate() -> None:
+        CacheService(local=True).delete("restaurants", name)
+        dish_index.update(invalidate_catalog())
+
+    _on_commit(invalidate)
+
+@receiver(post_save, sender=Dish)
+def invalidate_dish(sender, instance: Dish, **kwargs):
+    dish_id, name = instance.pk, instance.name
+    _on_commit(lambda: dish_index.update(invalidate_catalog(), dish_id, name))
+
+@receiver(post_delete, sender=Dish)
+def invalidate_deleted_dish(sender, instance: Dish, **kwargs):
+    # the instance loses its pk once the delete is done
+    dish_id = instance.pk
+    _on_commit(lambda: dish_index.update(invalidate_catalog(), dish_id))
@@ -1,3 +1,1148 @@
-from django.test import TestCase
-
-# Create your tests here.
+import asyncio
+import io
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+import fakeredis
+import fakeredis.aioredis
+import httpx
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+from kombu.serialization import dumps as kombu_dumps, loads as kombu_loads
+from prometheus_client import REGISTRY
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cateringproject.profiling import fingerprint, query_budget
+from shared import codecs, payloads
+from shared.cache import CacheService, LocalCache
+from shared.search import InvertedIndex
+from users.models import User
+from .balancer import ProviderStats, rank_providers
+from .catalog import build_catalog
+from .dish_import import get_import, import_dishes_csv, import_dishes_task
+from .delivery import MAX_ORDERS, Delivery, Stop, plan_batches
+from .enums import OrderStatus
+from .exports import export_response
+from .routing import (
+    BACKPRESSURE_DELAY,
+    LEASE_TTL,
+    PROVIDER_LIMITS,
+    URGENT_PRIORITY,
+    ProviderLimit,
+    Throttled,
+    order_priority,
+    provider_slot,
+    retry_throttled,
+)
+from .tracking import CHANNEL_NAMESPACE, TrackingHub, tracking_events
+from .search import DishIndex, dish_index, matching_dishes, search_dishes
+from .models import Dish, Order, OrderItem, Restaurant
+from .providers import silpo, uklon
+from .payloads import DeliveryPayload, OrderBatchPayload, OrderLinesPayload
+from .providers.resilience import (
+    BREAKER_COOLDOWN,
+    RETRY_CAP,
+    BreakerStore,
+    CircuitOpen,
+    backoff,
+    request as provider_request,
+)
+from .serializers import OrderSerializer
+from .views import FoodAPIViewSet
+from .webhooks import GROUP, consume_batch, enqueue_kfc_event
+from .services import (
+    RESTAURANT_LEG_FLOW,
+    TRACKING_TTL,
+    TrackingOrder,
+    _advance_leg,
+    advance_restaurant_leg,
+    all_orders_cooked,
+    order_delivery,
+    plan_deliveries,
+    poll_providers,
+    schedule_order,
+)
+
+class FakeRedisMixin:
+    """Points `CacheService` at an empty in-process Redis for every test, Lua scripts included."""
+
+    def setUp(self):
+        super().setUp()
+        self.server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=self.server)
+
+        patcher = mock.patch.object(CacheService, "_pool", self.redis.connection_pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # no invalidation subscriber, the local tier starts empty instead
+        CacheService._local.clear()
+        patcher = mock.patch.object(CacheService, "_subscriber_pid", os.getpid())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+class TrackingOrderTestCase(FakeRedisMixin, TestCase):
+    def track(self, order_id: int, *statuses: OrderStatus) -> None:
+        TrackingOrder(
+            restaurants={str(pk): {"external_id": None, "status": status} for pk, status in enumerate(statuses, 1)},
+            priority=3,
+        ).save(order_id)
+
+    def test_every_attribute_is_a_hash_field(self):
+        self.track(1, OrderStatus.NOT_STARTED, OrderStatus.COOKING)
+
+        self.assertEqual(
+            {field.decode(): json.loads(value) for field, value in self.redis.hgetall("orders:1").items()},
+            {
+                "priority": 3,
+                "restaurants:1:external_id": None,
+                "restaurants:1:status": "not_started",
+                "restaurants:2:external_id": None,
+                "restaurants:2:status": "cooking",
+            },
+        )
+        self.assertEqual(TrackingOrder.load(1).restaurants["2"], {"external_id": None, "status": "cooking"})
+
+    def test_late_update_does_not_leave_a_key_without_expiry(self):
+        # the hash has expired, a late poll writes the location again
+        TrackingOrder.update_delivery(2, location=[50.45, 30.52])
+
+        self.assertGreater(self.redis.ttl("orders:2"), TRACKING_TTL - 5)
+
+    def test_leg_only_moves_forward(self):
+        self.track(3, OrderStatus.NOT_STARTED)
+
+        def advance(status: OrderStatus, field: str = "restaurants:1:status") -> int:
+            return _advance_leg(3, field, status, RESTAURANT_LEG_FLOW)
+
+        self.assertEqual(advance(OrderStatus.COOKING), 1)
+        self.assertEqual(advance(OrderStatus.COOKING), 0)
+        self.assertEqual(advance(OrderStatus.NOT_STARTED), 0)
+        self.assertEqual(advance(OrderStatus.COOKED), 1)
+        self.assertEqual(advance(OrderStatus.COOKING, field="restaurants:9:status"), -1)
+        self.assertEqual(TrackingOrder.load(3).restaurants["1"]["status"], "cooked")
+
+    @mock.patch("food.services.queue_delivery")
+    def test_delivery_is_queued_once_when_every_leg_is_cooked(self, queue_delivery):
+        order = Order.objects.create(
+            user=User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567"),
+            eta=date.today() + timedelta(days=2),
+        )
+        self.track(order.pk, OrderStatus.COOKED, OrderStatus.COOKING)
+
+        self.assertFalse(all_orders_cooked(order.pk))
+
+        _advance_leg(order.pk, "restaurants:2:status", OrderStatus.FINISHED, RESTAURANT_LEG_FLOW)
+
+        self.assertTrue(all_orders_cooked(order.pk))
+        self.assertFalse(all_orders_cooked(order.pk))
+        queue_delivery.assert_called_once_with(order.pk, 3)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, OrderStatus.COOKED)
+
+class PollProvidersTestCase(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        self.restaurant = Restaurant.objects.create(name="Silpo", address="Kyiv")
+        self.order = Order.objects.create(user=user, eta=date.today())
+        TrackingOrder(restaurants={str(self.restaurant.pk): {"external_id": "s-1", "status": "not_started"}}).save(
+            self.order.pk
+        )
+
+        cache = CacheService()
+        cache.hset("tracking", "silpo", "s-1", {"order_id": self.order.pk, "restaurant_pk": self.restaurant.pk})
+        cache.hset("tracking", "uklon", "u-1", {"order_ids": [self.order.pk]})
+
+        patcher = mock.patch.object(poll_providers, "apply_async")
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(
+            uklon.Client,
+            "get_orders",
+            return_value=[uklon.OrderResponse("u-1", uklon.OrderStatus.DELIVERY, (50.45, 30.52), [], [])],
+        )
+        self.uklon_orders = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stale_leg_is_dropped_and_the_others_are_polled(self):
+        # the order of the second leg is not tracked anymore
+        CacheService().hset("tracking", "silpo", "s-2", {"order_id": 999, "restaurant_pk": self.restaurant.pk})
+        responses = [
+            silpo.OrderResponse("s-2", silpo.OrderStatus.COOKING),
+            silpo.OrderResponse("s-1", silpo.OrderStatus.COOKING),
+        ]
+
+        with mock.patch.object(silpo.Client, "get_orders", return_value=responses):
+            poll_providers()
+
+        self.assertEqual(set(CacheService().hgetall("tracking", "silpo")), {"s-1"})
+        self.assertEqual(TrackingOrder.load(self.order.pk).restaurants[str(self.restaurant.pk)]["status"], "cooking")
+        self.uklon_orders.assert_called_once_with(["u-1"])
+        self.apply_async.assert_called_once()
+
+    def test_provider_error_keeps_its_legs(self):
+        with mock.patch.object(silpo.Client, "get_orders", side_effect=httpx.ConnectError("Silpo is down")):
+            poll_providers()
+
+        self.assertEqual(set(CacheService().hgetall("tracking", "silpo")), {"s-1"})
+        self.uklon_orders.assert_called_once_with(["u-1"])
+        self.apply_async.assert_called_once()
+
+class CacheInvalidationTestCase(FakeRedisMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name="Silpo", address="Kyiv")
+
+    def catalog_version(self) -> int:
+        return int(self.redis.get("catalog:version") or 0)
+
+    def test_committed_write_bumps_the_catalog_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Dish.objects.create(name="Borscht", price=100, restaurant=self.restaurant)
+
+        self.assertEqual(self.catalog_version(), 1)
+
+    def test_rolled_back_write_leaves_the_cache_alone(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Dish.objects.create(name="Borscht", price=100, restaurant=self.restaurant)
+                raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.catalog_version(), 0)
+
+    def test_write_goes_through_with_redis_down(self):
+        self.server.connected = False
+
+        with self.assertLogs("food.signals", "WARNING"), self.captureOnCommitCallbacks(execute=True):
+            dish = Dish.objects.create(name="Borscht", price=100, restaurant=self.restaurant)
+
+        self.assertTrue(Dish.objects.filter(pk=dish.pk).exists())
+        self.assertIsNone(dish_index.version)
+
+class LocalCacheTestCase(TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("shared.cache.time", mock.Mock(monotonic=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LocalCache(maxsize=2, ttl=60)
+        cache.set("a", b"1")
+        cache.set("b", b"2")
+        cache.get("a")
+
+        cache.set("c", b"3")
+
+        self.assertEqual([cache.get(key) for key in ("a", "b", "c")], [b"1", None, b"3"])
+
+    def test_entry_expires_with_the_shorter_ttl(self):
+        cache = LocalCache(maxsize=10, ttl=60)
+        cache.set("short", b"1", ttl=5)
+        cache.set("long", b"2", ttl=600)
+
+        self.now += 6
+        self.assertEqual([cache.get("short"), cache.get("long")], [None, b"2"])
+
+        self.now += 55
+        self.assertIsNone(cache.get("long"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+class LocalCacheInvalidationTestCase(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # this test needs the subscriber thread, stopped with the test
+        patcher = mock.patch.object(CacheService, "_subscriber_pid", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.stop_subscriber)
+
+    @staticmethod
+    def stop_subscriber():
+        for thread in threading.enumerate():
+            if type(thread).__name__ == "PubSubWorkerThread":
+                thread.stop()
+
+    def test_entry_is_dropped_when_another_process_changes_the_key(self):
+        cache = CacheService(local=True)
+        cache.set("restaurants", "silpo", {"name": "Silpo"})
+        self.assertEqual(cache.get("restaurants", "silpo"), {"name": "Silpo"})
+
+        # another process writes the key and publishes it
+        self.redis.set("restaurants:silpo", CacheService.codec.encode({"name": "Silpo Market"}))
+        self.assertEqual(cache.get("restaurants", "silpo"), {"name": "Silpo"})
+        self.redis.publish(CacheService.INVALIDATION_CHANNEL, "restaurants:silpo")
+
+        deadline = time.monotonic() + 3
+        while cache.get("restaurants", "silpo") != {"name": "Silpo Market"} and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        self.assertEqual(cache.get("restaurants", "silpo"), {"name": "Silpo Market"})
+
+class CodecsTestCase(TestCase):
+    value = {
+        "restaurants": {"1": {"external_id": "a1b2", "status": "cooking"}},
+        "delivery": {"location": [50.45, 30.52]},
+        "priority": 3,
+    }
+
+    def test_every_codec_round_trips(self):
+        for codec in codecs.CODECS.values():
+            with self.subTest(codec=codec.name):
+                payload = codec.encode(self.value)
+
+                self.assertEqual(payload[:1], codec.header)
+                self.assertEqual(codecs.decode(payload), self.value)
+
+    def test_headers_are_unique(self):
+        headers = [codec.header for codec in codecs.CODECS.values()]
+
+        self.assertEqual(len(headers), len(set(headers)))
+
+    def test_payload_without_header_is_read_as_json(self):
+        self.assertEqual(codecs.decode(json.dumps(self.value).encode()), self.value)
+
+    def test_unknown_header_and_codec_fail(self):
+        with self.assertRaises(ValueError):
+            codecs.decode(b"\x1f{}")
+        with self.assertRaises(ValueError):
+            codecs.get_codec("pickle")
+
+class OrdersBatchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        restaurant = Restaurant.objects.create(name="Silpo", address="Kyiv")
+        cls.dishes = Dish.objects.bulk_create(
+            [Dish(name=f"Dish {index}", price=10, restaurant=restaurant) for index in range(3)]
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        patcher = mock.patch("food.views.schedule_orders")
+        self.schedule_orders = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def order(self, dish_id: int) -> dict:
+        return {
+            "user": self.user.pk,
+            "eta": date.today() + timedelta(days=2),
+            "items": [{"dish": dish_id, "quantity": 2}],
+        }
+
+    def post(self, orders: list[dict]):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/food/orders/batch/", {"orders": orders}, format="json")
+
+    def test_orders_are_created_and_scheduled_by_one_task(self):
+        response = self.post([self.order(dish.pk) for dish in self.dishes])
+
+        self.assertEqual(response.status_code, 201, response.data)
+        order_ids = [order["id"] for order in response.data["created"]]
+        self.assertEqual(len(order_ids), 3)
+        self.assertEqual(response.data["created"][0]["items"], [{"dish": self.dishes[0].pk, "quantity": 2}])
+        self.assertEqual(OrderItem.objects.filter(order_id__in=order_ids).count(), 3)
+        self.schedule_orders.delay.assert_called_once_with(OrderBatchPayload(order_ids))
+
+    def test_invalid_orders_are_reported_and_the_valid_ones_created(self):
+        response = self.post([self.order(self.dishes[0].pk), self.order(0), self.order(self.dishes[1].pk)])
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(list(response.data["errors"]), [1])
+        self.assertIn("items", response.data["errors"][1])
+        order_ids = [order["id"] for order in response.data["created"]]
+        self.assertEqual(
+            [order["items"][0]["dish"] for order in response.data["created"]], [self.dishes[0].pk, self.dishes[1].pk]
+        )
+        self.assertEqual(set(Order.objects.values_list("pk", flat=True)), set(order_ids))
+        self.schedule_orders.delay.assert_called_once_with(OrderBatchPayload(order_ids))
+
+    def test_batch_without_valid_orders_is_rejected(self):
+        response = self.post([self.order(0)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data["errors"]), [0])
+        self.assertFalse(Order.objects.exists())
+        self.schedule_orders.delay.assert_not_called()
+
+    @mock.patch.object(FoodAPIViewSet, "ORDERS_BATCH_LIMIT", 2)
+    def test_batch_size_is_limited(self):
+        response = self.post([self.order(dish.pk) for dish in self.dishes])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("No more than 2 orders", str(response.data["orders"]))
+        self.assertFalse(Order.objects.exists())
+
+class OrderSerializerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        restaurant = Restaurant.objects.create(name="Silpo", address="Kyiv")
+        cls.dishes = Dish.objects.bulk_create(
+            [Dish(name=f"Dish {index}", price=10 + index, restaurant=restaurant) for index in range(20)]
+        )
+
+    def payload(self, dish_ids: list[int]) -> dict:
+        return {
+            "user": self.user.pk,
+            "eta": date.today() + timedelta(days=2),
+            "delivery_provider": "uklon",
+            "items": [{"dish": dish_id, "quantity": 2} for dish_id in dish_ids],
+        }
+
+    def test_large_order_is_validated_with_constant_queries(self):
+        serializer = OrderSerializer(data=self.payload([dish.pk for dish in self.dishes]))
+
+        # one query for the user and one for all the dishes
+        with self.assertNumQueries(2):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            total = serializer.calculated_total
+
+        self.assertEqual(total, sum(dish.price * 2 for dish in self.dishes))
+
+    def test_unknown_dish_is_rejected(self):
+        serializer = OrderSerializer(data=self.payload([self.dishes[0].pk, 0]))
+
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("items", serializer.errors)
+
+class OrderTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        cls.order = Order.objects.create(user=user, eta=date.today() + timedelta(days=2))
+
+        for name in ("Silpo", "KFC", "Uklon Food"):
+            restaurant = Restaurant.objects.create(name=name, address=f"{name} street")
+            dishes = Dish.objects.bulk_create(
+                [Dish(name=f"{name} dish {index}", price=100, restaurant=restaurant) for index in range(3)]
+            )
+            OrderItem.objects.bulk_create([OrderItem(order=cls.order, dish=dish, quantity=1) for dish in dishes])
+
+    def test_items_and_delivery_meta_share_one_query(self):
+        order = Order.objects.get(pk=self.order.pk)
+
+        with self.assertNumQueries(1):
+            items_by_restaurant = order.items_by_restaurant()
+            delivery_meta = order.delivery_meta()
+
+        self.assertEqual(len(items_by_restaurant), 3)
+        self.assertTrue(all(len(items) == 3 for items in items_by_restaurant.values()))
+        self.assertCountEqual(
+            delivery_meta,
+            [("Silpo", "Silpo street"), ("KFC", "KFC street"), ("Uklon Food", "Uklon Food street")],
+        )
+
+class CatalogTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ("Silpo", "KFC", "Uklon Food"):
+            restaurant = Restaurant.objects.create(name=name, address=f"{name} street")
+            Dish.objects.bulk_create(
+                [Dish(name=f"{name} {kind} {index}", price=100, restaurant=restaurant)
+                 for kind in ("burger", "salad") for index in range(3)]
+            )
+
+    def test_catalog_is_built_with_two_queries(self):
+        request = Request(APIRequestFactory().get("/food/dishes/", {"limit": 2, "offset": 1}))
+
+        with self.assertNumQueries(2):
+            catalog = build_catalog(request)
+
+        self.assertEqual(len(catalog), 3)
+        for restaurant in catalog:
+            self.assertEqual(
+                [dish["name"] for dish in restaurant["dishes"]],
+                [f"{restaurant['name']} burger 1", f"{restaurant['name']} burger 2"],
+            )
+
+class InvertedIndexTestCase(TestCase):
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.bulk_add([(1, "Chicken burger"), (2, "Chick peas salad"), (3, "Chicken"), (4, "Beef burger")])
+
+    def test_exact_and_shorter_matches_rank_first(self):
+        self.assertEqual(self.index.search("chicken"), [3, 1])
+        self.assertEqual(self.index.search("chick"), [2, 3, 1])
+        self.assertEqual(self.index.search("chick", limit=1), [2])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.index.search("burg chick"), [1])
+        self.assertEqual(self.index.search("burger pizza"), [])
+
+    def test_removed_and_renamed_documents_are_not_found(self):
+        self.index.remove(3)
+        self.index.add(1, "Fish burger")
+
+        self.assertEqual(self.index.search("chicken"), [])
+        self.assertEqual(self.index.search("fish"), [1])
+
+class DishSearchTestCase(FakeRedisMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.restaurant = Restaurant.objects.create(name="Silpo", address="Kyiv")
+        Dish.objects.bulk_create(
+            [Dish(name=name, price=100, restaurant=cls.restaurant) for name in ("Chicken burger", "Chicken", "Salad")]
+        )
+
+    def setUp(self):
+        super().setUp()
+        dish_index.expire()
+
+    def test_index_is_rebuilt_when_another_process_changes_the_catalog(self):
+        index = DishIndex()
+        self.assertEqual(len(index.fresh()), 3)
+
+        # bulk_create sends no signals, as if the dish was written by another process
+        Dish.objects.bulk_create([Dish(name="Chicken wings", price=100, restaurant=self.restaurant)])
+        self.assertEqual(len(index.fresh()), 3)
+
+        self.redis.incr("catalog:version")
+        self.assertEqual(len(index.fresh()), 4)
+
+    def test_best_matches_come_first(self):
+        self.assertEqual([dish.name for dish in search_dishes("chick")], ["Chicken", "Chicken burger"])
+
+    @mock.patch("food.search.MATCH_LIMIT", 1)
+    def test_matches_are_capped_to_the_best_ones(self):
+        self.assertEqual([dish.name for dish in matching_dishes("chicken")], ["Chicken"])
+
+@override_settings(STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class DishImportTestCase(FakeRedisMixin, TestCase):
+    CSV = (
+        "\ufeffname,price,restaurant\n"
+        "Borscht,120,silpo\n"
+        "Varenyky,90,Silpo Market\n"
+        ",50,silpo\n"
+        "Twister,-1,silpo\n"
+        "Kyiv cutlet,150,kfc\n"
+        "Deruny,80,silpo\n"
+        "Olivier,100,silpo\n"
+    ).encode()
+
+    @classmethod
+    def setUpTestData(cls):
+        Restaurant.objects.create(name="Silpo Market", address="Kyiv")
+
+    def test_rows_are_streamed_in_chunks_and_bad_rows_are_reported(self):
+        progress: list[int] = []
+
+        report = import_dishes_csv(
+            io.BytesIO(self.CSV), chunk_size=2, on_progress=lambda report: progress.append(report.imported)
+        )
+
+        self.assertEqual((report.status, report.imported, report.failed), ("done", 4, 3))
+        self.assertEqual(progress, [2, 4])
+        self.assertEqual([error["line"] for error in report.errors], [4, 5, 6])
+        self.assertEqual(Dish.objects.filter(restaurant__name="Silpo Market").count(), 4)
+        # bulk_create sends no signals, the catalog version is bumped by the import
+        self.assertEqual(int(self.redis.get("catalog:version")), 1)
+
+    @mock.patch("food.views.IMPORT_ASYNC_THRESHOLD", 16)
+    @mock.patch("food.dish_import.import_dishes_task")
+    def test_large_upload_is_imported_by_a_task(self, task):
+        self.client.force_login(User.objects.create_superuser(email="admin@catering.com", password="password"))
+
+        self.client.post("/admin/food/dish/import-dishes/", {"file": SimpleUploadedFile("dishes.csv", self.CSV)})
+
+        task.delay.assert_called_once()
+        import_id, path = task.delay.call_args.args
+        self.assertEqual(get_import(import_id)["status"], "running")
+        self.assertFalse(Dish.objects.exists())
+
+        import_dishes_task(import_id, path)
+
+        self.assertEqual(get_import(import_id)["imported"], 4)
+        self.assertIsNone(get_import("missing"))
+
+class KfcWebhookTestCase(FakeRedisMixin, TestCase):
+    URL = "/webhooks/kfc/5834eb6c-63b9-4018-b6d3-04e170278ec2/"
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        self.restaurant = Restaurant.objects.create(name="KFC", address="Kyiv")
+        self.order = Order.objects.create(user=user, eta=date.today())
+
+        TrackingOrder(restaurants={str(self.restaurant.pk): {"external_id": "kfc-1", "status": "not_started"}}).save(
+            self.order.pk
+        )
+        CacheService().set("kfc_orders", "kfc-1", {"internal_order_id": self.order.pk}, ttl=TRACKING_TTL)
+        CacheService().stream_group("webhooks", "kfc", GROUP)
+
+        # the consumer runs outside of a request, the test transaction must stay open
+        patcher = mock.patch("food.webhooks.close_old_connections")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch("food.webhooks.advance_restaurant_leg", wraps=advance_restaurant_leg)
+        self.advance = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def pending(self) -> int:
+        return self.redis.xpending("webhooks:kfc", GROUP)["pending"]
+
+    def test_event_is_accepted_for_a_known_order_only(self):
+        response = self.client.post(self.URL, {"id": "kfc-1", "status": "cooking"}, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+
+        response = self.client.post(self.URL, {"id": "kfc-2", "status": "cooking"}, content_type="application/json")
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.post(self.URL, {"id": "kfc-1", "status": "lost"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.redis.xlen("webhooks:kfc"), 1)
+
+    def test_repeated_event_is_applied_once(self):
+        enqueue_kfc_event("kfc-1", "cooking")
+        enqueue_kfc_event("kfc-1", "cooking")
+
+        consume_batch(CacheService(), "worker-1")
+
+        self.advance.assert_called_once()
+        self.assertEqual(TrackingOrder.load(self.order.pk).restaurants[str(self.restaurant.pk)]["status"], "cooking")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, OrderStatus.COOKING)
+        self.assertEqual(self.pending(), 0)
+
+    def test_failed_event_stays_pending_and_is_retried(self):
+        enqueue_kfc_event("kfc-1", "cooking")
+        enqueue_kfc_event("kfc-2", "cooking")
+
+        self.advance.side_effect = ConnectionError("database is down")
+        consume_batch(CacheService(), "worker-1")
+
+        # the unknown order is done with, the failed one waits and keeps no idempotency key
+        self.assertEqual(self.pending(), 1)
+        self.assertFalse(self.redis.exists("webhook_events:kfc:kfc-1:cooking"))
+
+        self.advance.side_effect = None
+        with mock.patch("food.webhooks.CLAIM_IDLE", 0):
+            self.assertEqual(consume_batch(CacheService(), "worker-1", claim=True), 1)
+
+        self.assertEqual(self.advance.call_count, 2)
+        self.assertEqual(self.pending(), 0)
+
+    def test_event_of_a_consumer_that_died_while_applying_it_is_applied_once_claimed(self):
+        enqueue_kfc_event("kfc-1", "cooking")
+
+        self.advance.side_effect = SystemExit
+        with mock.patch("food.webhooks.APPLY_TTL", 1), self.assertRaises(SystemExit):
+            consume_batch(CacheService(), "worker-1")
+        self.assertEqual(self.pending(), 1)
+
+        # the claim is taken once the key of the dead consumer has expired
+        time.sleep(1.1)
+        self.advance.side_effect = None
+        with mock.patch("food.webhooks.CLAIM_IDLE", 0):
+            consume_batch(CacheService(), "worker-2", claim=True)
+
+        self.assertEqual(self.advance.call_count, 2)
+        self.assertEqual(TrackingOrder.load(self.order.pk).restaurants[str(self.restaurant.pk)]["status"], "cooking")
+        self.assertGreater(self.redis.ttl("webhook_events:kfc:kfc-1:cooking"), 1)
+        self.assertEqual(self.pending(), 0)
+
+    def test_events_of_a_dead_consumer_are_claimed(self):
+        enqueue_kfc_event("kfc-1", "cooking")
+        # read and never acked, as if the consumer died halfway through the batch
+        CacheService().stream_read("webhooks", "kfc", GROUP, "worker-1", count=10)
+
+        consume_batch(CacheService(), "worker-2", claim=True)
+        self.advance.assert_not_called()
+
+        with mock.patch("food.webhooks.CLAIM_IDLE", 0):
+            self.assertEqual(consume_batch(CacheService(), "worker-2", claim=True), 1)
+
+        self.advance.assert_called_once()
+        self.assertEqual(self.pending(), 0)
+
+class TrackingHubTestCase(TestCase):
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+
+    def run_async(self, scenario):
+        async def run():
+            # async connections belong to the loop, the hub is made inside it
+            hub = TrackingHub(fakeredis.aioredis.FakeRedis(server=self.server))
+            with mock.patch("food.tracking.get_hub", return_value=hub):
+                return await scenario(hub)
+
+        return asyncio.run(run())
+
+    @staticmethod
+    async def publish(hub: TrackingHub, order_id: int, changes: dict) -> None:
+        await hub.redis.publish(f"{CHANNEL_NAMESPACE}:{order_id}", json.dumps(changes))
+
+    def test_every_watcher_of_the_order_gets_the_changes(self):
+        async def scenario(hub):
+            async with hub.watch(1) as first, hub.watch(1) as second, hub.watch(2) as other:
+                self.assertEqual(set(hub.pubsub.channels), {b"tracking_events:1", b"tracking_events:2"})
+
+                await self.publish(hub, 1, {"delivery:status": "delivery"})
+                await asyncio.wait_for(asyncio.gather(first.ready.wait(), second.ready.wait()), timeout=2)
+
+                self.assertEqual(first.take(), {"delivery:status": "delivery"})
+                self.assertEqual(second.take(), {"delivery:status": "delivery"})
+                self.assertFalse(other.ready.is_set())
+
+        self.run_async(scenario)
+
+    @mock.patch("food.tracking.LOCATION_INTERVAL", 0.2)
+    def test_locations_are_coalesced_and_the_stream_ends_on_delivery(self):
+        async def scenario(hub):
+            await hub.redis.hset("orders:1", "delivery:status", json.dumps("delivery"))
+            stream = tracking_events(1)
+            self.assertIn('"delivery:status": "delivery"', await anext(stream))
+
+            await self.publish(hub, 1, {"delivery:location": [50.0, 30.0]})
+            self.assertIn("[50.0, 30.0]", await anext(stream))
+
+            # sent within the interval, only the latest location goes out
+            for step in range(1, 4):
+                await self.publish(hub, 1, {"delivery:location": [50.0 + step, 30.0]})
+            update = await asyncio.wait_for(anext(stream), timeout=2)
+            self.assertEqual(update, 'event: update\ndata: {"delivery:location": [53.0, 30.0]}\n\n')
+
+            await self.publish(hub, 1, {"delivery:status": "delivered"})
+            self.assertIn("delivered", await anext(stream))
+            with self.assertRaises(StopAsyncIteration):
+                await anext(stream)
+
+            return hub
+
+        hub = self.run_async(scenario)
+        self.assertEqual(hub.watchers, {})
+
+    def test_disconnected_client_is_unsubscribed(self):
+        async def scenario(hub):
+            stream = tracking_events(1)
+            await anext(stream)
+            self.assertEqual(set(hub.watchers), {"tracking_events:1"})
+
+            await stream.aclose()
+
+            self.assertEqual(hub.watchers, {})
+            self.assertEqual(await hub.redis.pubsub_numsub("tracking_events:1"), [(b"tracking_events:1", 0)])
+
+        self.run_async(scenario)
+
+class OrderTrackingStreamTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        cls.order = Order.objects.create(user=cls.user, eta=date.today())
+
+    def url(self) -> str:
+        return f"/food/orders/{self.order.pk}/tracking/"
+
+    def test_missing_or_wrong_token_is_rejected(self):
+        self.assertEqual(self.client.get(self.url()).status_code, 401)
+        self.assertEqual(self.client.get(self.url(), {"token": "not-a-token"}).status_code, 401)
+        response = self.client.get(self.url(), headers={"Authorization": "Bearer not-a-token"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_order_of_another_user_is_not_found(self):
+        other = User.objects.create_user(email="jane@catering.com", password="password", phone_number="0507654321")
+
+        response = self.client.get(self.url(), {"token": str(AccessToken.for_user(other))})
+
+        self.assertEqual(response.status_code, 404)
+
+class ExportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        restaurant = Restaurant.objects.create(name="Silpo", address="Kyiv")
+        cls.dishes = Dish.objects.bulk_create(
+            [Dish(name=f"Dish {index}", price=10 + index, restaurant=restaurant) for index in range(5)]
+        )
+
+    def test_dishes_are_exported_after_since_id(self):
+        response = export_response("dishes", "ndjson", since_id=self.dishes[1].pk)
+
+        with self.assertNumQueries(1):
+            lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Dish 2", "Dish 3", "Dish 4"])
+
+    def test_csv_export_starts_with_header(self):
+        response = export_response("dishes", "csv")
+        rows = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(rows[0], "id,name,price,restaurant_id")
+        self.assertEqual(len(rows), 6)
+
+class TaskPayloadTestCase(TestCase):
+    def test_task_message_round_trips_through_kombu(self):
+        payloads.register_serializer()
+        delivery = DeliveryPayload([1, 2], ["Kyiv, 1", "Kyiv, 2"], ["Delivery to the Silpo", "Delivery to the KFC"])
+        lines = OrderLinesPayload(3, [["Twister", 2]])
+        # the Celery message body: args, kwargs and embed
+        message = [[delivery], {"payload": lines}, {"callbacks": None}]
+
+        content_type, encoding, body = kombu_dumps(message, serializer=payloads.SERIALIZER)
+
+        self.assertEqual(content_type, payloads.CONTENT_TYPE)
+        self.assertEqual(body[:1], codecs.MsgpackCodec.header)
+        self.assertEqual(kombu_loads(body, content_type, encoding, accept=[content_type]), message)
+
+    def test_newer_payload_version_is_rejected(self):
+        body = payloads.dumps([OrderLinesPayload(3, [["Twister", 2]])])
+        newer = codecs.decode(body)
+        newer[0][payloads.MARKER][1] = OrderLinesPayload.version + 1
+
+        with self.assertRaises(ValueError):
+            payloads.loads(codecs.JsonCodec().encode(newer))
+
+class OrderPriorityTestCase(TestCase):
+    def test_closer_eta_has_higher_priority(self):
+        today = date(2025, 1, 10)
+        priorities = [order_priority(today + timedelta(days=days), today) for days in (-1, 0, 1, 2, 5)]
+
+        self.assertEqual(priorities, sorted(priorities, reverse=True))
+        self.assertGreaterEqual(priorities[1], URGENT_PRIORITY)
+        self.assertEqual(priorities[-1], 0)
+
+class ProviderSlotTestCase(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # the clock of the Lua scripts, moved by hand
+        self.now = 1_700_000_000.0
+        patcher = mock.patch("fakeredis.commands_mixins.server_mixin.time", mock.Mock(time=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.dict(PROVIDER_LIMITS, {"uklon": ProviderLimit(rate=2, burst=3, max_in_flight=2)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def take(self, calls: int) -> None:
+        for _ in range(calls):
+            with provider_slot("uklon"):
+                pass
+
+    def test_bucket_is_exhausted_after_the_burst(self):
+        self.take(3)
+
+        with self.assertRaises(Throttled) as error:
+            self.take(1)
+
+        # one token at 2 per second, with up to 50% jitter
+        self.assertTrue(0.5 <= error.exception.retry_after <= 0.75)
+
+    def test_bucket_refills_with_time(self):
+        self.take(3)
+
+        self.now += 1
+        self.take(2)
+
+        with self.assertRaises(Throttled):
+            self.take(1)
+
+    def test_calls_in_flight_are_limited_until_released(self):
+        with provider_slot("uklon"), provider_slot("uklon"):
+            with self.assertRaises(Throttled) as error:
+                self.take(1)
+
+            self.assertTrue(BACKPRESSURE_DELAY <= error.exception.retry_after <= BACKPRESSURE_DELAY * 1.5)
+
+        self.take(1)
+
+    def test_lease_of_a_dead_worker_expires(self):
+        # the leases are never released, as if the workers were killed
+        slots = [provider_slot("uklon") for _ in range(2)]
+        for slot in slots:
+            slot.__enter__()
+
+        with self.assertRaises(Throttled):
+            self.take(1)
+
+        self.now += LEASE_TTL + 1
+        self.take(1)
+
+    def test_throttled_task_is_retried_after_the_wait(self):
+        task = mock.Mock()
+        task.request.called_directly = False
+        task.retry.return_value = RuntimeError("retry")
+
+        with self.assertRaises(RuntimeError):
+            retry_throttled(task, Throttled("uklon", 2.5))
+
+        task.retry.assert_called_once_with(countdown=2.5)
+
+        task.request.called_directly = True
+        with self.assertRaises(Throttled):
+            retry_throttled(task, Throttled("uklon", 2.5))
+
+class DeliveryBatchingTestCase(TestCase):
+    def test_close_orders_share_a_route(self):
+        today = date(2025, 1, 10)
+        near = [Stop(f"Near {index}", f"Near street {index}", (50.45 + index * 0.001, 30.52)) for index in range(3)]
+        far = Stop("Far", "Far street", (50.60, 30.90))
+        deliveries = [Delivery(index, today, (stop,)) for index, stop in enumerate([*near, far])]
+        deliveries.append(Delivery(10, today + timedelta(days=1), (near[0],)))
+
+        batches = plan_batches(deliveries)
+
+        self.assertEqual(sorted(sorted(batch.order_ids) for batch in batches), [[0, 1, 2], [3], [10]])
+        self.assertTrue(all(len(batch.order_ids) <= MAX_ORDERS for batch in batches))
+
+class PlanDeliveriesTestCase(FakeRedisMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        restaurant = Restaurant.objects.create(name="Silpo", address="Kyiv")
+        dish = Dish.objects.create(name="Borsch", price=10, restaurant=restaurant)
+        self.order_ids = []
+        for _ in range(2):
+            order = Order.objects.create(user=user, eta=date.today())
+            OrderItem.objects.create(order=order, dish=dish, quantity=1)
+            CacheService().hset("delivery", "pending", str(order.pk), {"priority": 0})
+            self.order_ids.append(order.pk)
+
+    def test_dispatched_orders_leave_the_queue(self):
+        with mock.patch("food.services.dispatch") as dispatch:
+            plan_deliveries()
+
+        dispatched = [order_id for call in dispatch.call_args_list for order_id in call.args[1].order_ids]
+        self.assertEqual(sorted(dispatched), self.order_ids)
+        self.assertEqual(CacheService().hgetall("delivery", "pending"), {})
+
+    def test_failed_planning_keeps_the_orders_for_the_next_window(self):
+        with (
+            mock.patch("food.services.plan_batches", side_effect=ValueError("bad address")),
+            mock.patch("food.services.plan_deliveries.apply_async") as apply_async,
+        ):
+            plan_deliveries()
+
+        self.assertEqual(sorted(map(int, CacheService().hgetall("delivery", "pending"))), self.order_ids)
+        apply_async.assert_called_once()
+
+class OrderDeliveryTestCase(TestCase):
+    def test_throttled_retries_move_the_orders_into_the_lookup_once(self):
+        user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        orders = [Order.objects.create(user=user, eta=date.today(), status=OrderStatus.COOKED) for _ in range(2)]
+        payload = DeliveryPayload([order.pk for order in orders], ["Kyiv"], ["Delivery to the Silpo"])
+        series = ("food_orders_status_total", {"status": OrderStatus.DELIVERY_LOOKUP})
+        before = REGISTRY.get_sample_value(*series) or 0
+
+        with mock.patch("food.services.place_delivery", side_effect=Throttled("uklon", 1.5)):
+            for _ in range(3):
+                with self.assertRaises(Throttled):
+                    order_delivery(payload)
+
+        self.assertEqual(REGISTRY.get_sample_value(*series) - before, 2)
+        self.assertEqual(set(Order.objects.values_list("status", flat=True)), {OrderStatus.DELIVERY_LOOKUP})
+
+class ProviderSelectionTestCase(TestCase):
+    def test_least_loaded_provider_goes_first(self):
+        stats = [
+            ProviderStats("uklon", capacity=10, in_flight=6, latency=0.1, calls=50),
+            ProviderStats("uber", capacity=10, in_flight=2, latency=0.3, calls=50),
+        ]
+
+        self.assertEqual(rank_providers(stats, "least_loaded"), ["uber", "uklon"])
+
+    def test_saturated_and_failing_providers_go_last(self):
+        stats = [
+            ProviderStats("uklon", capacity=10, in_flight=10),
+            ProviderStats("uber", capacity=10, error_rate=0.9),
+        ]
+
+        self.assertEqual(rank_providers(stats, "least_loaded"), ["uklon", "uber"])
+
+    def test_latency_strategy_prefers_the_fast_provider(self):
+        stats = [
+            ProviderStats("uklon", capacity=10, latency=2.0, calls=50),
+            ProviderStats("uber", capacity=10, latency=0.1, calls=50),
+        ]
+        rng = random.Random(42)
+
+        firsts = [rank_providers(stats, "latency", rng)[0] for _ in range(1000)]
+
+        self.assertGreater(firsts.count("uber"), 900)
+
+class ProviderRetryTestCase(TestCase):
+    def test_backoff_is_jittered_and_capped(self):
+        delays = [backoff(attempt) for attempt in range(1, 20) for _ in range(50)]
+
+        self.assertTrue(all(0 <= delay <= RETRY_CAP for delay in delays))
+        self.assertGreater(len(set(delays)), len(delays) // 2)
+
+class CircuitBreakerTestCase(TestCase):
+    URL = "https://kfc.test/api/orders/"
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+
+        patcher = mock.patch("food.providers.resilience.pool")
+        self.pool = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_async(self, scenario):
+        async def run():
+            # async connections belong to the loop, the store is made inside it
+            store = BreakerStore(fakeredis.aioredis.FakeRedis(server=self.server))
+            with mock.patch("food.providers.resilience.get_store", return_value=store):
+                return await scenario()
+
+        return asyncio.run(run())
+
+    def test_breaker_opens_after_the_failure_threshold(self):
+        self.pool.request = mock.AsyncMock(return_value=httpx.Response(503))
+
+        async def scenario():
+            for _ in range(5):
+                response = await provider_request("kfc", "POST", self.URL)
+                self.assertEqual(response.status_code, 503)
+
+            with self.assertRaises(CircuitOpen) as error:
+                await provider_request("kfc", "POST", self.URL)
+
+            return error.exception
+
+        with mock.patch("food.providers.resilience.BREAKER_FAILURES", 5):
+            error = self.run_async(scenario)
+
+        self.assertEqual(self.pool.request.await_count, 5)
+        self.assertTrue(0 < error.retry_after <= BREAKER_COOLDOWN)
+
+    @mock.patch("food.providers.resilience.BREAKER_COOLDOWN", 0.05)
+    @mock.patch("food.providers.resilience.BREAKER_FAILURES", 1)
+    def test_half_open_breaker_lets_a_single_probe_through(self):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def slow_success(*args, **kwargs):
+                await release.wait()
+                return httpx.Response(200)
+
+            self.pool.request = mock.AsyncMock(return_value=httpx.Response(503))
+            await provider_request("kfc", "POST", self.URL)
+            with self.assertRaises(CircuitOpen):
+                await provider_request("kfc", "POST", self.URL)
+
+            await asyncio.sleep(0.1)
+            self.pool.request = mock.AsyncMock(side_effect=slow_success)
+            probe = asyncio.ensure_future(provider_request("kfc", "POST", self.URL))
+            await asyncio.sleep(0.01)
+
+            # the probe is in flight, everyone else still waits
+            with self.assertRaises(CircuitOpen):
+                await provider_request("kfc", "POST", self.URL)
+
+            release.set()
+            self.assertEqual((await probe).status_code, 200)
+
+            # the probe succeeded, the breaker is closed again
+            self.assertEqual((await provider_request("kfc", "POST", self.URL)).status_code, 200)
+
+        self.run_async(scenario)
+        self.assertEqual(self.pool.request.await_count, 2)
+
+    @mock.patch("food.providers.resilience.HEDGE_AFTER", 0.01)
+    def test_slow_read_is_hedged(self):
+        responses = [httpx.Response(200, json={"copy": 1}), httpx.Response(200, json={"copy": 2})]
+
+        async def first_is_slow(*args, **kwargs):
+            response = responses.pop(0)
+            if response.json()["copy"] == 1:
+                await asyncio.sleep(1)
+            return response
+
+        self.pool.request = mock.AsyncMock(side_effect=first_is_slow)
+
+        async def scenario():
+            return await provider_request("kfc", "GET", self.URL, hedge=True)
+
+        self.assertEqual(self.run_async(scenario).json(), {"copy": 2})
+        self.assertEqual(self.pool.request.await_count, 2)
+
+class ScheduleOrderTestCase(FakeRedisMixin, TestCase):
+    def test_open_circuit_queues_the_order_with_a_countdown(self):
+        user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        dish = Dish.objects.create(name="Twister", price=10, restaurant=Restaurant.objects.create(name="KFC"))
+        order = Order.objects.create(user=user, eta=date.today())
+        OrderItem.objects.create(order=order, dish=dish, quantity=2)
+
+        with (
+            mock.patch("food.services.order_in_kfc", side_effect=CircuitOpen("kfc", 12.5)) as order_in_kfc,
+            mock.patch("food.services.dispatch") as dispatch,
+        ):
+            schedule_order(Order.objects.get(pk=order.pk))
+
+        dispatch.assert_called_once_with(
+            order_in_kfc,
+            OrderLinesPayload(order.pk, [("Twister", 2)]),
+            order_priority(order.eta),
+            countdown=12.5,
+        )
+
+class MetricsTestCase(FakeRedisMixin, TestCase):
+    def test_endpoint_is_closed_without_a_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_endpoint_requires_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+
+        response = self.client.get("/metrics", headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"# TYPE food_create_order_seconds histogram", response.content)
+        self.assertIn(b'food_tracked_legs{provider="silpo"} 0.0', response.content)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_redis_being_down_drops_the_gauge_only(self):
+        self.server.connected = False
+
+        response = self.client.get("/metrics", headers={"Authorization": "Bearer secret"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"food_create_order_seconds", response.content)
+        self.assertNotIn(b"food_tracked_legs", response.content)
+
+class QueryBudgetTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ("Silpo", "KFC", "Uklon Food"):
+            restaurant = Restaurant.objects.create(name=name, address=f"{name} street")
+            Dish.objects.create(name=f"{name} burger", price=100, restaurant=restaurant)
+
+    def test_repeated_statement_is_reported(self):
+        with self.assertRaises(AssertionError) as context:
+            with query_budget(2):
+                [dish.restaurant.name for dish in Dish.objects.all()]
+
+        self.assertIn("4 queries, the budget is 2", str(context.exception))
+        self.assertIn("3x", str(context.exception))
+
+    def test_select_related_fits_the_budget(self):
+        with query_budget(1) as profile:
+            names = [dish.restaurant.name for dish in Dish.objects.select_related("restaurant")]
+
+        self.assertEqual(len(names), 3)
+        self.assertEqual(profile.duplicates, 0)
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "food_dish" WHERE "id" IN (%s, %s) AND "price" > 10'),
+            fingerprint('SELECT * FROM "food_dish" WHERE "id" IN (%s) AND "price" > 250'),
+        )
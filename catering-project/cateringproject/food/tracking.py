@@ -0,0 +1,155 @@
+"""Live order tracking over server-sent events.
+
+`TrackingOrder` writers publish every changed field to the `tracking_events:<order id>`
+Redis channel. One `TrackingHub` per process holds a single pub/sub connection,
+subscribed to the orders that have watchers, and fans the messages out to them.
+A client costs one hash read when it connects and nothing while it waits.
+
+Runs under ASGI only (`cateringproject.asgi`), a WSGI worker would be held by every stream.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import redis.asyncio as aioredis
+
+from .enums import OrderStatus
+
+CHANNEL_NAMESPACE = "tracking_events"
+# Location updates of a watcher are sent at most once per this many seconds, the latest wins
+LOCATION_INTERVAL = float(os.getenv("TRACKING_LOCATION_INTERVAL", default="1"))
+# Seconds of silence before a keep-alive comment, proxies drop idle connections
+KEEPALIVE_INTERVAL = 15
+
+LOCATION_FIELDS = frozenset({"delivery:location"})
+
+logger = logging.getLogger(__name__)
+
+class Watcher:
+    """Changes for one client, merged until the client takes them."""
+
+    def __init__(self):
+        self.changes: dict = {}
+        self.ready = asyncio.Event()
+
+    def push(self, changes: dict) -> None:
+        self.changes.update(changes)
+        self.ready.set()
+
+    def take(self) -> dict:
+        changes, self.changes = self.changes, {}
+        self.ready.clear()
+
+        return changes
+
+class TrackingHub:
+    def __init__(self, client: aioredis.Redis):
+        self.redis = client
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.watchers: dict[str, set[Watcher]] = {}
+        self._reader: asyncio.Task | None = None
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self.pubsub.get_message(timeout=1.0)
+            except aioredis.ConnectionError as error:
+                # the connection is re-established with the subscriptions on the next read
+                logger.warning("tracking.redis_lost", extra={"error": repr(error)})
+                await asyncio.sleep(1)
+                continue
+            if message is None:
+                continue
+
+            changes = json.loads(message["data"])
+            for watcher in self.watchers.get(message["channel"].decode(), ()):
+                watcher.push(changes)
+
+    @asynccontextmanager
+    async def watch(self, order_id: int) -> AsyncIterator[Watcher]:
+        channel = f"{CHANNEL_NAMESPACE}:{order_id}"
+        watcher = Watcher()
+
+        if channel not in self.watchers:
+            self.watchers[channel] = set()
+            await self.pubsub.subscribe(channel)
+        self.watchers[channel].add(watcher)
+
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read())
+
+        try:
+            yield watcher
+        finally:
+            watchers = self.watchers[channel]
+            watchers.discard(watcher)
+            if not watchers:
+                del self.watchers[channel]
+                await self.pubsub.unsubscribe(channel)
+
+    async def snapshot(self, order_id: int) -> dict:
+        fields = await self.redis.hgetall(f"orders:{order_id}")
+
+        return {field.decode(): json.loads(value) for field, value in fields.items()}
+
+_hubs: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, TrackingHub] = weakref.WeakKeyDictionary()
+
+def get_hub() -> TrackingHub:
+    """The hub of the running event loop, async Redis connections cannot move between loops."""
+
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = TrackingHub(
+            aioredis.Redis.from_url(os.getenv("DJANGO_CACHE_URL", default="redis://localhost:6379/0"))
+        )
+
+    return _hubs[loop]
+
+def _event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+def _delivered(fields: dict) -> bool:
+    return fields.get("delivery:status") == OrderStatus.DELIVERED
+
+async def tracking_events(order_id: int) -> AsyncIterator[str]:
+    """SSE stream of the order: a `snapshot` of all fields, then `update`s with the changed ones.
+
+    The stream ends once the order is delivered.
+    """
+
+    hub = get_hub()
+
+    # subscribe first, changes made while the snapshot is read are not lost
+    async with hub.watch(order_id) as watcher:
+        snapshot = await hub.snapshot(order_id)
+        yield _event("snapshot", snapshot)
+        if _delivered(snapshot):
+            return
+
+        location_sent = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(watcher.ready.wait(), timeout=KEEPALIVE_INTERVAL)
+            except TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            # only the location has moved: hold it, the next ones overwrite it meanwhile
+            if watcher.changes.keys() <= LOCATION_FIELDS:
+                delay = location_sent + LOCATION_INTERVAL - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            changes = watcher.take()
+            if LOCATION_FIELDS & changes.keys():
+                location_sent = time.monotonic()
+
+            yield _event("update", changes)
+            if _delivered(changes):
+                return
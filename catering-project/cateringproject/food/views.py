@@ -1,188 +1,289 @@
-import csv
-import io
-import json
-from dataclasses import asdict
-from datetime import date
-from django.shortcuts import render
-from django.http import JsonResponse
-from django.shortcuts import redirect
-from rest_framework import permissions, routers, serializers, viewsets, filters
-from rest_framework.request import Request
-from rest_framework.response import Response
-from rest_framework.decorators import action, permission_classes, api_view
-from django.views.decorators.csrf import csrf_exempt
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.exceptions import ValidationError
-from django.db import transaction
-from rest_framework.pagination import LimitOffsetPagination
-from django_filters.rest_framework import DjangoFilterBackend
-from django_filters import rest_framework
-
-from users.models import Role, User
-from shared.cache import CacheService
-from .mapper import RESTAURANT_EXTERNAL_TO_INTERNAL
-from .providers import kfc
-
-from .models import Dish, Order, OrderItem, OrderStatus, Restaurant
-from .serializers import OrderSerializer, KFCOrderSerializer, RestaurantSerializer, OrderItemSerializer, DishSerializer
-from .enums import DeliveryProvider
-from .services import schedule_order, all_orders_cooked, TrackingOrder
-
-class RestaurantFilters(rest_framework.FilterSet):
-    class Meta:
-        model = Restaurant
-        fields = ['name']
-
-class IsAdmin(permissions.BasePermission):
-    def has_permission(self, request, view):
-        user = request.user
-        if not user or not user.is_authenticated:
-            return False
-        return getattr(user, 'role', None) == Role.ADMIN
-
-class FoodAPIViewSet(viewsets.GenericViewSet):
-    queryset = Restaurant.objects.all()
-    authentication_classes = [JWTAuthentication]
-
-    def get_permissions(self):
-        if self.action == 'create_dish':
-            return [IsAdmin()]
-        return super().get_permissions()
-
-    @action(methods=["post"], detail=False, url_path=r"orders")
-    def create_order(self, request: Request) -> Response:
-        serializer = OrderSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-
-        assert type(request.user) is User
-        print('create_order')
-        with transaction.atomic():
-            order = Order.objects.create(
-                status=OrderStatus.NOT_STARTED,
-                user=request.user,
-                delivery_provider="uklon",
-                eta=serializer.validated_data["eta"],
-                total=serializer.calculated_total,
-            )
-
-            items = serializer.validated_data["items"]
-            for dish_order in items:
-                instance = OrderItem.objects.create(
-                    dish=dish_order["dish"],
-                    quantity=dish_order["quantity"],
-                    order=order,
-                )
-                print(f"New Dish Order Item is created: {instance.pk}")
-
-        print(f"New Food Order is created: {order.pk}. ETA: {order.eta}")
-
-        schedule_order(order)
-
-        return Response(OrderSerializer(order).data, status=201)
-
-    # @action(methods=["get"], detail=False)
-    # def dishes(self, request: Request) -> Response:
-    #     restaurants = Restaurant.objects.all()
-    #     serializer = RestaurantSerializer(restaurants, many=True)
-    #     return Response(data=serializer.data)
-
-    @action(methods=["post", "get"], detail=False, url_path=r"dishes")
-    def dishes(self, request: Request) -> Response:
-        if request.method == "POST":
-            if not IsAdmin().has_permission(request, self):
-                return Response({"detail": "You do not have permission to perform this action."}, status=403)
-
-            serializer = DishSerializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
-
-            serializer.save()
-
-            return Response(DishSerializer(serializer.instance).data, status=201)
-
-        if request.method == "GET":
-            restaurants = Restaurant.objects.all()
-
-            filtered_queryset = RestaurantFilters(request.GET, queryset=restaurants).qs
-
-            serializer = RestaurantSerializer(filtered_queryset, many=True, context={"request": request})
-            return Response(data=serializer.data)
-
-# @api_view(["POST"])
-# @permission_classes([IsAdmin])
-def import_dishes(request):
-    if not IsAdmin().has_permission(request, view=None):
-        return Response({"detail": "You do not have permission to perform this action."}, status=403)
-
-    if request.method != "POST":
-        raise ValueError("Only POST requests are allowed.")
-
-    csv_file = request.FILES.get("file")
-    if csv_file is None:
-        raise ValueError("CSV file not found.")
-
-    decoded = csv_file.read().decode("utf-8")
-    reader = csv.DictReader(io.StringIO(decoded))
-    total = 0
-
-    for row in reader:
-        restaurant_name = row["restaurant"]
-        try:
-            rest = Restaurant.objects.get(name__icontains=restaurant_name.lower())
-        except Restaurant.DoesNotExist:
-            print("Skipping restaurant " + restaurant_name)
-        else:
-            print(f"{restaurant_name} not found.")
-
-        Dish.objects.create(name=row["name"], restaurant=rest, price=int(row["price"]))
-        total += 1
-
-    print(f"{total} restaurants uploaded to the database.")
-
-    return redirect(request.META.get("HTTP_REFERER", "/"))
-
-@csrf_exempt
-def kfc_webhook(request):
-    print("KFC Webhook is Handled")
-
-    try:
-        data = json.loads(request.body)
-    except json.JSONDecodeError:
-        return JsonResponse({"error": "Invalid JSON"}, status=400)
-
-    print(f"KFC webhook payload: {data}")
-
-    external_id = data.get("id") or data.get("order_id")
-    if not external_id:
-        return JsonResponse({"error": "Missing external_id"}, status=400)
-
-    cache = CacheService()
-    restaurant = Restaurant.objects.get(name="KFC")
-    kfc_cache_order = cache.get("kfc_orders", key=external_id)
-
-    if not kfc_cache_order:
-        print(f'KFC webhook received for unknown order_id={external_id}')
-        return JsonResponse({"error": "Order not found"}, status=404)
-
-    def get_internal_status(status: kfc.OrderStatus) -> OrderStatus:
-        return RESTAURANT_EXTERNAL_TO_INTERNAL["kfc"][status]
-
-    order: Order = Order.objects.get(id=kfc_cache_order["internal_order_id"])
-    tracking_order = TrackingOrder(**cache.get(namespace="orders", key=str(order.pk)))
-
-    internal_status: OrderStatus = get_internal_status(data["status"])
-    print(f"Mapped internal status: {internal_status}")
-    tracking_order.restaurants[str(restaurant.pk)] |= {
-        "external_id": data["id"],
-        "status": internal_status,
-    }
-
-    cache.set(namespace="orders", key=str(order.pk), value=asdict(tracking_order), ttl=3600)
-
-    if internal_status == OrderStatus.COOKED:
-        all_orders_cooked(order.pk)
-
-    return JsonResponse({"message": "ok"})
-
-router = routers.DefaultRouter()
+import json
+import logging
+from datetime import date
+from django.shortcuts import render
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.contrib import messages
+from rest_framework import permissions, routers, serializers, viewsets, filters
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.decorators import action, permission_classes, api_view
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.exceptions import ValidationError
+from django.db import transaction
+from rest_framework.pagination import LimitOffsetPagination
+from django_filters.rest_framework import DjangoFilterBackend
+
+from users.models import Role, User
+from .mapper import RESTAURANT_EXTERNAL_TO_INTERNAL
+
+from .models import Order, OrderItem, OrderStatus, Restaurant
+from .serializers import OrderSerializer, KFCOrderSerializer, OrderItemSerializer, DishSerializer
+from .enums import DeliveryProvider
+from .catalog import get_catalog
+from .search import search_dishes
+from .exports import FORMATS, export_response
+from .dish_import import IMPORT_ASYNC_THRESHOLD, get_import, import_dishes_csv, start_import
+from .payloads import OrderBatchPayload
+from .services import schedule_order, schedule_orders
+from .webhooks import enqueue_kfc_event, known_kfc_order
+from .metrics import CREATE_ORDER_SECONDS, WEBHOOK_SECONDS
+from .tracking import tracking_events
+
+logger = logging.getLogger(__name__)
+
+class IsAdmin(permissions.BasePermission):
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        return getattr(user, 'role', None) == Role.ADMIN
+
+class FoodAPIViewSet(viewsets.GenericViewSet):
+    queryset = Restaurant.objects.all()
+    authentication_classes = [JWTAuthentication]
+
+    def get_permissions(self):
+        if self.action == 'create_dish':
+            return [IsAdmin()]
+        return super().get_permissions()
+
+    # Max orders accepted by one POST /orders/batch request
+    ORDERS_BATCH_LIMIT = 500
+
+    @staticmethod
+    def _build_order(serializer: OrderSerializer, user: User) -> tuple[Order, list[OrderItem]]:
+        order = Order(
+            status=OrderStatus.NOT_STARTED,
+            user=user,
+            # chosen when the order is cooked, see `food.balancer`
+            eta=serializer.validated_data["eta"],
+            total=serializer.calculated_total,
+        )
+        items = [
+            OrderItem(dish=dish_order["dish"], quantity=dish_order["quantity"], order=order)
+            for dish_order in serializer.validated_data["items"]
+        ]
+
+        return order, items
+
+    @action(methods=["post"], detail=False, url_path=r"orders")
+    @CREATE_ORDER_SECONDS.labels(endpoint="order").time()
+    def create_order(self, request: Request) -> Response:
+        serializer = OrderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        assert type(request.user) is User
+        order, items = self._build_order(serializer, request.user)
+        with transaction.atomic():
+            order.save()
+            OrderItem.objects.bulk_create(items)
+
+        logger.info("order.created", extra={"order_id": order.pk, "eta": order.eta, "items": len(items)})
+
+        schedule_order(order)
+
+        return Response(OrderSerializer(order).data, status=201)
+
+    @action(methods=["post"], detail=False, url_path=r"orders/batch")
+    @CREATE_ORDER_SECONDS.labels(endpoint="batch").time()
+    def create_orders_batch(self, request: Request) -> Response:
+        """Create many orders at once.
+
+        Every order is validated on its own: the valid ones are created and the invalid
+        ones are reported in `errors`, keyed by their index in the request.
+        The orders are scheduled by one Celery task once they are committed.
+        """
+
+        payload = request.data.get("orders") if isinstance(request.data, dict) else request.data
+        if not isinstance(payload, list) or not payload:
+            raise ValidationError({"orders": "A non-empty list of orders is required."})
+        if len(payload) > self.ORDERS_BATCH_LIMIT:
+            raise ValidationError({"orders": f"No more than {self.ORDERS_BATCH_LIMIT} orders per request."})
+
+        assert type(request.user) is User
+
+        orders: list[Order] = []
+        items: list[OrderItem] = []
+        errors: dict[int, dict] = {}
+
+        for index, data in enumerate(payload):
+            serializer = OrderSerializer(data=data)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+
+            order, order_items = self._build_order(serializer, request.user)
+            orders.append(order)
+            items.extend(order_items)
+
+        if not orders:
+            return Response(data={"created": [], "errors": errors}, status=400)
+
+        with transaction.atomic():
+            # bulk_create sets the primary keys, items pick them up from their orders
+            Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(items)
+
+            batch = OrderBatchPayload([order.pk for order in orders])
+            transaction.on_commit(lambda: schedule_orders.delay(batch))
+
+        logger.info("order.batch_created", extra={"orders": len(orders), "rejected": len(errors)})
+
+        # two queries for any number of orders
+        created = Order.objects.filter(pk__in=batch.order_ids).prefetch_related("items").order_by("pk")
+
+        return Response(data={"created": OrderSerializer(created, many=True).data, "errors": errors}, status=201)
+
+    # @action(methods=["get"], detail=False)
+    # def dishes(self, request: Request) -> Response:
+    #     restaurants = Restaurant.objects.all()
+    #     serializer = RestaurantSerializer(restaurants, many=True)
+    #     return Response(data=serializer.data)
+
+    @action(methods=["post", "get"], detail=False, url_path=r"dishes")
+    def dishes(self, request: Request) -> Response:
+        if request.method == "POST":
+            if not IsAdmin().has_permission(request, self):
+                return Response({"detail": "You do not have permission to perform this action."}, status=403)
+
+            serializer = DishSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+
+            serializer.save()
+
+            return Response(DishSerializer(serializer.instance).data, status=201)
+
+        if request.method == "GET":
+            return Response(data=get_catalog(request))
+
+    @action(methods=["get"], detail=False, url_path=r"dishes/search")
+    def search_dishes(self, request: Request) -> Response:
+        """Ranked dish search for autocomplete: GET /food/dishes/search/?q=chick&limit=10"""
+
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), 50)
+        except ValueError:
+            raise ValidationError({"limit": "A valid integer is required."})
+
+        dishes = search_dishes(request.query_params.get("q", ""), limit=limit)
+
+        return Response(data=DishSerializer(dishes, many=True).data)
+
+    @action(methods=["get"], detail=False, url_path=r"export/(?P<table>dishes|orders)")
+    def export(self, request: Request, table: str):
+        """Stream a table for analytics: GET /food/export/dishes/?output=ndjson&since_id=1000
+
+        `output` is `csv` (default) or `ndjson`. With `since_id` only newer rows are exported.
+        """
+
+        if not IsAdmin().has_permission(request, self):
+            return Response({"detail": "You do not have permission to perform this action."}, status=403)
+
+        output = request.query_params.get("output", "csv")
+        if output not in FORMATS:
+            raise ValidationError({"output": f"Choose one of: {', '.join(FORMATS)}."})
+
+        try:
+            since_id = int(request.query_params.get("since_id", 0))
+        except ValueError:
+            raise ValidationError({"since_id": "A valid integer is required."})
+
+        return export_response(table, output, since_id)
+
+# @api_view(["POST"])
+# @permission_classes([IsAdmin])
+def import_dishes(request):
+    if not IsAdmin().has_permission(request, view=None):
+        return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+
+    if request.method != "POST":
+        raise ValueError("Only POST requests are allowed.")
+
+    csv_file = request.FILES.get("file")
+    if csv_file is None:
+        raise ValueError("CSV file not found.")
+
+    if csv_file.size > IMPORT_ASYNC_THRESHOLD:
+        import_id = start_import(csv_file)
+        messages.info(request, f"Import {import_id} is started in the background.")
+    else:
+        report = import_dishes_csv(csv_file)
+        messages.info(request, f"{report.imported} dishes are imported, {report.failed} rows are skipped.")
+        for error in report.errors:
+            messages.warning(request, f"Line {error['line']}: {error['error']}")
+
+    return redirect(request.META.get("HTTP_REFERER", "/"))
+
+def import_dishes_status(request, import_id: str):
+    if not IsAdmin().has_permission(request, view=None):
+        return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+
+    report = get_import(import_id)
+    if report is None:
+        return JsonResponse({"error": "Import not found"}, status=404)
+
+    return JsonResponse(report)
+
+@csrf_exempt
+@WEBHOOK_SECONDS.labels(provider="kfc", stage="accept").time()
+def kfc_webhook(request):
+    """Accept a KFC status event. It is applied later by the `consume_webhooks` command."""
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    external_id = data.get("id") or data.get("order_id")
+    if not external_id:
+        return JsonResponse({"error": "Missing external_id"}, status=400)
+
+    status = data.get("status")
+    if status not in RESTAURANT_EXTERNAL_TO_INTERNAL["kfc"]:
+        return JsonResponse({"error": f"Unknown status {status!r}"}, status=400)
+
+    if not known_kfc_order(external_id):
+        return JsonResponse({"error": "Order not found"}, status=404)
+
+    enqueue_kfc_event(external_id, status)
+
+    return JsonResponse({"message": "accepted"}, status=202)
+
+def _token_user_id(request) -> int | None:
+    # EventSource cannot send headers, so the access token may come in the query string as well
+    header = request.headers.get("Authorization", "")
+    raw_token = header.removeprefix("Bearer ").strip() if header.startswith("Bearer ") else request.GET.get("token")
+    if not raw_token:
+        return None
+
+    try:
+        return AccessToken(raw_token)[jwt_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+
+async def order_tracking_stream(request, order_id: int):
+    """Live tracking of the order as server-sent events, served under ASGI."""
+
+    user_id = _token_user_id(request)
+    if user_id is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+
+    if not await Order.objects.filter(pk=order_id, user_id=user_id).aexists():
+        return JsonResponse({"error": "Order not found"}, status=404)
+
+    response = StreamingHttpResponse(tracking_events(order_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # nginx would buffer the stream otherwise
+    response["X-Accel-Buffering"] = "no"
+
+    return response
+
+router = routers.DefaultRouter()
 router.register(prefix="", viewset=FoodAPIViewSet, basename="food")
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""Provider webhook ingestion.
+
+The webhook view only validates an event and appends it to the `webhooks:kfc`
+Redis stream, so its latency does not depend on the database. Events of orders
+that are not ours (no `kfc_orders` entry) are refused with a 404 as before. The
+`consume_webhooks` management command reads the stream in a consumer group
+and applies the events in batches. Every event is applied once: an idempotency
+key (`webhook_events:kfc:<external id>:<status>`) turns repeated deliveries into no-ops.
+The key is held for `APPLY_TTL` seconds while the event is applied and kept for
+`DEDUPE_TTL` once it is done, so the event of a consumer that died halfway is
+applied by the consumer that claims it.
+"""
+
+import logging
+import time
+
+from django.db import close_old_connections
+
+from shared.cache import CacheService
+
+from .mapper import RESTAURANT_EXTERNAL_TO_INTERNAL
+from .services import TRACKING_TTL, advance_restaurant_leg, get_restaurant
+from .metrics import WEBHOOK_SECONDS
+
+STREAM = "kfc"
+GROUP = "food"
+# The stream is trimmed to about this many entries, acked or not
+STREAM_MAXLEN = 100_000
+BATCH_SIZE = 100
+# Milliseconds a consumer waits for new events
+BLOCK = 1000
+# Events read but not acked for this many milliseconds (dead consumer) are taken over
+CLAIM_IDLE = 30_000
+DEDUPE_TTL = TRACKING_TTL
+# Seconds an event being applied stays claimed, below CLAIM_IDLE: a takeover finds the key free
+APPLY_TTL = 10
+
+logger = logging.getLogger(__name__)
+
+def known_kfc_order(external_id: str) -> bool:
+    return CacheService().get("kfc_orders", external_id) is not None
+
+def enqueue_kfc_event(external_id: str, status: str) -> str:
+    return CacheService().stream_add(
+        "webhooks", STREAM, {"external_id": external_id, "status": status}, maxlen=STREAM_MAXLEN
+    )
+
+def process_kfc_events(events: list[tuple[str, dict]], cache: CacheService) -> list[str]:
+    """Apply a batch of KFC events. Returns ids of the events that are done with.
+
+    Events that failed on infrastructure (database, Redis) stay pending and are retried.
+    """
+
+    restaurant = get_restaurant("KFC")
+    orders = cache.get_many("kfc_orders", list({event["external_id"] for _, event in events}))
+    done: list[str] = []
+
+    for event_id, event in events:
+        external_id, status = event["external_id"], event["status"]
+        idempotency_key = f"{STREAM}:{external_id}:{status}"
+
+        if not cache.lock("webhook_events", idempotency_key, ttl=APPLY_TTL):
+            done.append(event_id)
+            continue
+
+        try:
+            if external_id not in orders:
+                raise KeyError(f"Unknown KFC order {external_id}")
+
+            with WEBHOOK_SECONDS.labels(provider="kfc", stage="apply").time():
+                advance_restaurant_leg(
+                    orders[external_id]["internal_order_id"],
+                    restaurant.pk,
+                    RESTAURANT_EXTERNAL_TO_INTERNAL["kfc"][status],
+                    external_id=external_id,
+                )
+        except (KeyError, ValueError) as error:
+            # a bad event stays bad, retrying it changes nothing
+            logger.warning("webhook.skipped", extra={"provider": "kfc", "event_id": event_id, "error": str(error)})
+        except Exception as error:
+            cache.delete("webhook_events", idempotency_key)
+            logger.error("webhook.failed", extra={"provider": "kfc", "event_id": event_id, "error": repr(error)})
+            continue
+
+        cache.set_ttl("webhook_events", idempotency_key, DEDUPE_TTL)
+        done.append(event_id)
+
+    return done
+
+def consume_batch(cache: CacheService, consumer: str, claim: bool = False) -> int:
+    """Apply and ack one batch of events. Returns the number of events claimed.
+
+    With `claim` the batch is taken over from dead consumers first, new events are read
+    when there is nothing to claim.
+    """
+
+    events: list[tuple[str, dict]] = []
+    claimed = 0
+
+    if claim:
+        events = cache.stream_claim("webhooks", STREAM, GROUP, consumer, min_idle=CLAIM_IDLE, count=BATCH_SIZE)
+        claimed = len(events)
+
+    if not events:
+        events = cache.stream_read("webhooks", STREAM, GROUP, consumer, count=BATCH_SIZE, block=BLOCK)
+        if not events:
+            return claimed
+
+    # the process lives long, connections the database has dropped are reopened
+    close_old_connections()
+
+    done = process_kfc_events(events, cache)
+    cache.stream_ack("webhooks", STREAM, GROUP, *done)
+
+    return claimed
+
+def consume_kfc_events(consumer: str) -> None:
+    """Process the stream as one consumer of the group, forever."""
+
+    cache = CacheService()
+    cache.stream_group("webhooks", STREAM, GROUP)
+    claimed_at = 0.0
+
+    while True:
+        claim = time.monotonic() - claimed_at > CLAIM_IDLE / 1000
+
+        # a full batch means more may be left, claim again on the next turn
+        if consume_batch(cache, consumer, claim) < BATCH_SIZE and claim:
+            claimed_at = time.monotonic()
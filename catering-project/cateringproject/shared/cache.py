@@ -1,37 +1,355 @@
-import os
-import json
-from dataclasses import dataclass
-
-import redis
-
-@dataclass
-class Sctucture:
-    id: int
-    name: str
-
-class CacheService:
-    def __init__(self):
-        self.connection: redis.Redis = redis.Redis.from_url(os.getenv("DJANGO_CACHE_URL", default="redis://localhost:6379/0"))
-        # self.connection: redis.Redis = redis.Redis.from_url("redis://localhost:6379/0")
-
-    @staticmethod
-    def _build_key(namespace: str, key: str) -> str:
-        return f"{namespace}:{key}"
-
-    def get_ttl(self, namespace: str, key: str) -> int:
-        key = self._build_key(namespace, key)
-
-        return self.connection.ttl(key)
-
-    def set(self, namespace: str, key: str, value: dict, ttl: int | None = None):
-        key = self._build_key(namespace, key)
-
-        self.connection.set(key, value=json.dumps(value), ex=ttl)
-
-    def get(self, namespace: str, key: str):
-        result: str = self.connection.get(self._build_key(namespace, key))
-
-        return json.loads(result)
-
-    def delete(self, namespace: str, key: str):
-        self.connection.delete(self._build_key(namespace, key))
+import os
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from copy import copy
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+import redis
+from prometheus_client import Histogram
+from redis.commands.core import Script
+
+from . import codecs
+from .metrics import LATENCY_BUCKETS
+
+CACHE_SECONDS = Histogram(
+    "cache_operation_seconds", "Cache reads and writes.", ("operation",), buckets=LATENCY_BUCKETS
+)
+
+@dataclass
+class Sctucture:
+    id: int
+    name: str
+
+class LocalCache:
+    """Bounded in-process LRU cache with TTL eviction.
+
+    Values are kept as raw Redis payloads and decoded on every read,
+    so callers never share mutable objects.
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: bytes, ttl: int | None = None) -> None:
+        expires_at = time.monotonic() + min(ttl or self.ttl, self.ttl)
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+class CacheService:
+    # Codec for new `set` values, `get` reads values written by any codec
+    codec: codecs.Codec = codecs.get_codec()
+
+    # Keys changed by any process are published here, so every process drops its local copy
+    INVALIDATION_CHANNEL = "cache:invalidate"
+
+    _local: LocalCache = LocalCache(
+        maxsize=int(os.getenv("DJANGO_CACHE_LOCAL_MAXSIZE", default="1024")),
+        ttl=int(os.getenv("DJANGO_CACHE_LOCAL_TTL", default="60")),
+    )
+    _subscriber_pid: int | None = None
+    _subscriber_lock = threading.Lock()
+
+    # Lua scripts by their source, loaded into Redis once and then called by SHA
+    _scripts: dict[str, Script] = {}
+
+    # One pool per process, shared by every instance (API views, Celery tasks).
+    # When all connections are busy, callers wait for a free one instead of failing.
+    # redis-py re-creates the connections by itself after a fork.
+    _pool: redis.ConnectionPool | None = None
+
+    def __init__(self, local: bool = False):
+        """`local=True` serves reads from the in-process tier in front of Redis.
+
+        Use it for hot read-mostly data only: entries live up to the local TTL
+        and are dropped earlier when any process changes the key through `set` or `delete`.
+        """
+
+        self.connection: redis.Redis = redis.Redis(connection_pool=self.get_pool())
+        # self.connection: redis.Redis = redis.Redis.from_url("redis://localhost:6379/0")
+        self.local = local
+
+        if local:
+            self._subscribe()
+
+    @classmethod
+    def get_pool(cls) -> redis.ConnectionPool:
+        if cls._pool is None:
+            cls._pool = redis.BlockingConnectionPool.from_url(
+                os.getenv("DJANGO_CACHE_URL", default="redis://localhost:6379/0"),
+                max_connections=int(os.getenv("DJANGO_CACHE_MAX_CONNECTIONS", default="50")),
+            )
+
+        return cls._pool
+
+    @classmethod
+    def local_stats(cls) -> dict[str, int]:
+        return cls._local.stats()
+
+    def _subscribe(self) -> None:
+        # The subscriber thread is started lazily, once per process (Celery forks workers).
+        # Invalidations sent while it is down are covered by the local TTL.
+        if CacheService._subscriber_pid == os.getpid():
+            return
+
+        with CacheService._subscriber_lock:
+            if CacheService._subscriber_pid == os.getpid():
+                return
+
+            self._local.clear()
+
+            def invalidate(message: dict) -> None:
+                self._local.delete(message["data"].decode())
+
+            pubsub = self.connection.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.INVALIDATION_CHANNEL: invalidate})
+            pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+            CacheService._subscriber_pid = os.getpid()
+
+    def _invalidate(self, key: str) -> None:
+        if self.local:
+            self._local.delete(key)
+            self.connection.publish(self.INVALIDATION_CHANNEL, key)
+
+    @contextmanager
+    def pipeline(self) -> Iterator["CacheService"]:
+        """Queue the writes made through the yielded service and send them in one round trip.
+
+        Reads return nothing inside the block, so only writes belong there.
+        Nothing is sent if the block raises.
+        """
+
+        service = copy(self)
+        service.connection = self.connection.pipeline()
+
+        try:
+            yield service
+            service.connection.execute()
+        finally:
+            service.connection.reset()
+
+    @staticmethod
+    def _build_key(namespace: str, key: str) -> str:
+        return f"{namespace}:{key}"
+
+    def get_ttl(self, namespace: str, key: str) -> int:
+        key = self._build_key(namespace, key)
+
+        return self.connection.ttl(key)
+
+    def set(self, namespace: str, key: str, value: dict, ttl: int | None = None):
+        key = self._build_key(namespace, key)
+
+        with CACHE_SECONDS.labels(operation="set").time():
+            self.connection.set(key, value=self.codec.encode(value), ex=ttl)
+            self._invalidate(key)
+
+    def _get_raw(self, key: str) -> bytes | None:
+        if not self.local:
+            return self.connection.get(key)
+
+        result = self._local.get(key)
+        if result is None:
+            result, ttl = self.connection.pipeline(transaction=False).get(key).ttl(key).execute()
+            if result is not None:
+                self._local.set(key, result, ttl=ttl if ttl > 0 else None)
+
+        return result
+
+    def get(self, namespace: str, key: str):
+        """The cached value, None if the key is missing."""
+
+        with CACHE_SECONDS.labels(operation="get").time():
+            result: bytes | None = self._get_raw(self._build_key(namespace, key))
+        if result is None:
+            return None
+
+        return codecs.decode(result)
+
+    def get_or_set(self, namespace: str, key: str, default: Callable[[], dict], ttl: int | None = None):
+        """Return the cached value, or store and return `default()` if the key is missing."""
+
+        with CACHE_SECONDS.labels(operation="get").time():
+            result: bytes | None = self._get_raw(self._build_key(namespace, key))
+        if result is not None:
+            return codecs.decode(result)
+
+        value = default()
+        self.set(namespace, key, value, ttl=ttl)
+
+        return value
+
+    def get_many(self, namespace: str, keys: list[str]) -> dict[str, object]:
+        """Values of the existing keys in one round trip, missing keys are left out."""
+
+        if not keys:
+            return {}
+
+        with CACHE_SECONDS.labels(operation="get_many").time():
+            results: list[bytes | None] = self.connection.mget([self._build_key(namespace, key) for key in keys])
+
+        return {key: codecs.decode(result) for key, result in zip(keys, results) if result is not None}
+
+    def delete(self, namespace: str, key: str):
+        key = self._build_key(namespace, key)
+
+        self.connection.delete(key)
+        self._invalidate(key)
+
+    def incr(self, namespace: str, key: str) -> int:
+        return self.connection.incr(self._build_key(namespace, key))
+
+    def get_counter(self, namespace: str, key: str) -> int:
+        return int(self.connection.get(self._build_key(namespace, key)) or 0)
+
+    # Hash fields stay plain JSON: Lua scripts compare them on the Redis side
+
+    def hset(self, namespace: str, key: str, field: str, value: dict):
+        self.connection.hset(self._build_key(namespace, key), field, json.dumps(value))
+
+    def hset_many(self, namespace: str, key: str, mapping: dict, ttl: int | None = None):
+        key = self._build_key(namespace, key)
+
+        if mapping:
+            self.connection.hset(key, mapping={field: json.dumps(value) for field, value in mapping.items()})
+        if ttl is not None:
+            self.connection.expire(key, ttl)
+
+    def hgetall(self, namespace: str, key: str) -> dict[str, dict]:
+        result: dict[bytes, bytes] = self.connection.hgetall(self._build_key(namespace, key))
+
+        return {field.decode(): json.loads(value) for field, value in result.items()}
+
+    def hlen(self, namespace: str, key: str) -> int:
+        return self.connection.hlen(self._build_key(namespace, key))
+
+    def hgetall_many(self, namespace: str, keys: list[str]) -> dict[str, dict]:
+        """`hgetall` of many hashes in one round trip."""
+
+        pipe = self.connection.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(self._build_key(namespace, key))
+
+        return {
+            key: {field.decode(): json.loads(value) for field, value in result.items()}
+            for key, result in zip(keys, pipe.execute())
+        }
+
+    def hdel(self, namespace: str, key: str, *fields: str):
+        self.connection.hdel(self._build_key(namespace, key), *fields)
+
+    def publish(self, namespace: str, key: str, message: dict) -> None:
+        self.connection.publish(self._build_key(namespace, key), json.dumps(message))
+
+    # Streams: entry fields are plain JSON as well
+
+    @staticmethod
+    def _decode_entries(entries: list) -> list[tuple[str, dict]]:
+        # entries deleted from the stream while pending come back without fields
+        return [
+            (entry_id.decode(), {field.decode(): json.loads(value) for field, value in fields.items()})
+            for entry_id, fields in entries
+            if fields
+        ]
+
+    def stream_add(self, namespace: str, key: str, fields: dict, maxlen: int | None = None) -> str:
+        """Append an entry. With `maxlen` the stream is trimmed to about that many entries."""
+
+        entry_id: bytes = self.connection.xadd(
+            self._build_key(namespace, key),
+            {field: json.dumps(value) for field, value in fields.items()},
+            maxlen=maxlen,
+            approximate=True,
+        )
+
+        return entry_id.decode()
+
+    def stream_group(self, namespace: str, key: str, group: str) -> None:
+        """Create the consumer group (and the stream) unless it exists."""
+
+        try:
+            self.connection.xgroup_create(self._build_key(namespace, key), group, id="0", mkstream=True)
+        except redis.ResponseError as error:
+            if "BUSYGROUP" not in str(error):
+                raise
+
+    def stream_read(
+        self, namespace: str, key: str, group: str, consumer: str, count: int, block: int | None = None
+    ) -> list[tuple[str, dict]]:
+        """New entries for the consumer, waits up to `block` ms for them."""
+
+        key = self._build_key(namespace, key)
+        response = self.connection.xreadgroup(group, consumer, {key: ">"}, count=count, block=block)
+
+        return self._decode_entries(response[0][1]) if response else []
+
+    def stream_claim(
+        self, namespace: str, key: str, group: str, consumer: str, min_idle: int, count: int
+    ) -> list[tuple[str, dict]]:
+        """Take over entries that other consumers have read but not acked for `min_idle` ms."""
+
+        response = self.connection.xautoclaim(
+            self._build_key(namespace, key), group, consumer, min_idle_time=min_idle, count=count
+        )
+
+        return self._decode_entries(response[1])
+
+    def stream_ack(self, namespace: str, key: str, group: str, *entry_ids: str) -> None:
+        if entry_ids:
+            self.connection.xack(self._build_key(namespace, key), group, *entry_ids)
+
+    def lock(self, namespace: str, key: str, ttl: int) -> bool:
+        """Take the key if nobody holds it. The lock is released with `delete` or by TTL."""
+
+        return bool(self.connection.set(self._build_key(namespace, key), value=1, nx=True, ex=ttl))
+
+    def set_ttl(self, namespace: str, key: str, ttl: int):
+        self.connection.expire(self._build_key(namespace, key), ttl)
+
+    def run_script(self, source: str, namespace: str, key: str, *args):
+        """Run the Lua script atomically against one key."""
+
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = self.connection.register_script(source)
+
+        return script(keys=[self._build_key(namespace, key)], args=args, client=self.connection)
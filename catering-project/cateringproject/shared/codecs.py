@@ -0,0 +1,80 @@
+"""Serialization codecs for cache payloads.
+
+Every payload starts with one header byte naming the codec that wrote it,
+so the writer codec can be switched without flushing Redis: readers decode
+any known codec, and payloads without a header are read as plain JSON.
+"""
+
+import json
+import os
+from typing import Any
+
+import msgpack
+import orjson
+
+class Codec:
+    name: str
+    header: bytes
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, payload: bytes) -> Any:
+        raise NotImplementedError
+
+    def encode(self, value: Any) -> bytes:
+        return self.header + self.dumps(value)
+
+class JsonCodec(Codec):
+    name = "json"
+    header = b"\x01"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def loads(self, payload: bytes) -> Any:
+        return json.loads(payload)
+
+class OrjsonCodec(Codec):
+    name = "orjson"
+    header = b"\x02"
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    def loads(self, payload: bytes) -> Any:
+        return orjson.loads(payload)
+
+class MsgpackCodec(Codec):
+    name = "msgpack"
+    header = b"\x03"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, payload: bytes) -> Any:
+        return msgpack.unpackb(payload, raw=False)
+
+CODECS: dict[str, Codec] = {codec.name: codec for codec in (JsonCodec(), OrjsonCodec(), MsgpackCodec())}
+
+_BY_HEADER: dict[int, Codec] = {codec.header[0]: codec for codec in CODECS.values()}
+
+def get_codec(name: str | None = None) -> Codec:
+    """Codec by name. A misspelled name fails at startup instead of silently writing JSON."""
+
+    name = name or os.getenv("DJANGO_CACHE_CODEC", default="json")
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec {name!r}, choose one of: {', '.join(CODECS)}")
+
+    return CODECS[name]
+
+def decode(payload: bytes) -> Any:
+    codec = _BY_HEADER.get(payload[0]) if payload else None
+    if codec is None:
+        if payload and payload[0] < 0x20:
+            raise ValueError(f"Payload is written by the codec {payload[0]}, which is not installed")
+
+        # written before the codecs were introduced
+        return json.loads(payload)
+
+    return codec.loads(payload[1:])
@@ -0,0 +1,85 @@
+"""Distances and route heuristics for small multi-stop routes.
+
+Routes are open paths: they start at the first stop and end at the last one.
+"""
+
+import math
+from typing import Sequence
+
+Point = tuple[float, float]
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.2
+
+def distance_km(a: Point, b: Point) -> float:
+    """Great-circle distance between two (latitude, longitude) points."""
+
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+def centroid(points: Sequence[Point]) -> Point:
+    return sum(point[0] for point in points) / len(points), sum(point[1] for point in points) / len(points)
+
+def z_order(point: Point, cell_km: float = 0.1) -> int:
+    """Morton code of the point on a grid of `cell_km` cells: close points mostly get close codes."""
+
+    step = cell_km / KM_PER_DEGREE
+    x = int((point[1] + 180) / step)
+    y = int((point[0] + 90) / step)
+
+    code = 0
+    for bit in range(max(x.bit_length(), y.bit_length())):
+        code |= ((x >> bit) & 1) << (2 * bit) | ((y >> bit) & 1) << (2 * bit + 1)
+
+    return code
+
+def route_length(points: Sequence[Point], route: Sequence[int]) -> float:
+    return sum(distance_km(points[a], points[b]) for a, b in zip(route, route[1:]))
+
+def nearest_neighbour(points: Sequence[Point], start: int = 0) -> list[int]:
+    """Route that always goes to the closest unvisited stop, O(n^2)."""
+
+    route = [start]
+    left = set(range(len(points))) - {start}
+
+    while left:
+        current = points[route[-1]]
+        closest = min(left, key=lambda index: distance_km(current, points[index]))
+        route.append(closest)
+        left.remove(closest)
+
+    return route
+
+def two_opt(points: Sequence[Point], route: list[int]) -> list[int]:
+    """Reverse route segments while that makes the route shorter. The first stop stays first."""
+
+    route = list(route)
+    improved = True
+
+    while improved:
+        improved = False
+
+        for i in range(1, len(route) - 1):
+            for j in range(i + 1, len(route)):
+                a, b = points[route[i - 1]], points[route[i]]
+                c = points[route[j]]
+                # an open route has no edge after the last stop
+                d = points[route[j + 1]] if j + 1 < len(route) else None
+
+                before = distance_km(a, b) + (distance_km(c, d) if d else 0)
+                after = distance_km(a, c) + (distance_km(b, d) if d else 0)
+                if after < before - 1e-9:
+                    route[i:j + 1] = reversed(route[i:j + 1])
+                    improved = True
+
+    return route
+
+def plan_route(points: Sequence[Point]) -> list[int]:
+    """Short route through all the points: nearest neighbour, then 2-opt."""
+
+    if len(points) < 3:
+        return list(range(len(points)))
+
+    return two_opt(points, nearest_neighbour(points))
@@ -0,0 +1,82 @@
+"""Prometheus metrics of the project, recorded with `prometheus_client`.
+
+Define metrics with the client classes and record them through their labels:
+
+    ORDERS = Counter("orders_created_total", "Orders created.", ("source",))
+    ORDERS.labels(source="api").inc()
+
+    with LATENCY.labels(view="create_order").time():
+        ...
+
+Set `PROMETHEUS_MULTIPROC_DIR` (an empty directory, one per host or container)
+for servers and Celery workers that run several processes: every process then
+writes its samples there and `render` adds them up. Without it the samples of
+the current process are rendered.
+
+Values that live outside the process (Redis hashes) are read at render time by
+collectors registered with `register_collector`.
+"""
+
+import logging
+import os
+import threading
+from typing import Iterable
+
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest, multiprocess, start_http_server
+from prometheus_client.core import Metric
+from prometheus_client.registry import Collector
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+# Seconds, from a cache hit to a slow provider call
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+_collectors: list[Collector] = []
+
+class ScrapeCollector(Collector):
+    """Collector read at render time. A failing read drops its metric instead of the whole page."""
+
+    def read(self) -> Iterable[Metric]:
+        raise NotImplementedError
+
+    def collect(self) -> Iterable[Metric]:
+        try:
+            return list(self.read())
+        except Exception as error:
+            logger.warning("metrics.collect_failed", extra={"collector": type(self).__name__, "error": repr(error)})
+            return []
+
+    def describe(self) -> Iterable[Metric]:
+        # registering must not read Redis
+        return []
+
+def register_collector(collector: Collector) -> Collector:
+    _collectors.append(collector)
+    if not MULTIPROCESS:
+        REGISTRY.register(collector)
+
+    return collector
+
+def registry() -> CollectorRegistry:
+    """The samples of every process in multiprocess mode, of this process otherwise."""
+
+    if not MULTIPROCESS:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in _collectors:
+        registry.register(collector)
+
+    return registry
+
+def render() -> bytes:
+    return generate_latest(registry())
+
+def serve(port: int) -> threading.Thread:
+    """Serve the metrics over HTTP from a daemon thread, for processes without the API (Celery workers)."""
+
+    _server, thread = start_http_server(port, registry=registry())
+
+    return thread
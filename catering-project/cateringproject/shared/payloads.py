@@ -0,0 +1,98 @@
+"""Celery task payloads: typed, versioned and compact on the wire.
+
+A task takes one `Payload` dataclass instead of loose arguments. In a message
+a payload is only its name, schema version and field values in declaration order,
+the message body is encoded by a `shared.codecs` codec, msgpack by default.
+
+Field values are plain data (numbers, strings, lists of them), never nested payloads.
+Schema changes: new fields go to the end with a default, so messages written
+by the previous version still decode. Bump `version` with every change,
+a worker rejects payloads of a version newer than its own.
+"""
+
+import os
+from dataclasses import fields
+from typing import Any, ClassVar, TypeVar
+
+from shared import codecs
+
+SERIALIZER = "payload"
+CONTENT_TYPE = "application/x-catering-payload"
+# the marker key of an encoded payload, a dict with one such key
+MARKER = "$p"
+
+P = TypeVar("P", bound="Payload")
+
+class Payload:
+    name: ClassVar[str]
+    version: ClassVar[int] = 1
+    field_names: ClassVar[tuple[str, ...]] = ()
+
+    def to_values(self) -> list:
+        return [getattr(self, name) for name in self.field_names]
+
+    @classmethod
+    def from_values(cls: type[P], version: int, values: list) -> P:
+        if version > cls.version:
+            raise ValueError(f"Payload {cls.name!r} v{version} is newer than the supported v{cls.version}")
+
+        return cls(*values)
+
+PAYLOADS: dict[str, type[Payload]] = {}
+
+def register(name: str, version: int = 1):
+    """Class decorator for payload dataclasses, `name` is what goes on the wire."""
+
+    def decorator(cls: type[P]) -> type[P]:
+        if name in PAYLOADS:
+            raise ValueError(f"Payload {name!r} is already registered by {PAYLOADS[name].__qualname__}")
+
+        cls.name = name
+        cls.version = version
+        cls.field_names = tuple(field.name for field in fields(cls))
+        PAYLOADS[name] = cls
+
+        return cls
+
+    return decorator
+
+def _pack(value: Any) -> Any:
+    if isinstance(value, Payload):
+        return {MARKER: [value.name, value.version, *value.to_values()]}
+    if isinstance(value, (list, tuple)):
+        return [_pack(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _pack(item) for key, item in value.items()}
+
+    return value
+
+def _unpack(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_unpack(item) for item in value]
+    if isinstance(value, dict):
+        if len(value) == 1 and MARKER in value:
+            name, version, *values = value[MARKER]
+            return PAYLOADS[name].from_values(version, values)
+
+        return {key: _unpack(item) for key, item in value.items()}
+
+    return value
+
+# `CELERY_PAYLOAD_CODEC=json` keeps the messages readable in the broker
+codec = codecs.get_codec(os.getenv("CELERY_PAYLOAD_CODEC", default="msgpack"))
+
+def dumps(body: Any) -> bytes:
+    return codec.encode(_pack(body))
+
+def loads(payload: bytes | str) -> Any:
+    if isinstance(payload, str):
+        payload = payload.encode()
+
+    return _unpack(codecs.decode(payload))
+
+def register_serializer() -> None:
+    """Make the payload format available to kombu as the `payload` serializer."""
+
+    from kombu.serialization import register as register_kombu
+
+    register_kombu(SERIALIZER, dumps, loads, content_type=CONTENT_TYPE, content_encoding="binary")
@@ -0,0 +1,111 @@
+import bisect
+import heapq
+import re
+import threading
+from typing import Iterable
+
+TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+class InvertedIndex:
+    """In-memory full-text index of short documents (names).
+
+    Every query word matches a document word exactly or as its prefix,
+    all query words must match. Exact matches rank above prefix ones,
+    shorter documents rank above longer ones.
+    """
+
+    EXACT_SCORE = 2.0
+    PREFIX_SCORE = 1.0
+
+    def __init__(self):
+        self._postings: dict[str, set[int]] = {}
+        self._documents: dict[int, tuple[str, ...]] = {}
+        # sorted vocabulary, prefix lookups are two bisects
+        self._terms: list[str] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, document_id: int, text: str) -> None:
+        with self._lock:
+            self.remove(document_id)
+
+            terms = tuple(tokenize(text))
+            self._documents[document_id] = terms
+
+            for term in set(terms):
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = set()
+                    bisect.insort(self._terms, term)
+                postings.add(document_id)
+
+    def bulk_add(self, documents: Iterable[tuple[int, str]]) -> None:
+        """Fill an empty index, the vocabulary is sorted once at the end."""
+
+        with self._lock:
+            for document_id, text in documents:
+                terms = tuple(tokenize(text))
+                self._documents[document_id] = terms
+
+                for term in terms:
+                    self._postings.setdefault(term, set()).add(document_id)
+
+            self._terms = sorted(self._postings)
+
+    def remove(self, document_id: int) -> None:
+        with self._lock:
+            terms = self._documents.pop(document_id, ())
+
+            for term in set(terms):
+                postings = self._postings[term]
+                postings.discard(document_id)
+                if not postings:
+                    del self._postings[term]
+                    del self._terms[bisect.bisect_left(self._terms, term)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._terms.clear()
+
+    def _match(self, word: str) -> dict[int, float]:
+        matched: dict[int, float] = {}
+
+        start = bisect.bisect_left(self._terms, word)
+        end = bisect.bisect_left(self._terms, word + "\U0010ffff", lo=start)
+        for term in self._terms[start:end]:
+            score = self.EXACT_SCORE if term == word else self.PREFIX_SCORE
+            for document_id in self._postings[term]:
+                if matched.get(document_id, 0) < score:
+                    matched[document_id] = score
+
+        return matched
+
+    def search(self, query: str, limit: int | None = None) -> list[int]:
+        """Ids of the matching documents, best first."""
+
+        words = tokenize(query)
+        if not words:
+            return []
+
+        with self._lock:
+            matches = [self._match(word) for word in words]
+
+            scores = matches[0]
+            if len(matches) > 1:
+                common = scores.keys() & set.intersection(*(set(matched) for matched in matches[1:]))
+                scores = {document_id: sum(matched[document_id] for matched in matches) for document_id in common}
+
+            def rank(document_id: int) -> tuple[float, int, int]:
+                return -scores[document_id], len(self._documents[document_id]), document_id
+
+            if limit is None:
+                return sorted(scores, key=rank)
+
+            return heapq.nsmallest(limit, scores, key=rank)
@@ -0,0 +1,54 @@
+"""Micro-benchmark of the cache codecs on realistic tracking payloads.
+
+    python -m tests.benchmarks.cache_codecs [--rounds 20000]
+"""
+
+import argparse
+import random
+import timeit
+
+from food.enums import OrderStatus
+from shared import codecs
+
+def tracking_order(restaurants: int) -> dict:
+    return {
+        "restaurants": {
+            str(pk): {
+                "external_id": f"{random.getrandbits(128):032x}",
+                "status": random.choice([OrderStatus.NOT_STARTED, OrderStatus.COOKING, OrderStatus.COOKED]),
+            }
+            for pk in range(1, restaurants + 1)
+        },
+        "delivery": {
+            "external_id": f"{random.getrandbits(128):032x}",
+            "status": OrderStatus.DELIVERY,
+            "location": (random.random(), random.random()),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    payloads = {
+        "kfc_orders entry": {"internal_order_id": 1024},
+        "tracking, 2 restaurants": tracking_order(2),
+        "tracking, 10 restaurants": tracking_order(10),
+    }
+
+    print(f"{'payload':<26}{'codec':<10}{'bytes':>8}{'encode, us':>14}{'decode, us':>14}")
+    for title, payload in payloads.items():
+        for codec in codecs.CODECS.values():
+            encoded = codec.encode(payload)
+            encode_time = timeit.timeit(lambda: codec.encode(payload), number=args.rounds)
+            decode_time = timeit.timeit(lambda: codecs.decode(encoded), number=args.rounds)
+
+            print(
+                f"{title:<26}{codec.name:<10}{len(encoded):>8}"
+                f"{encode_time / args.rounds * 1e6:>14.2f}{decode_time / args.rounds * 1e6:>14.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Delivery batching benchmark on synthetic pending deliveries, no database required.
+
+Compares one courier per order (stops in the order they come) with the batches
+of `food.delivery.plan_batches`, routed by nearest neighbour alone and with 2-opt.
+
+    python -m tests.benchmarks.delivery_batching [--deliveries 10000] [--restaurants 300]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from food.delivery import Delivery, Stop, plan_batches
+from shared import geo
+
+# Kyiv
+SOUTH, NORTH, WEST, EAST = 50.35, 50.55, 30.35, 30.70
+
+def restaurants(count: int) -> list[Stop]:
+    return [
+        Stop(f"Restaurant {index}", f"Address {index}", (random.uniform(SOUTH, NORTH), random.uniform(WEST, EAST)))
+        for index in range(count)
+    ]
+
+def deliveries(count: int, stops: list[Stop]) -> list[Delivery]:
+    today = date.today()
+    results = []
+
+    for order_id in range(1, count + 1):
+        first = random.choice(stops)
+        # the other restaurants of an order are mostly near the first one
+        nearby = sorted(stops, key=lambda stop: geo.distance_km(first.point, stop.point))[1:10] if random.random() < 0.5 else []
+        picked = [first, *random.sample(nearby, k=min(len(nearby), random.randint(0, 2)))]
+        eta = today + timedelta(days=random.choice((0, 0, 0, 1, 2)))
+        results.append(Delivery(order_id, eta, tuple(dict.fromkeys(picked)), random.randint(0, 9)))
+
+    return results
+
+def cost(stops: list[Stop]) -> float:
+    points = [stop.point for stop in stops]
+    return geo.route_length(points, range(len(points)))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--deliveries", type=int, default=10000)
+    parser.add_argument("--restaurants", type=int, default=300)
+    args = parser.parse_args()
+
+    random.seed(42)
+    pending = deliveries(args.deliveries, restaurants(args.restaurants))
+
+    unbatched = sum(cost(list(delivery.stops)) for delivery in pending)
+    unbatched_stops = sum(len(delivery.stops) for delivery in pending)
+
+    started = time.perf_counter()
+    batches = plan_batches(pending)
+    planning = time.perf_counter() - started
+
+    optimized = sum(cost(batch.stops) for batch in batches)
+    nearest_only = 0.0
+    for batch in batches:
+        points = [stop.point for stop in batch.stops]
+        nearest_only += geo.route_length(points, geo.nearest_neighbour(points)) if len(points) > 2 else cost(batch.stops)
+
+    print(f"{args.deliveries} pending deliveries, {args.restaurants} restaurants, planned in {planning * 1000:.0f} ms")
+    print(f"{'plan':<28}{'couriers':>10}{'stops':>10}{'route, km':>12}")
+    print(f"{'courier per order':<28}{len(pending):>10}{unbatched_stops:>10}{unbatched:>12.0f}")
+    print(f"{'batches, nearest neighbour':<28}{len(batches):>10}{sum(len(batch.stops) for batch in batches):>10}{nearest_only:>12.0f}")
+    print(f"{'batches, + 2-opt':<28}{len(batches):>10}{sum(len(batch.stops) for batch in batches):>10}{optimized:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Dish search benchmark on a synthetic catalog, no database required.
+
+Compares the in-memory inverted index used by `food.search` with a
+`name__icontains`-like linear scan.
+
+    python -m tests.benchmarks.dish_search [--dishes 100000] [--queries 1000]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from shared.search import InvertedIndex, tokenize
+
+ADJECTIVES = ["spicy", "crispy", "grilled", "smoked", "fresh", "classic", "double", "mini", "royal", "vegan"]
+INGREDIENTS = ["chicken", "beef", "cheese", "salmon", "mushroom", "tomato", "bacon", "shrimp", "tofu", "potato"]
+DISHES = ["burger", "salad", "pizza", "wrap", "soup", "roll", "bowl", "sandwich", "pasta", "taco"]
+
+def catalog(size: int) -> list[tuple[int, str]]:
+    return [
+        (dish_id, f"{random.choice(ADJECTIVES)} {random.choice(INGREDIENTS)} {random.choice(DISHES)} {dish_id % 997}")
+        for dish_id in range(1, size + 1)
+    ]
+
+def queries(count: int) -> list[str]:
+    words = ADJECTIVES + INGREDIENTS + DISHES
+    results = []
+
+    for _ in range(count):
+        picked = random.sample(words, k=random.randint(1, 2))
+        # autocomplete: the last word is being typed
+        picked[-1] = picked[-1][:random.randint(2, len(picked[-1]))]
+        results.append(" ".join(picked))
+
+    return results
+
+def linear_scan(names: list[tuple[int, str]], query: str, limit: int) -> list[int]:
+    words = tokenize(query)
+    lowered = [(dish_id, name.lower()) for dish_id, name in names]
+
+    return [dish_id for dish_id, name in lowered if all(word in name for word in words)][:limit]
+
+def percentiles(samples: list[float]) -> str:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+
+    return f"p50 {p50 * 1e3:8.3f} ms   p99 {p99 * 1e3:8.3f} ms"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dishes", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    random.seed(42)
+    names = catalog(args.dishes)
+    workload = queries(args.queries)
+
+    index = InvertedIndex()
+    started = time.perf_counter()
+    index.bulk_add(names)
+    print(f"index build, {args.dishes} dishes: {time.perf_counter() - started:.2f} s")
+
+    timings = []
+    for query in workload:
+        started = time.perf_counter()
+        index.search(query, limit=args.limit)
+        timings.append(time.perf_counter() - started)
+    print(f"inverted index: {percentiles(timings)}")
+
+    timings = []
+    for query in workload[:max(args.queries // 20, 1)]:
+        started = time.perf_counter()
+        linear_scan(names, query, args.limit)
+        timings.append(time.perf_counter() - started)
+    print(f"linear scan:    {percentiles(timings)}")
+
+if __name__ == "__main__":
+    main()
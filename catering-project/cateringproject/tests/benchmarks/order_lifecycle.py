@@ -0,0 +1,307 @@
+"""Load test of the whole order lifecycle against the provider mocks.
+
+Orders go through `FoodAPIViewSet.create_order` at a fixed arrival rate, then
+through the provider tasks, the tracking poller and the delivery, until every
+order is delivered or the timeout passes. The report has the throughput,
+latency percentiles per stage and query counts, and is saved as JSON,
+`--baseline` prints the change against a previous result.
+
+Modes:
+    inprocess - in-memory broker and a threaded Celery worker inside this process
+    real      - the configured broker, workers are started separately (`make worker_*`)
+
+The database is a throwaway test database. `--fake-redis` swaps Redis for
+fakeredis (`pip install fakeredis[lua]`). The mocks are real servers:
+`make silpo_mock uklon_mock uber_mock` or `docker compose up -d silpo-mock uklon-mock uber-mock`.
+KFC pushes statuses to the API webhook, so `--restaurants kfc` needs
+the API and `consume_webhooks` reachable from the KFC mock.
+
+    SILPO_BASE_URL=http://localhost:8001/api/orders UKLON_BASE_URL=http://localhost:8003/drivers/orders \\
+    UBER_BASE_URL=http://localhost:8004/v1/deliveries python -m tests.benchmarks.order_lifecycle --orders 200 --rate 10
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import statistics
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "cateringproject.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, connections  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from cateringproject.celery import app as celery_app  # noqa: E402
+from food.enums import OrderStatus  # noqa: E402
+from food.models import Dish, Order, Restaurant  # noqa: E402
+from shared.cache import CacheService  # noqa: E402
+from users.models import User  # noqa: E402
+
+RESULTS_DIR = Path(__file__).parent / "results"
+# statuses the harness waits for, in lifecycle order, and the stage that ends with each
+STAGES = {
+    OrderStatus.COOKING: "cooking",
+    OrderStatus.COOKED: "cooked",
+    OrderStatus.DELIVERY: "delivery",
+    OrderStatus.DELIVERED: "delivered",
+}
+FAILED_STATUSES = {OrderStatus.FAILED, OrderStatus.NOT_DELIVERED, OrderStatus.COOKING_REJECTED}
+# seconds between two status scans of the pending orders
+SCAN_INTERVAL = 0.2
+
+class QueryCounter:
+    """Counts the queries of every database connection, so of every thread."""
+
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self.counts[thread_id] = self.counts.get(thread_id, 0) + 1
+
+        return execute(sql, params, many, context)
+
+    def current(self) -> int:
+        return self.counts.get(threading.get_ident(), 0)
+
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+
+    values = sorted(values)
+
+    def at(share: float) -> float:
+        return round(values[min(len(values) - 1, int(len(values) * share))], 4)
+
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 4),
+        "p50": at(0.5),
+        "p95": at(0.95),
+        "p99": at(0.99),
+        "max": round(values[-1], 4),
+    }
+
+def use_fake_redis() -> None:
+    import fakeredis
+    import redis
+
+    server = fakeredis.FakeServer()
+    CacheService._pool = redis.ConnectionPool(server=server, connection_class=fakeredis.FakeConnection)
+
+def seed(restaurants: list[str], users: int, dishes: int) -> tuple[list[User], list[list[int]]]:
+    clients = User.objects.bulk_create(
+        [User(email=f"load{index}@catering.com", phone_number=f"050{index:07d}", is_active=True) for index in range(users)]
+    )
+    menus: list[list[int]] = []
+
+    for name in restaurants:
+        restaurant = Restaurant.objects.create(name=name, address=f"{name} street")
+        created = Dish.objects.bulk_create(
+            [Dish(name=f"{name} dish {index}", price=100 + index, restaurant=restaurant) for index in range(dishes)]
+        )
+        menus.append([dish.pk for dish in created])
+
+    return clients, menus
+
+def run(args: argparse.Namespace) -> dict:
+    random.seed(args.seed)
+    counter = QueryCounter()
+
+    connection.execute_wrappers.append(counter)
+    connection_created.connect(lambda sender, connection, **kwargs: connection.execute_wrappers.append(counter), weak=False)
+
+    clients, menus = seed(args.restaurants, args.concurrency, args.dishes)
+
+    arrivals: queue.Queue = queue.Queue()
+    created: dict[int, float] = {}
+    request_times: list[float] = []
+    request_queries: list[int] = []
+    errors: list[str] = []
+    lock = threading.Lock()
+
+    def client_loop(user: User) -> None:
+        api = APIClient()
+        api.force_authenticate(user)
+
+        while (arrival := arrivals.get()) is not None:
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            items = [
+                {"dish": random.choice(menu), "quantity": random.randint(1, 3)}
+                for menu in menus
+                for _ in range(args.items)
+            ]
+            eta = date.today() + timedelta(days=random.randint(0, 2))
+
+            queries = counter.current()
+            started = time.perf_counter()
+            payload = {"user": user.pk, "eta": eta.isoformat(), "delivery_provider": "uklon", "items": items}
+            response = api.post("/food/orders/", payload, format="json")
+            finished = time.perf_counter()
+
+            with lock:
+                if response.status_code != 201:
+                    errors.append(f"{response.status_code}: {response.content[:200]!r}")
+                    continue
+
+                created[response.json()["id"]] = finished
+                request_times.append(finished - started)
+                request_queries.append(counter.current() - queries)
+
+        connections.close_all()
+
+    started = time.perf_counter()
+    for index in range(args.orders):
+        arrivals.put(started + (index / args.rate if args.rate else 0))
+    for _ in clients:
+        arrivals.put(None)
+
+    threads = [threading.Thread(target=client_loop, args=(user,)) for user in clients]
+    for thread in threads:
+        thread.start()
+
+    # first time each order was seen in each status
+    seen: dict[int, dict[str, float]] = {}
+    failed: set[int] = set()
+    deadline = started + args.timeout
+
+    while time.perf_counter() < deadline:
+        with lock:
+            pending = [pk for pk in created if pk not in failed and "delivered" not in seen.get(pk, {})]
+        if pending:
+            now = time.perf_counter()
+            for pk, status in Order.objects.filter(pk__in=pending).values_list("pk", "status"):
+                if status in FAILED_STATUSES:
+                    failed.add(pk)
+                elif status in STAGES:
+                    seen.setdefault(pk, {}).setdefault(STAGES[status], now)
+
+        if not any(thread.is_alive() for thread in threads) and not pending:
+            break
+        time.sleep(SCAN_INTERVAL)
+
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stages: dict[str, list[float]] = {stage: [] for stage in (*STAGES.values(), "total")}
+    for pk, created_at in created.items():
+        times = seen.get(pk, {})
+        previous = created_at
+        # a stage shorter than a scan can be missed, it is counted as part of the next one
+        for stage in STAGES.values():
+            if stage in times:
+                stages[stage].append(times[stage] - previous)
+                previous = times[stage]
+        if "delivered" in times:
+            stages["total"].append(times["delivered"] - created_at)
+
+    delivered = len(stages["total"])
+    # the rest is seeding and the status scans of this thread, workers of the real mode are not seen at all
+    worker_queries = counter.total() - sum(request_queries) - counter.current()
+
+    return {
+        "config": vars(args),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "elapsed": round(elapsed, 2),
+        "orders": {
+            "created": len(created),
+            "delivered": delivered,
+            "failed": len(failed),
+            "timed_out": len(created) - delivered - len(failed),
+            "rejected": len(errors),
+        },
+        "throughput": round(delivered / elapsed, 3),
+        "request": percentiles(request_times),
+        "stages": {stage: percentiles(values) for stage, values in stages.items()},
+        "queries": {
+            "per_request": percentiles(request_queries),
+            "workers_per_order": (
+                round(worker_queries / len(created), 2) if created and args.mode == "inprocess" else None
+            ),
+        },
+        "errors": errors[:20],
+    }
+
+def compare(result: dict, baseline: dict) -> None:
+    print(f"\nagainst {baseline['created_at']}:")
+
+    def change(title: str, current: float | None, previous: float | None) -> None:
+        if current is None or not previous:
+            return
+        print(f"  {title:<28}{previous:>10}{current:>10}{(current - previous) / previous * 100:>+9.1f}%")
+
+    change("throughput, orders/s", result["throughput"], baseline["throughput"])
+    change("request p95, s", result["request"].get("p95"), baseline["request"].get("p95"))
+    for stage, values in result["stages"].items():
+        change(f"{stage} p95, s", values.get("p95"), baseline["stages"].get(stage, {}).get("p95"))
+    change("queries per request p50", result["queries"]["per_request"].get("p50"), baseline["queries"]["per_request"].get("p50"))
+    change("worker queries per order", result["queries"]["workers_per_order"], baseline["queries"]["workers_per_order"])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=5, help="orders per second, 0 sends them all at once")
+    parser.add_argument("--concurrency", type=int, default=10, help="API clients sending the orders")
+    parser.add_argument("--restaurants", type=lambda value: [name.strip() for name in value.split(",")], default=["Silpo"])
+    parser.add_argument("--dishes", type=int, default=50, help="dishes per restaurant")
+    parser.add_argument("--items", type=int, default=3, help="items per restaurant in an order")
+    parser.add_argument("--mode", choices=("inprocess", "real"), default="inprocess")
+    parser.add_argument("--workers", type=int, default=8, help="worker threads in the inprocess mode")
+    parser.add_argument("--fake-redis", action="store_true")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    args = parser.parse_args()
+
+    if args.fake_redis:
+        use_fake_redis()
+
+    setup_test_environment()
+    database_name = connection.creation.create_test_db(verbosity=0)
+    print(f"Test database: {database_name}")
+
+    try:
+        if args.mode == "inprocess":
+            from celery.contrib.testing.worker import start_worker
+
+            celery_app.conf.broker_url = "memory://"
+            with start_worker(celery_app, pool="threads", concurrency=args.workers, perform_ping_check=False):
+                result = run(args)
+        else:
+            result = run(args)
+    finally:
+        connection.creation.destroy_test_db(database_name, verbosity=0)
+
+    output = args.output or RESULTS_DIR / f"order_lifecycle-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, default=str))
+
+    print(json.dumps({key: result[key] for key in ("orders", "throughput", "request", "stages", "queries")}, indent=2))
+    print(f"Saved to {output}")
+
+    if args.baseline:
+        compare(result, json.loads(args.baseline.read_text()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Load generator for the provider routing layer, run against the local mocks and Redis.
+
+A burst of orders with random ETAs is sent by a pool of simulated workers.
+Throttled calls are re-queued with their countdown, the queue serves higher
+priorities first, like the broker does. The report shows the achieved call rate
+against the configured limit, the peak of concurrent calls and the latency by priority.
+
+    docker compose up -d cache silpo-mock uklon-mock kfc-mock
+    SILPO_BASE_URL=http://localhost:8001/api/orders python -m tests.benchmarks.provider_load [--orders 1000]
+"""
+
+import argparse
+import itertools
+import queue
+import random
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+
+from food.providers import silpo
+from food.routing import PROVIDER_LIMITS, Throttled, order_priority, provider_slot
+
+def percentile(values: list[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(42)
+    limit = PROVIDER_LIMITS["silpo"]
+    client = silpo.Client()
+    body = silpo.OrderRequestBody(order=[silpo.OrderItem(dish="Burger", quantity=1)])
+
+    jobs: queue.PriorityQueue = queue.PriorityQueue()
+    sequence = itertools.count()
+    latencies: dict[int, list[float]] = {}
+    lock = threading.Lock()
+    counters = {"calls": 0, "throttled": 0, "in_flight": 0, "peak_in_flight": 0, "done": 0}
+
+    def put(priority: int, created: float) -> None:
+        jobs.put((-priority, next(sequence), created))
+
+    def worker() -> None:
+        while True:
+            item = jobs.get()
+            if item is None:
+                return
+
+            negative_priority, _, created = item
+            try:
+                with provider_slot("silpo"):
+                    with lock:
+                        counters["in_flight"] += 1
+                        counters["peak_in_flight"] = max(counters["peak_in_flight"], counters["in_flight"])
+                    try:
+                        client.create_order(body)
+                    finally:
+                        with lock:
+                            counters["in_flight"] -= 1
+                            counters["calls"] += 1
+            except Throttled as error:
+                with lock:
+                    counters["throttled"] += 1
+                # the broker countdown
+                threading.Timer(error.retry_after, put, args=(-negative_priority, created)).start()
+                continue
+
+            with lock:
+                latencies.setdefault(-negative_priority, []).append(time.perf_counter() - created)
+                counters["done"] += 1
+                if counters["done"] == args.orders:
+                    for _ in range(args.workers):
+                        jobs.put(None)
+
+    started = time.perf_counter()
+    for _ in range(args.orders):
+        put(order_priority(date.today() + timedelta(days=random.randint(0, 3))), started)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"limit: {limit.rate:g}/s, burst {limit.burst}, max in flight {limit.max_in_flight}")
+    print(
+        f"{args.orders} orders in {elapsed:.1f}s: {counters['calls'] / elapsed:.1f} calls/s, "
+        f"{counters['throttled']} throttled retries, peak in flight {counters['peak_in_flight']}"
+    )
+    print(f"{'priority':>8}{'orders':>8}{'p50, s':>10}{'p95, s':>10}{'max, s':>10}")
+    for priority in sorted(latencies, reverse=True):
+        values = latencies[priority]
+        print(
+            f"{priority:>8}{len(values):>8}{statistics.median(values):>10.2f}"
+            f"{percentile(values, 0.95):>10.2f}{max(values):>10.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
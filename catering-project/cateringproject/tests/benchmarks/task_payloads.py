@@ -0,0 +1,69 @@
+"""Broker bytes and encode/decode time of Celery task bodies: pickle against `shared.payloads`.
+
+    python -m tests.benchmarks.task_payloads [--rounds 20000]
+"""
+
+import argparse
+import pickle
+import random
+import timeit
+
+from food.payloads import DeliveryPayload, OrderLinesPayload, RestaurantOrderPayload
+from shared import payloads
+
+EMBED = {"callbacks": None, "errbacks": None, "chain": None, "chord": None}
+
+def order_items(count: int) -> list[dict]:
+    return [
+        {"id": random.randint(1, 10**6), "dish__name": f"Dish {random.randint(1, 10**4)}", "quantity": random.randint(1, 5)}
+        for _ in range(count)
+    ]
+
+def bodies(count: int) -> dict[str, tuple[tuple, tuple]]:
+    """Message bodies as (args, kwargs, embed): the former pickled arguments and the payload."""
+
+    order_id = random.randint(1, 10**6)
+    items = order_items(count)
+
+    return {
+        f"order_in_silpo, {count} items": (
+            ((order_id, items), {}, EMBED),
+            ((RestaurantOrderPayload(order_id, [item["id"] for item in items]),), {}, EMBED),
+        ),
+        f"order_in_kfc, {count} items": (
+            ((order_id, items), {}, EMBED),
+            ((OrderLinesPayload(order_id, [(item["dish__name"], item["quantity"]) for item in items]),), {}, EMBED),
+        ),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    delivery = DeliveryPayload([1024], ["Kyiv, Khreshchatyk 1"], ["Delivery to the Silpo"])
+    cases = {"order_delivery": (((1024,), {}, EMBED), ((delivery,), {}, EMBED))}
+    for count in (3, 20, 100):
+        cases.update(bodies(count))
+
+    print(f"codec: {payloads.codec.name}")
+    print(f"{'task body':<30}{'format':<9}{'bytes':>8}{'encode, us':>14}{'decode, us':>14}")
+    for title, (pickled, typed) in cases.items():
+        formats = {
+            "pickle": (pickled, lambda body: pickle.dumps(body, protocol=pickle.DEFAULT_PROTOCOL), pickle.loads),
+            "payload": (typed, payloads.dumps, payloads.loads),
+        }
+
+        for name, (body, dumps, loads) in formats.items():
+            encoded = dumps(body)
+            encode_time = timeit.timeit(lambda: dumps(body), number=args.rounds)
+            decode_time = timeit.timeit(lambda: loads(encoded), number=args.rounds)
+
+            print(
+                f"{title:<30}{name:<9}{len(encoded):>8}"
+                f"{encode_time / args.rounds * 1e6:>14.2f}{decode_time / args.rounds * 1e6:>14.2f}"
+            )
+
+if __name__ == "__main__":
+    main()
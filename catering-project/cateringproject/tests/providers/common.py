@@ -0,0 +1,166 @@
+"""Config surface shared by the provider mocks.
+
+Every setting is read from `<MOCK>_MOCK_<NAME>` (`SILPO_MOCK_SEED`), then from
+`MOCK_<NAME>`, so one variable configures all the mocks and a prefixed one a single mock.
+
+    SEED          seed of every random choice (latencies, statuses, ids), runs repeat exactly
+    TIME_SCALE    multiplier of the simulated durations: 0.001 runs a 30 s cook in 30 ms
+    LATENCY       response latency, simulated seconds (see `Distribution`)
+    STEP_TIME     time between two status changes of an order, simulated seconds
+    ERROR_RATE    share of the requests answered with 500
+    TIMEOUT_RATE  share of the requests that hang for TIMEOUT real seconds first
+    TIMEOUT       seconds a hanging request hangs, not scaled: it has to beat the client timeout
+    STORAGE_SIZE  orders kept, the least recently changed are evicted
+    STORAGE_TTL   real seconds an order is kept after its last change
+"""
+
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+class Distribution:
+    """Random duration from a spec: `fixed:1`, `uniform:4,6`, `exponential:0.5` (mean) or `lognormal:mu,sigma`."""
+
+    KINDS: dict[str, Callable[..., float]] = {
+        "fixed": lambda rng, value: value,
+        "uniform": lambda rng, low, high: rng.uniform(low, high),
+        "exponential": lambda rng, mean: rng.expovariate(1 / mean) if mean else 0.0,
+        "lognormal": lambda rng, mu, sigma: rng.lognormvariate(mu, sigma),
+    }
+
+    def __init__(self, spec: str):
+        kind, _, arguments = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown distribution {spec!r}, use one of: {', '.join(self.KINDS)}")
+
+        self.spec = spec
+        self._sample = self.KINDS[kind]
+        self._arguments = [float(argument) for argument in arguments.split(",") if argument]
+
+    def sample(self, rng: random.Random) -> float:
+        return max(0.0, self._sample(rng, *self._arguments))
+
+class TTLStorage:
+    """Bounded order storage: at most `maxsize` orders, each dropped `ttl` seconds after its last write."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._data:
+            key, (expires, _) = next(iter(self._data.items()))
+            if expires > now and len(self._data) <= self.maxsize:
+                break
+            del self._data[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        self._evict()
+
+    def __getitem__(self, key: str) -> Any:
+        expires, value = self._data[key]
+        if expires <= time.monotonic():
+            del self._data[key]
+            raise KeyError(key)
+
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+
+        return True
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+@dataclass
+class MockConfig:
+    name: str
+    seed: int | None = None
+    time_scale: float = 1.0
+    latency: Distribution = field(default_factory=lambda: Distribution("fixed:0"))
+    step_time: Distribution = field(default_factory=lambda: Distribution("uniform:4,6"))
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout: float = 30.0
+    storage_size: int = 100_000
+    storage_ttl: float = 3600.0
+    rng: random.Random = field(init=False)
+
+    def __post_init__(self):
+        self.rng = random.Random(self.seed)
+
+    @classmethod
+    def from_env(cls, name: str, **defaults) -> "MockConfig":
+        def read(setting: str, cast: Callable[[str], Any]) -> None:
+            value = os.getenv(f"{name.upper()}_MOCK_{setting.upper()}") or os.getenv(f"MOCK_{setting.upper()}")
+            if value is not None:
+                defaults[setting] = cast(value)
+
+        read("seed", int)
+        read("time_scale", float)
+        read("latency", Distribution)
+        read("step_time", Distribution)
+        read("error_rate", float)
+        read("timeout_rate", float)
+        read("timeout", float)
+        read("storage_size", int)
+        read("storage_ttl", float)
+
+        return cls(name=name, **defaults)
+
+    def storage(self) -> TTLStorage:
+        return TTLStorage(self.storage_size, self.storage_ttl)
+
+    def new_id(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    async def sleep(self, seconds: float) -> None:
+        """Wait simulated seconds."""
+
+        await asyncio.sleep(seconds * self.time_scale)
+
+    async def step(self) -> None:
+        """Wait until the next status change of an order."""
+
+        await self.sleep(self.step_time.sample(self.rng))
+
+    def install(self, app: FastAPI) -> None:
+        """Add the response latency and the failure injection to every endpoint of the app."""
+
+        @app.middleware("http")
+        async def inject(request: Request, call_next):
+            if self.timeout_rate and self.rng.random() < self.timeout_rate:
+                await asyncio.sleep(self.timeout)
+            await self.sleep(self.latency.sample(self.rng))
+
+            if self.error_rate and self.rng.random() < self.error_rate:
+                return JSONResponse({"error": f"{self.name} mock: injected failure"}, status_code=500)
+
+            return await call_next(request)
+
+        print(
+            f"{self.name} mock: seed={self.seed} time_scale={self.time_scale} latency={self.latency.spec} "
+            f"step_time={self.step_time.spec} error_rate={self.error_rate} timeout_rate={self.timeout_rate}"
+        )
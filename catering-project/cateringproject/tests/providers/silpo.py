@@ -1,41 +1,52 @@
-from typing import Literal
-import uuid
-import random
-import time
-
-from fastapi import BackgroundTasks, FastAPI
-from pydantic import BaseModel
-
-OrderStatus = Literal["not started", "cooking", "cooked", "finished"]
-
-STORAGE: dict[str, OrderStatus] = {}
-
-app = FastAPI(title="Silpo API")
-
-class OrderItem(BaseModel):
-    dish: str
-    quantity: int
-
-class OrderRequestBody(BaseModel):
-    order: list[OrderItem]
-
-def update_order_status(order_id: str):
-    ORDER_STATUSES: tuple[OrderStatus, ...] = ("cooking", "cooked", "finished")
-    for status in ORDER_STATUSES:
-        time.sleep(random.randint(4, 6))
-        STORAGE[order_id] = status
-        print(f"SILPO: [{order_id}] --> {status}")
-
-@app.post("/api/orders")
-def make_order(body: OrderRequestBody, background_tasks: BackgroundTasks):
-    print(body)
-
-    order_id = str(uuid.uuid4())
-    STORAGE[order_id] = "not started"
-    background_tasks.add_task(update_order_status, order_id=order_id)
-
-    return {"id": order_id, "status": "not started"}
-
-@app.get("/api/orders/{order_id}")
-def get_order(order_id: str):
+from typing import Literal
+
+from fastapi import BackgroundTasks, FastAPI
+from pydantic import BaseModel
+
+from common import MockConfig
+
+OrderStatus = Literal["not started", "cooking", "cooked", "finished"]
+
+CONFIG = MockConfig.from_env("silpo")
+STORAGE = CONFIG.storage()
+
+app = FastAPI(title="Silpo API")
+CONFIG.install(app)
+
+class OrderItem(BaseModel):
+    dish: str
+    quantity: int
+
+class OrderRequestBody(BaseModel):
+    order: list[OrderItem]
+
+class BatchRequestBody(BaseModel):
+    ids: list[str]
+
+async def update_order_status(order_id: str):
+    ORDER_STATUSES: tuple[OrderStatus, ...] = ("cooking", "cooked", "finished")
+    for status in ORDER_STATUSES:
+        await CONFIG.step()
+        if order_id not in STORAGE:
+            return
+
+        STORAGE[order_id] = status
+        print(f"SILPO: [{order_id}] --> {status}")
+
+@app.post("/api/orders")
+def make_order(body: OrderRequestBody, background_tasks: BackgroundTasks):
+    print(body)
+
+    order_id = CONFIG.new_id()
+    STORAGE[order_id] = "not started"
+    background_tasks.add_task(update_order_status, order_id=order_id)
+
+    return {"id": order_id, "status": "not started"}
+
+@app.post("/api/orders/batch")
+def get_orders(body: BatchRequestBody):
+    return [{"id": order_id, "status": STORAGE[order_id]} for order_id in body.ids if order_id in STORAGE]
+
+@app.get("/api/orders/{order_id}")
+def get_order(order_id: str):
     return {"id": order_id, "status": STORAGE.get(order_id)}
\ No newline at end of file
@@ -0,0 +1,69 @@
+from fastapi import BackgroundTasks, FastAPI
+from pydantic import BaseModel, Field
+
+from common import Distribution, MockConfig
+
+ORDER_STATUSES = ("pending", "pickup", "dropoff", "delivered")
+
+# Uber answers slower than Uklon but finds a courier faster, simulated seconds
+CONFIG = MockConfig.from_env("uber", latency=Distribution("lognormal:-2.5,0.5"), step_time=Distribution("uniform:0.5,1.5"))
+STORAGE = CONFIG.storage()
+
+app = FastAPI()
+CONFIG.install(app)
+
+class OrderRequestBody(BaseModel):
+    addresses: list[str] = Field(min_length=1)
+    comments: list[str] = Field(min_length=1)
+
+class BatchRequestBody(BaseModel):
+    ids: list[str]
+
+def location() -> tuple[float, float]:
+    return CONFIG.rng.random(), CONFIG.rng.random()
+
+async def update_order_status(order_id: str):
+    order = STORAGE.get(order_id)
+
+    for status in ORDER_STATUSES[1:]:
+        await CONFIG.step()
+
+        if status == "dropoff":
+            for address in order["addresses"]:
+                for _ in range(5):
+                    order["location"] = location()
+                    await CONFIG.sleep(.5)
+                print(f"Delivered to {address}")
+
+        # evicted meanwhile
+        if order_id not in STORAGE:
+            return
+
+        order["status"] = status
+        order["location"] = location()
+        STORAGE[order_id] = order
+        print(f'UBER: [{order_id}] --> {status}]')
+
+@app.post("/v1/deliveries")
+def make_order(body: OrderRequestBody, background_tasks: BackgroundTasks):
+    print(body)
+
+    order_id = CONFIG.new_id()
+    STORAGE[order_id] = {
+        "order_id": order_id,
+        "status": "pending",
+        "addresses": body.addresses,
+        "comments": body.comments,
+        "location": location(),
+    }
+    background_tasks.add_task(update_order_status, order_id)
+
+    return STORAGE.get(order_id, {"error": "no such order"})
+
+@app.post("/v1/deliveries/batch")
+def get_orders(body: BatchRequestBody):
+    return [STORAGE[order_id] for order_id in body.ids if order_id in STORAGE]
+
+@app.get("/v1/deliveries/{order_id}")
+def get_order(order_id: str):
+    return STORAGE.get(order_id, {"error": "no such order"})
@@ -1,58 +1,74 @@
-import asyncio
-import random
-import uuid
-
-from fastapi import BackgroundTasks, FastAPI
-from pydantic import BaseModel, Field
-
-ORDER_STATUSES = ("not started", "delivery", "delivered")
-STORAGE: dict[str, dict] = {}
-
-app = FastAPI()
-
-class OrderRequestBody(BaseModel):
-    addresses: list[str] = Field(min_length=1)
-    comments: list[str] = Field(min_length=1)
-
-async def delivery(order_id: str):
-    for _ in range(5):
-        STORAGE[order_id]["location"] = (random.random(), random.random())
-
-    for address in STORAGE[order_id]["addresses"]:
-        await asyncio.sleep(1)
-        for _ in range(5):
-            STORAGE[order_id]["location"] = (random.random(), random.random())
-            await asyncio.sleep(.5)
-
-        print(f"Delivered to {address}")
-
-async def update_order_status(order_id: str):
-    for status in ORDER_STATUSES[1:]:
-        STORAGE[order_id]["location"] = (random.random(), random.random())
-        await asyncio.sleep(random.randint(1, 2))
-
-        if status == "delivery":
-            await delivery(order_id)
-
-        STORAGE[order_id]["status"] = status
-        print(f'UKLON: [{order_id}] --> {status}]')
-
-@app.post("/drivers/orders")
-def make_order(body: OrderRequestBody, background_tasks: BackgroundTasks):
-    print(body)
-
-    order_id = str(uuid.uuid4())
-    STORAGE[order_id] = {
-        "order_id": order_id,
-        "status": "not started",
-        "addresses": body.addresses,
-        "comments": body.comments,
-        "location": (random.random(), random.random()),
-    }
-    background_tasks.add_task(update_order_status, order_id)
-
-    return STORAGE.get(order_id, {"error": "no such order"})
-
-@app.get("/drivers/orders/{order_id}")
-def get_order(order_id: str):
+from fastapi import BackgroundTasks, FastAPI
+from pydantic import BaseModel, Field
+
+from common import Distribution, MockConfig
+
+ORDER_STATUSES = ("not started", "delivery", "delivered")
+
+# a leg between two addresses, simulated seconds
+CONFIG = MockConfig.from_env("uklon", step_time=Distribution("uniform:1,2"))
+STORAGE = CONFIG.storage()
+
+app = FastAPI()
+CONFIG.install(app)
+
+class OrderRequestBody(BaseModel):
+    addresses: list[str] = Field(min_length=1)
+    comments: list[str] = Field(min_length=1)
+
+class BatchRequestBody(BaseModel):
+    ids: list[str]
+
+def location() -> tuple[float, float]:
+    return CONFIG.rng.random(), CONFIG.rng.random()
+
+async def delivery(order: dict):
+    for address in order["addresses"]:
+        await CONFIG.sleep(1)
+        for _ in range(5):
+            order["location"] = location()
+            await CONFIG.sleep(.5)
+
+        print(f"Delivered to {address}")
+
+async def update_order_status(order_id: str):
+    order = STORAGE.get(order_id)
+
+    for status in ORDER_STATUSES[1:]:
+        order["location"] = location()
+        await CONFIG.step()
+
+        if status == "delivery":
+            await delivery(order)
+
+        # evicted meanwhile
+        if order_id not in STORAGE:
+            return
+
+        order["status"] = status
+        STORAGE[order_id] = order
+        print(f'UKLON: [{order_id}] --> {status}]')
+
+@app.post("/drivers/orders")
+def make_order(body: OrderRequestBody, background_tasks: BackgroundTasks):
+    print(body)
+
+    order_id = CONFIG.new_id()
+    STORAGE[order_id] = {
+        "order_id": order_id,
+        "status": "not started",
+        "addresses": body.addresses,
+        "comments": body.comments,
+        "location": location(),
+    }
+    background_tasks.add_task(update_order_status, order_id)
+
+    return STORAGE.get(order_id, {"error": "no such order"})
+
+@app.post("/drivers/orders/batch")
+def get_orders(body: BatchRequestBody):
+    return [STORAGE[order_id] for order_id in body.ids if order_id in STORAGE]
+
+@app.get("/drivers/orders/{order_id}")
+def get_order(order_id: str):
     return STORAGE.get(order_id, {"error": "no such order"})
\ No newline at end of file
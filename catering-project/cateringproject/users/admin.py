@@ -1,6 +1,6 @@
-from django.contrib import admin
-from .models import User
-
-@admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+from django.contrib import admin
+from .models import User
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
     readonly_fields = ("id", "password", "last_login", "is_active")
\ No newline at end of file
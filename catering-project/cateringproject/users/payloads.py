@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+from shared.payloads import Payload, register
+
+@register("users.activation_email")
+@dataclass(frozen=True)
+class ActivationEmailPayload(Payload):
+    email: str
+    activation_key: str
@@ -1,3 +1,17 @@
-from django.test import TestCase
-
-# Create your tests here.
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from cateringproject.profiling import query_budget
+from .models import User
+
+class UsersAPITestCase(TestCase):
+    def test_profile_is_served_without_queries(self):
+        user = User.objects.create_user(email="john@catering.com", password="password", phone_number="0501234567")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with query_budget(0):
+            response = client.get("/users/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["email"], "john@catering.com")